@@ -0,0 +1,63 @@
+"""Benchmark of prepared against ad-hoc statements for the hot user queries of `PostgresGateway`.
+
+Creates users then reads them back by id and by username, once with a gateway sending the full SQL text of every
+query and once with a gateway running the queries as prepared statements, and reports the throughput of each. The
+users created are deleted afterwards. Usage:
+
+    python benchmarks/bench_prepared_statements.py --host localhost --operations 10000
+"""
+import argparse
+from datetime import datetime
+from time import perf_counter
+import uuid
+
+from funwithflags.definitions import User
+from funwithflags.gateways import PostgresGateway
+
+
+def timed(operation, count: int) -> float:
+    """Run `operation(i)` for i in range(count) and return the throughput in operations per second."""
+    start = perf_counter()
+    for i in range(count):
+        operation(i)
+    return count / (perf_counter() - start)
+
+
+def run(gateway: PostgresGateway, label: str, operations: int) -> None:
+    prefix = uuid.uuid4().hex[:8]
+    user_ids = []
+
+    def create(i):
+        user_ids.append(gateway.create_user(User(
+            username=f"bench_{prefix}_{i}", nickname="bench", email=f"bench_{prefix}_{i}@example.com",
+            password=b"password", salt=b"salt", created_at=datetime.now())))
+
+    try:
+        create_rate = timed(create, operations)
+        read_rate = timed(lambda i: gateway.read_user(user_id=user_ids[i]), operations)
+        read_name_rate = timed(lambda i: gateway.read_user(username=f"bench_{prefix}_{i}"), operations)
+    finally:
+        gateway.query("DELETE FROM users WHERE user_id = ANY(%s)", user_ids)
+    print(f"{label:>9} | {create_rate:>13.1f} | {read_rate:>14.1f} | {read_name_rate:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--dbname", default="postgres")
+    parser.add_argument("--user", default="service")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--operations", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'mode':>9} | {'create_user/s':>13} | {'read_user id/s':>14} | {'read_user name/s':>16}")
+    for label, prepared in (("ad-hoc", False), ("prepared", True)):
+        gateway = PostgresGateway(args.host, args.port, args.dbname, args.user, args.password,
+                                  prepared_statements=prepared)
+        run(gateway, label, args.operations)
+        gateway.deactivate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark of the single query project tree read against the naive multi-query version.
+
+Creates projects with boards, epics and sprints, then reads the tree of every project once with
+`PostgresGateway.read_project_tree`, which aggregates the whole document in one round trip, and once the naive way:
+the project, then its boards, epics and open sprints with a query each, assembled and serialized in Python. Reports the
+throughput of each. The data created is deleted afterwards. Usage:
+
+    python benchmarks/bench_project_tree.py --host localhost --projects 200 --children 20
+"""
+import argparse
+from datetime import datetime
+import json
+from time import perf_counter
+from typing import Optional
+import uuid
+
+from funwithflags.definitions import User
+from funwithflags.gateways import PostgresGateway
+from funwithflags.use_cases import project_fields
+
+
+def timed(operation, count: int) -> float:
+    """Run `operation(i)` for i in range(count) and return the throughput in operations per second."""
+    start = perf_counter()
+    for i in range(count):
+        operation(i)
+    return count / (perf_counter() - start)
+
+
+def naive_tree(gateway: PostgresGateway, project_id: int, user_id: int) -> Optional[str]:
+    """Read the project tree with a query per table and assemble it in Python."""
+    if not gateway.can_read_project(project_id, user_id):
+        return None
+    tree = dict(project_fields(gateway.read_project(project_id)))
+    tables = {
+        "boards": "SELECT board_id, board_name, board_note, admin_id, created_at FROM board WHERE project_id = %s "
+                  "ORDER BY board_id",
+        "epics": "SELECT epic_id, epic_name, epic_note FROM epic WHERE project_id = %s ORDER BY epic_id",
+        "sprints": "SELECT sprint_id, sprint_num, sprint_name, status, created_at, begin_time, end_time FROM sprint "
+                   "WHERE project_id = %s AND closed_at IS NULL ORDER BY sprint_num",
+    }
+    for name, query in tables.items():
+        columns = [column.split(" ")[0] for column in query[len("SELECT "):query.index(" FROM")].split(", ")]
+        rows = gateway.query(query, project_id, fetch="all")
+        tree[name] = [dict(zip(columns, row)) for row in rows]
+    return json.dumps(tree, default=str)
+
+
+def create_projects(gateway: PostgresGateway, user_id: int, projects: int, children: int):
+    project_ids = []
+    with gateway.transaction():
+        for i in range(projects):
+            project_id = gateway.query(
+                """INSERT INTO project(project_name, project_type, project_public, user_id, admin_id, created_at)
+                   VALUES (%s, 'personal', false, %s, %s, now()) RETURNING project_id""", f"bench {i}", user_id,
+                user_id)[0]
+            project_ids.append(project_id)
+            gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                             SELECT 'board ' || n, %s, %s, now() FROM generate_series(1, %s) n""",
+                          project_id, user_id, children)
+            gateway.query("""INSERT INTO epic(epic_name, project_id)
+                             SELECT 'epic ' || n, %s FROM generate_series(1, %s) n""", project_id, children)
+            gateway.query("""INSERT INTO sprint(sprint_num, sprint_name, project_id, status, created_at, closed_at)
+                             SELECT n, 'sprint ' || n, %s, 0, now(), CASE WHEN n %% 2 = 0 THEN now() END
+                             FROM generate_series(1, %s) n""", project_id, children)
+    return project_ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--dbname", default="postgres")
+    parser.add_argument("--user", default="service")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--children", type=int, default=20, help="boards, epics and sprints per project")
+    args = parser.parse_args()
+
+    gateway = PostgresGateway(args.host, args.port, args.dbname, args.user, args.password, prepared_statements=True)
+    prefix = uuid.uuid4().hex[:8]
+    user_id = gateway.create_user(User(username=f"bench_{prefix}", nickname="bench", email=f"bench_{prefix}@example.com",
+                                       password=b"password", salt=b"salt", created_at=datetime.now()))
+    try:
+        project_ids = create_projects(gateway, user_id, args.projects, args.children)
+        one_query = json.loads(gateway.read_project_tree(project_ids[0], user_id))
+        naive = json.loads(naive_tree(gateway, project_ids[0], user_id))
+        assert [len(one_query[name]) for name in ("boards", "epics", "sprints")] == \
+            [len(naive[name]) for name in ("boards", "epics", "sprints")]
+        print(f"{'mode':>12} | {'trees/s':>9}")
+        for label, read in (("naive", naive_tree), ("one query", gateway.read_project_tree)):
+            rate = timed(lambda i: read(project_ids[i], user_id), len(project_ids))
+            print(f"{label:>12} | {rate:>9.1f}")
+    finally:
+        gateway.query("DELETE FROM project WHERE admin_id = %s", user_id)
+        gateway.query("DELETE FROM users WHERE user_id = %s", user_id)
+        gateway.deactivate()
+
+
+if __name__ == "__main__":
+    main()
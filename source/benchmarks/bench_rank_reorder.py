@@ -0,0 +1,125 @@
+"""Benchmark of concurrent story moves on one board, renumbering integer positions against lexicographic ranks.
+
+Creates a board with `--stories` stories, then runs `--moves` random moves of a story right after another one from
+`--threads` threads, with a pooled gateway, in two modes:
+
+- positions: every story keeps an integer position in its priority column, and a move shifts the positions of all the
+  stories between the old and new position of the moved story in one transaction, as a drag and drop renumbering
+  the list would, so concurrent moves lock overlapping ranges of stories and may deadlock;
+- ranks: a move reads the ranks around the target with `PostgresGateway.read_rank_gap` and writes a rank between
+  them to the moved story only, as `move_story` does.
+
+It reports the throughput, the p50 and p99 latency of the moves that succeeded and the number of moves that failed,
+deadlocks included, then the longest rank left on the board. The data created is deleted afterwards. Usage:
+
+    python benchmarks/bench_rank_reorder.py --host localhost --stories 500 --threads 16 --moves 5000
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import random
+from time import perf_counter
+from typing import List, Tuple
+import uuid
+
+from funwithflags.definitions import DatabaseQueryError, User
+from funwithflags.entities import rank_between, spread_ranks
+from funwithflags.gateways import PostgresGateway
+
+# Shifts the stories between the old and new position of a moved story by one towards its old position.
+SHIFT_QUERY = """UPDATE story SET priority = priority + CASE WHEN %s::integer < %s::integer THEN 1 ELSE -1 END
+                 WHERE board_id = %s AND priority BETWEEN least(%s::integer, %s::integer)
+                                                  AND greatest(%s::integer, %s::integer) AND story_id <> %s"""
+
+
+def create_board(gateway: PostgresGateway, user_id: int, stories: int) -> Tuple[int, List[int]]:
+    with gateway.transaction():
+        project_id = gateway.query(
+            """INSERT INTO project(project_name, project_type, project_public, user_id, admin_id, created_at)
+               VALUES ('bench ranks', 'personal', false, %s, %s, now()) RETURNING project_id""", user_id, user_id)[0]
+        board_id = gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                    VALUES ('bench', %s, %s, now()) RETURNING board_id""", project_id, user_id)[0]
+        rows = gateway.query("""INSERT INTO story(story_name, story_type, status, created_at, project_id, board_id,
+                                                  priority, board_rank)
+                                SELECT 'card ' || n, 0, 0, now(), %s, %s, n, (%s::text[])[n]
+                                FROM generate_series(1, %s::integer) n RETURNING story_id""",
+                             project_id, board_id, spread_ranks(stories), stories, fetch="all")
+    return board_id, [row[0] for row in rows]
+
+
+def move_position(gateway: PostgresGateway, board_id: int, story_id: int, after_id: int) -> None:
+    with gateway.transaction():
+        old = gateway.query("SELECT priority FROM story WHERE story_id = %s FOR UPDATE", story_id)[0]
+        after = gateway.query("SELECT priority FROM story WHERE story_id = %s", after_id)[0]
+        new = after + 1 if after < old else after
+        if new != old:
+            gateway.query(SHIFT_QUERY, new, old, board_id, new, old, new, old, story_id)
+            gateway.query("UPDATE story SET priority = %s WHERE story_id = %s", new, story_id)
+
+
+def move_rank(gateway: PostgresGateway, board_id: int, story_id: int, after_id: int) -> None:
+    with gateway.transaction():
+        gateway.query("SELECT story_id FROM story WHERE story_id = %s FOR UPDATE", story_id)
+        gap = gateway.read_rank_gap(board_id, story_id, after_id=after_id)
+        gateway.update_story(story_id, {"board_rank": rank_between(*gap)})
+
+
+def run(gateway: PostgresGateway, label: str, move, board_id: int, story_ids: List[int], threads: int,
+        moves: int) -> None:
+    pairs = [random.sample(story_ids, 2) for _ in range(moves)]
+    latencies, failures, deadlocks = [], 0, 0
+
+    def timed_move(pair):
+        start = perf_counter()
+        try:
+            move(gateway, board_id, *pair)
+        except DatabaseQueryError as e:
+            return None, "deadlock" in str(e)
+        return perf_counter() - start, False
+
+    start = perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        for latency, deadlock in executor.map(timed_move, pairs):
+            if latency is None:
+                failures += 1
+                deadlocks += deadlock
+            else:
+                latencies.append(latency)
+    elapsed = perf_counter() - start
+    latencies = sorted(latencies) or [0.0]
+    print(f"{label:>10} | {len(pairs) / elapsed:>8.0f} | {latencies[len(latencies) // 2] * 1000:>7.1f} | "
+          f"{latencies[int(len(latencies) * 0.99)] * 1000:>7.1f} | {failures:>8} | {deadlocks:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--dbname", default="postgres")
+    parser.add_argument("--user", default="service")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--stories", type=int, default=500, help="stories of the board")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent movers")
+    parser.add_argument("--moves", type=int, default=5000, help="moves per mode")
+    args = parser.parse_args()
+
+    gateway = PostgresGateway(args.host, args.port, args.dbname, args.user, args.password, pool_min_size=args.threads,
+                              pool_max_size=args.threads, prepared_statements=True)
+    prefix = uuid.uuid4().hex[:8]
+    user_id = gateway.create_user(User(username=f"bench_{prefix}", nickname="bench", email=f"bench_{prefix}@example.com",
+                                       password=b"password", salt=b"salt", created_at=datetime.now()))
+    try:
+        board_id, story_ids = create_board(gateway, user_id, args.stories)
+        print(f"{'mode':>10} | {'moves/s':>8} | {'p50 ms':>7} | {'p99 ms':>7} | {'failures':>8} | {'deadlocks':>9}")
+        run(gateway, "positions", move_position, board_id, story_ids, args.threads, args.moves)
+        run(gateway, "ranks", move_rank, board_id, story_ids, args.threads, args.moves)
+        longest = gateway.query("SELECT max(length(board_rank)) FROM story WHERE board_id = %s", board_id)[0]
+        print(f"longest rank after the moves: {longest} characters")
+    finally:
+        gateway.query("DELETE FROM project WHERE admin_id = %s", user_id)
+        gateway.query("DELETE FROM users WHERE user_id = %s", user_id)
+        gateway.deactivate()
+
+
+if __name__ == "__main__":
+    main()
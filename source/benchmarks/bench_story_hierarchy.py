@@ -0,0 +1,123 @@
+"""Benchmark of story hierarchy queries on the closure table against recursive CTEs over the parent column.
+
+Creates a project with a balanced tree of stories, `--fanout` children per story down to `--depth` levels, and a
+chain of `--chain` stories each the parent of the next, then rebuilds the closure and runs each hierarchy query
+`--repeat` times: once with `PostgresGateway.read_story_subtree`, `read_story_ancestors` and `read_story_rollup`,
+which are range scans of the closure indexes, and once with a recursive CTE walking `story.parent_story` through its
+index one level per iteration, reporting the mean latency of each. The data created is deleted afterwards. Usage:
+
+    python benchmarks/bench_story_hierarchy.py --host localhost --depth 10 --fanout 3 --chain 2000
+"""
+import argparse
+from datetime import datetime
+from time import perf_counter
+from typing import List
+import uuid
+
+from funwithflags.definitions import User
+from funwithflags.gateways import PostgresGateway
+
+SUBTREE_QUERY = """WITH RECURSIVE subtree(story_id, depth) AS (
+        SELECT story_id, 0 FROM story WHERE story_id = %s
+        UNION ALL
+        SELECT s.story_id, t.depth + 1 FROM subtree t JOIN story s ON s.parent_story = t.story_id)
+    SELECT s.story_id, s.story_name, s.story_type, s.status, s.estimate, s.board_id, s.parent_story, t.depth
+    FROM subtree t JOIN story s ON s.story_id = t.story_id ORDER BY t.depth, s.story_id"""
+ANCESTORS_QUERY = """WITH RECURSIVE ancestors(story_id, parent_story, depth) AS (
+        SELECT story_id, parent_story, 0 FROM story WHERE story_id = %s
+        UNION ALL
+        SELECT s.story_id, s.parent_story, a.depth + 1 FROM ancestors a JOIN story s ON s.story_id = a.parent_story)
+    SELECT s.story_id, s.story_name, s.story_type, s.status, s.estimate, s.board_id, s.parent_story, a.depth
+    FROM ancestors a JOIN story s ON s.story_id = a.story_id WHERE a.depth > 0 ORDER BY a.depth DESC"""
+ROLLUP_QUERY = """WITH RECURSIVE subtree(story_id) AS (
+        SELECT story_id FROM story WHERE story_id = %s
+        UNION ALL
+        SELECT s.story_id FROM subtree t JOIN story s ON s.parent_story = t.story_id)
+    SELECT s.status, count(*), sum(coalesce(s.estimate, 0))
+    FROM subtree t JOIN story s ON s.story_id = t.story_id GROUP BY s.status ORDER BY s.status"""
+
+
+def timed(operation, count: int) -> float:
+    """Run `operation()` `count` times and return the mean latency in milliseconds."""
+    start = perf_counter()
+    for _ in range(count):
+        operation()
+    return (perf_counter() - start) / count * 1000
+
+
+def insert_children(gateway: PostgresGateway, project_id: int, parents: List[int], fanout: int) -> List[int]:
+    rows = gateway.query("""INSERT INTO story(story_name, story_type, status, estimate, created_at, project_id,
+                                             parent_story)
+                            SELECT 'story ' || p.story_id || '.' || n, 0, n %% 4, n %% 5 + 1, now(), %s, p.story_id
+                            FROM unnest(%s::integer[]) p(story_id), generate_series(1, %s::integer) n
+                            RETURNING story_id""", project_id, parents, fanout, fetch="all")
+    return [row[0] for row in rows]
+
+
+def create_hierarchy(gateway: PostgresGateway, user_id: int, depth: int, fanout: int, chain: int) -> dict:
+    with gateway.transaction():
+        project_id = gateway.query(
+            """INSERT INTO project(project_name, project_type, project_public, user_id, admin_id, created_at)
+               VALUES ('bench hierarchy', 'personal', false, %s, %s, now()) RETURNING project_id""",
+            user_id, user_id)[0]
+        root = gateway.query("""INSERT INTO story(story_name, story_type, status, created_at, project_id)
+                                VALUES ('root', 0, 0, now(), %s) RETURNING story_id""", project_id)[0]
+        levels = [[root]]
+        for _ in range(depth):
+            levels.append(insert_children(gateway, project_id, levels[-1], fanout))
+        links = [insert_children(gateway, project_id, [root], 1)[0]]
+        for _ in range(chain - 1):
+            links.append(insert_children(gateway, project_id, links[-1:], 1)[0])
+    gateway.query("ANALYZE story")
+    return {"project_id": project_id, "root": root, "middle": levels[len(levels) // 2][0], "leaf": levels[-1][-1],
+            "chain_head": links[0], "chain_end": links[-1], "stories": sum(map(len, levels)) + len(links)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--dbname", default="postgres")
+    parser.add_argument("--user", default="service")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--depth", type=int, default=10, help="levels of the balanced tree")
+    parser.add_argument("--fanout", type=int, default=3, help="children per story of the balanced tree")
+    parser.add_argument("--chain", type=int, default=2000, help="stories of the chain")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each query")
+    args = parser.parse_args()
+
+    gateway = PostgresGateway(args.host, args.port, args.dbname, args.user, args.password, prepared_statements=True)
+    prefix = uuid.uuid4().hex[:8]
+    user_id = gateway.create_user(User(username=f"bench_{prefix}", nickname="bench", email=f"bench_{prefix}@example.com",
+                                       password=b"password", salt=b"salt", created_at=datetime.now()))
+    try:
+        start = perf_counter()
+        tree = create_hierarchy(gateway, user_id, args.depth, args.fanout, args.chain)
+        print(f"created {tree['stories']} stories in {perf_counter() - start:.1f} s")
+        start = perf_counter()
+        rows = gateway.rebuild_story_closure()
+        gateway.query("ANALYZE story_closure")
+        print(f"rebuilt the closure with {rows} rows in {perf_counter() - start:.1f} s")
+        cases = (
+            ("subtree of the root", "root", gateway.read_story_subtree, SUBTREE_QUERY),
+            ("subtree of a middle story", "middle", gateway.read_story_subtree, SUBTREE_QUERY),
+            ("subtree of the chain", "chain_head", gateway.read_story_subtree, SUBTREE_QUERY),
+            ("ancestors of a leaf", "leaf", gateway.read_story_ancestors, ANCESTORS_QUERY),
+            ("ancestors of the chain end", "chain_end", gateway.read_story_ancestors, ANCESTORS_QUERY),
+            ("rollup of the root", "root", gateway.read_story_rollup, ROLLUP_QUERY),
+            ("rollup of the chain", "chain_head", gateway.read_story_rollup, ROLLUP_QUERY),
+        )
+        print(f"{'query':>28} | {'closure ms':>10} | {'recursive ms':>12}")
+        for label, story, closure, recursive in cases:
+            story_id = tree[story]
+            closure_ms = timed(lambda: closure(story_id), args.repeat)
+            recursive_ms = timed(lambda: gateway.query(recursive, story_id, fetch="all"), args.repeat)
+            print(f"{label:>28} | {closure_ms:>10.2f} | {recursive_ms:>12.2f}")
+    finally:
+        gateway.query("DELETE FROM project WHERE admin_id = %s", user_id)
+        gateway.query("DELETE FROM users WHERE user_id = %s", user_id)
+        gateway.deactivate()
+
+
+if __name__ == "__main__":
+    main()
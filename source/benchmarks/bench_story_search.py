@@ -0,0 +1,85 @@
+"""Benchmark of the ranked full-text story search against a substring scan.
+
+Creates a project with `--stories` stories whose names and descriptions are drawn from a small vocabulary, then runs
+each search word once with `PostgresGateway.search_stories`, which matches the GIN index on (project_id,
+search_vector) and ranks the matches, and once with an ILIKE substring scan of the names and descriptions of the
+project, reporting the latency of each. The data created is deleted afterwards. Usage:
+
+    python benchmarks/bench_story_search.py --host localhost --stories 1000000
+"""
+import argparse
+from datetime import datetime
+from time import perf_counter
+import uuid
+
+from funwithflags.definitions import User
+from funwithflags.gateways import PostgresGateway
+
+WORDS = ["login", "payment", "invoice", "dashboard", "export", "search", "profile", "billing", "report", "upload",
+         "notification", "password", "session", "widget", "sprint", "calendar"]
+ILIKE_QUERY = """SELECT story_id, story_name FROM story
+                 WHERE project_id = %s AND (story_name ILIKE %s OR description ILIKE %s)
+                 ORDER BY story_id DESC LIMIT %s"""
+
+
+def timed(operation, count: int) -> float:
+    """Run `operation(i)` for i in range(count) and return the mean latency in milliseconds."""
+    start = perf_counter()
+    for i in range(count):
+        operation(i)
+    return (perf_counter() - start) / count * 1000
+
+
+def create_stories(gateway: PostgresGateway, user_id: int, stories: int) -> int:
+    words = len(WORDS)
+    with gateway.transaction():
+        project_id = gateway.query(
+            """INSERT INTO project(project_name, project_type, project_public, user_id, admin_id, created_at)
+               VALUES ('bench search', 'personal', false, %s, %s, now()) RETURNING project_id""", user_id, user_id)[0]
+        # The first word of a story is rare in names, so matches have a spread of ranks.
+        gateway.query("""INSERT INTO story(story_name, story_type, status, created_at, project_id, description)
+                         SELECT (%s::text[])[n %% %s + 1] || ' ' || (%s::text[])[(n / 7) %% %s + 1] || ' ' || n,
+                                0, 0, now(), %s,
+                                'As a user I want the ' || (%s::text[])[(n / 3) %% %s + 1] || ' to work with the '
+                                || (%s::text[])[(n / 11) %% %s + 1] || ' of my account'
+                         FROM generate_series(1, %s) n""",
+                      WORDS, words, WORDS, words, project_id, WORDS, words, WORDS, words, stories)
+    gateway.query("ANALYZE story")
+    return project_id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--dbname", default="postgres")
+    parser.add_argument("--user", default="service")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--stories", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=20, help="stories per page")
+    args = parser.parse_args()
+
+    gateway = PostgresGateway(args.host, args.port, args.dbname, args.user, args.password, prepared_statements=True)
+    prefix = uuid.uuid4().hex[:8]
+    user_id = gateway.create_user(User(username=f"bench_{prefix}", nickname="bench", email=f"bench_{prefix}@example.com",
+                                       password=b"password", salt=b"salt", created_at=datetime.now()))
+    try:
+        start = perf_counter()
+        project_id = create_stories(gateway, user_id, args.stories)
+        print(f"created {args.stories} stories in {perf_counter() - start:.1f} s")
+        print(f"{'mode':>12} | {'ms/search':>9}")
+        modes = (
+            ("ILIKE", lambda i: gateway.query(ILIKE_QUERY, project_id, f"%{WORDS[i]}%", f"%{WORDS[i]}%", args.limit,
+                                              fetch="all")),
+            ("full-text", lambda i: gateway.search_stories(project_id, WORDS[i], limit=args.limit)),
+        )
+        for label, search in modes:
+            print(f"{label:>12} | {timed(search, len(WORDS)):>9.1f}")
+    finally:
+        gateway.query("DELETE FROM project WHERE admin_id = %s", user_id)
+        gateway.query("DELETE FROM users WHERE user_id = %s", user_id)
+        gateway.deactivate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark of Redis operations per login under each token storage policy.
+
+Runs the `login` use case against a real Redis server with an in-memory user store, and reports the Redis commands,
+keys and memory added per login for every `TokenPolicy`. Usage:
+
+    python benchmarks/bench_token_policy.py --redis-host localhost --logins 1000
+"""
+import argparse
+from time import perf_counter
+
+from flask import Flask
+from flask_jwt_extended import JWTManager
+import redis
+
+from funwithflags.definitions import LoginRequest, TokenPolicy, User
+from funwithflags.entities import HashingService, generate_salt_hash_password
+from funwithflags.gateways import Context, RedisGateway
+from funwithflags.use_cases import login
+
+PASSWORD = "Password123@"
+
+
+class InMemoryUserGateway:
+    """Stand-in for `PostgresGateway` serving a single user, so only Redis traffic is measured."""
+
+    def __init__(self):
+        password, salt = generate_salt_hash_password(PASSWORD, rounds=4)
+        self._user = User(user_id=1, username="benchUser", password=password, salt=salt, valid=True)
+
+    def read_user(self, user_id=None, username=None):
+        return self._user
+
+
+def redis_counters(client: redis.Redis) -> (int, int, int):
+    """Return total commands processed (excluding INFO/DBSIZE), number of keys and used memory of the server."""
+    stats = client.info("commandstats")
+    calls = sum(v["calls"] for k, v in stats.items() if k not in ("cmdstat_info", "cmdstat_dbsize"))
+    return calls, client.dbsize(), client.info("memory")["used_memory"]
+
+
+def run(policy: TokenPolicy, logins: int, host: str, port: int) -> None:
+    client = redis.Redis(host=host, port=port)
+    client.flushdb()
+    context = Context(
+        postgres_gateway=InMemoryUserGateway(),
+        redis_gateway=RedisGateway(host=host, port=port),
+        hashing_service=HashingService(),
+        token_policy=policy,
+    )
+    request = LoginRequest(username="benchUser", password=PASSWORD)
+    calls_before, keys_before, memory_before = redis_counters(client)
+    start = perf_counter()
+    for _ in range(logins):
+        login(request, context)
+    elapsed = perf_counter() - start
+    calls_after, keys_after, memory_after = redis_counters(client)
+    print(f"{policy.value:>10} | {(calls_after - calls_before) / logins:>12.2f} | "
+          f"{(keys_after - keys_before) / logins:>9.2f} | {(memory_after - memory_before) / logins:>10.1f} | "
+          f"{logins / elapsed:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--logins", type=int, default=1000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "benchmark-secret"
+    JWTManager(app)
+    print(f"{'policy':>10} | {'cmds/login':>12} | {'keys/login':>9} | {'bytes/login':>10} | {'logins/s':>10}")
+    with app.app_context():
+        for policy in TokenPolicy:
+            run(policy, args.logins, args.redis_host, args.redis_port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Load test of the board event streams with thousands of idle subscribers.
+
+Opens `--subscribers` server-sent event streams of one board against the event service, reads the worker metrics
+before and after to report the memory held per idle connection, then optionally updates a story of the board
+`--writes` times and reports how long each event took to reach all subscribers. Memory metrics are per worker, so run
+the event service with a single worker and target it directly, not through nginx:
+
+    gunicorn -c python:funwithflags.gunicorn_events -w 1 -b 0.0.0.0:8081 funwithflags.app:app
+    python benchmarks/load_board_events.py --port 8081 --token <access token> --board 7 --story 42 \
+        --subscribers 5000 --writes 20
+
+The client needs a file descriptor per stream, raise its limit with `ulimit -n` first.
+"""
+import argparse
+import asyncio
+import json
+from time import perf_counter
+from typing import List, Optional
+import urllib.request
+
+
+def request_json(url: str, token: str, body: Optional[dict] = None) -> dict:
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Authorization": f"Bearer {token}"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+async def subscribe(host: str, port: int, board_id: int, token: str, events: asyncio.Queue,
+                    connected: asyncio.Event) -> None:
+    """Open one event stream and put the arrival time of every story event on `events`."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((f"GET /api/board/{board_id}/events HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Authorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n").encode())
+    await writer.drain()
+    status = await reader.readline()
+    if b" 200 " not in status:
+        raise RuntimeError(f"Subscription failed: {status.decode().strip()}")
+    connected.set()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"event: story"):
+                events.put_nowait(perf_counter())
+    finally:
+        writer.close()
+
+
+async def open_streams(args) -> (List[asyncio.Task], asyncio.Queue):
+    events = asyncio.Queue()
+    tasks = []
+    for start in range(0, args.subscribers, args.batch):
+        batch = []
+        for _ in range(min(args.batch, args.subscribers - start)):
+            connected = asyncio.Event()
+            tasks.append(asyncio.ensure_future(
+                subscribe(args.host, args.port, args.board, args.token, events, connected)))
+            batch.append(connected.wait())
+        await asyncio.gather(*batch)
+    return tasks, events
+
+
+async def run(args) -> None:
+    base = f"http://{args.host}:{args.port}"
+    loop = asyncio.get_event_loop()
+    before = await loop.run_in_executor(None, request_json, f"{base}/api/metrics", args.token)
+    start = perf_counter()
+    tasks, events = await open_streams(args)
+    print(f"opened {args.subscribers} streams in {perf_counter() - start:.1f} s")
+    # Let the worker settle, the first events of a stream are sent right after it is accepted.
+    await asyncio.sleep(2)
+    after = await loop.run_in_executor(None, request_json, f"{base}/api/metrics", args.token)
+    grown = after["max_rss_kb"] - before["max_rss_kb"]
+    print(f"subscribers: {after['board_events']['subscribers']}, worker peak RSS {before['max_rss_kb']} kB -> "
+          f"{after['max_rss_kb']} kB, {grown / args.subscribers:.1f} kB per idle stream")
+
+    latencies = []
+    for i in range(args.writes):
+        sent = perf_counter()
+        await loop.run_in_executor(None, request_json, f"{base}/api/story/{args.story}/update", args.token,
+                                   {"priority": i % 2})
+        for _ in range(args.subscribers):
+            latencies.append(await asyncio.wait_for(events.get(), timeout=30) - sent)
+    if latencies:
+        latencies.sort()
+        print(f"fan-out latency over {args.writes} writes: p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--token", required=True, help="access token of a user who may read the board")
+    parser.add_argument("--board", type=int, required=True)
+    parser.add_argument("--story", type=int, help="story of the board to update, required with --writes")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=200, help="streams opened concurrently")
+    parser.add_argument("--writes", type=int, default=0)
+    args = parser.parse_args()
+    if args.writes and args.story is None:
+        parser.error("--story is required with --writes")
+    asyncio.get_event_loop().run_until_complete(run(args))
+
+
+if __name__ == "__main__":
+    main()
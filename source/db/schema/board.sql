@@ -7,3 +7,35 @@ CREATE TABLE board (
 	created_at	timestamp	NOT NULL
 );
 
+CREATE INDEX board_project_idx ON board (project_id);
+
+-- Notifies the boards of the projects whose readers changed on the board_access channel, so the board read model drops
+-- the readers it cached with their documents. Team memberships and project access are written around the application.
+CREATE FUNCTION teammates_access_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+	team_ids integer[] := '{}';
+BEGIN
+	IF TG_OP <> 'INSERT' THEN
+		team_ids := team_ids || OLD.team_id;
+	END IF;
+	IF TG_OP <> 'DELETE' THEN
+		team_ids := team_ids || NEW.team_id;
+	END IF;
+	PERFORM pg_notify('board_access', b.board_id::text)
+	FROM project p JOIN board b ON b.project_id = p.project_id WHERE p.team_id = ANY(team_ids);
+	RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER teammates_access_changed AFTER INSERT OR UPDATE OR DELETE ON teammates
+	FOR EACH ROW EXECUTE FUNCTION teammates_access_changed();
+
+CREATE FUNCTION project_access_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+	PERFORM pg_notify('board_access', b.board_id::text) FROM board b WHERE b.project_id = NEW.project_id;
+	RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER project_access_changed AFTER UPDATE OF project_public, user_id, team_id, admin_id ON project
+	FOR EACH ROW EXECUTE FUNCTION project_access_changed();
@@ -5,3 +5,13 @@ CREATE TABLE epic (
 	project_id	integer		REFERENCES project(project_id) ON DELETE CASCADE
 );
 
+CREATE INDEX epic_project_idx ON epic (project_id);
+
+-- Estimate and story totals of each status of an epic, maintained on every story write so progress is read by key.
+CREATE TABLE epic_rollup (
+	epic_id		integer		REFERENCES epic(epic_id) ON DELETE CASCADE,
+	status		integer		NOT NULL,
+	estimate	bigint		NOT NULL,
+	stories		bigint		NOT NULL,
+	PRIMARY KEY (epic_id, status)
+);
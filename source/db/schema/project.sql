@@ -9,3 +9,6 @@ CREATE TABLE project (
 	admin_id	integer		NOT NULL REFERENCES users(user_id) ON DELETE RESTRICT,
 	created_at	timestamp	NOT NULL
 );
+
+CREATE INDEX project_user_idx ON project (user_id, created_at, project_id);
+CREATE INDEX project_team_idx ON project (team_id, created_at, project_id);
@@ -10,3 +10,23 @@ CREATE TABLE sprint (
 	end_time	timestamp
 );
 
+CREATE INDEX sprint_open_idx ON sprint (project_id, sprint_num) WHERE closed_at IS NULL;
+
+-- Changes of the estimate and story totals of each status of a sprint per day, summed up to a day for its burndown.
+CREATE TABLE sprint_burndown (
+	sprint_id	integer		REFERENCES sprint(sprint_id) ON DELETE CASCADE,
+	day		date		NOT NULL,
+	status		integer		NOT NULL,
+	estimate	bigint		NOT NULL,
+	stories		integer		NOT NULL,
+	PRIMARY KEY (sprint_id, day, status)
+);
+
+-- Estimate and story totals of each status of a sprint, maintained on every story write so progress is read by key.
+CREATE TABLE sprint_rollup (
+	sprint_id	integer		REFERENCES sprint(sprint_id) ON DELETE CASCADE,
+	status		integer		NOT NULL,
+	estimate	bigint		NOT NULL,
+	stories		bigint		NOT NULL,
+	PRIMARY KEY (sprint_id, status)
+);
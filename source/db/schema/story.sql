@@ -6,16 +6,108 @@ CREATE TABLE story (
 	estimate	integer,
 	created_at	timestamp	NOT NULL,
 	created_by	integer		REFERENCES users(user_id) ON DELETE RESTRICT,
-	closed_at	timestamp	NOT NULL,
+	closed_at	timestamp,
 	closed_by	integer		REFERENCES users(user_id) ON DELETE RESTRICT,
 	project_id	integer		REFERENCES project(project_id) ON DELETE CASCADE,
 	board_id	integer		REFERENCES board(board_id) ON DELETE CASCADE,
-	board_history	integer[],
 	epic_id		integer		REFERENCES epic(epic_id) ON DELETE RESTRICT,
 	assignee	integer		REFERENCES users(user_id),
 	reporter	integer		REFERENCES users(user_id),
 	description	text,
 	priority	integer,
-	parent_story	integer		REFERENCES story(story_id)
+	parent_story	integer		REFERENCES story(story_id),
+	sprint_id	integer		REFERENCES sprint(sprint_id) ON DELETE SET NULL,
+	board_rank	text		COLLATE "C",
+	-- When the story moved onto its current board, and first moved onto any board, kept by the story writes of the
+	-- gateway for the work in progress and the cycle time.
+	board_entered_at	timestamp,
+	started_at	timestamp,
+	search_vector	tsvector	GENERATED ALWAYS AS (
+		setweight(to_tsvector('english', story_name), 'A') ||
+		setweight(to_tsvector('english', coalesce(description, '')), 'B')
+	) STORED
 );
 
+CREATE INDEX story_project_idx ON story (project_id, story_id);
+-- Ranks compare byte by byte, the order of a board is read from the index.
+CREATE INDEX story_board_idx ON story (board_id, board_rank);
+-- Serves the check for sub-stories when a story is deleted and the recursion of a rebuild of the closure.
+CREATE INDEX story_parent_idx ON story (parent_story) WHERE parent_story IS NOT NULL;
+CREATE INDEX story_closed_idx ON story (project_id, closed_at) WHERE closed_at IS NOT NULL;
+-- Searches are scoped to a project, btree_gin lets one GIN index match both the project and the text.
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE INDEX story_search_idx ON story USING gin (project_id, search_vector);
+
+-- Append-only log of the moves of stories between boards, a NULL board being the backlog.
+CREATE TABLE story_transition (
+	transition_id	BIGSERIAL	PRIMARY KEY,
+	story_id	integer		NOT NULL REFERENCES story(story_id) ON DELETE CASCADE,
+	from_board	integer,
+	to_board	integer,
+	moved_at	timestamp	NOT NULL,
+	moved_by	integer		REFERENCES users(user_id)
+);
+
+CREATE INDEX story_transition_story_idx ON story_transition (story_id, transition_id);
+
+-- Closure of the story hierarchy: a row for every story and each of its ancestors, the story itself included at depth
+-- 0, so the subtree or the ancestors of a story are one index range scan whatever the depth of the tree.
+CREATE TABLE story_closure (
+	ancestor_id	integer		NOT NULL REFERENCES story(story_id) ON DELETE CASCADE,
+	descendant_id	integer		NOT NULL REFERENCES story(story_id) ON DELETE CASCADE,
+	depth		integer		NOT NULL,
+	PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX story_closure_descendant_idx ON story_closure (descendant_id, depth);
+
+-- Open stories of each board, with the sum of the epochs they moved onto it, so the mean age of the work in progress
+-- is read without the stories. Maintained with the other aggregates on every story write.
+CREATE TABLE board_wip (
+	board_id	integer		PRIMARY KEY REFERENCES board(board_id) ON DELETE CASCADE,
+	stories		bigint		NOT NULL,
+	entered		numeric		NOT NULL
+);
+
+-- Removes deleted stories from the burndown of their sprints on the current day, from the rollups of their epics and
+-- sprints and from the work in progress of their boards, whatever deleted them: a story delete or the cascade of a
+-- board or project delete. Sprints, epics and boards already deleted by the same cascade are skipped, their
+-- aggregates went with them. Status 3 is DONE, closed stories are not in progress.
+-- Creates and updates are applied by the statements of the gateway instead, see STORY_AGGREGATE_CHANGES of
+-- db_gateway.py: a change to the aggregates must be made in both places.
+CREATE FUNCTION story_deleted_aggregates() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+	WITH changes (sprint_id, epic_id, board_id, entered, status, estimate, stories) AS (
+		SELECT (SELECT sprint_id FROM sprint WHERE sprint_id = d.sprint_id),
+			(SELECT epic_id FROM epic WHERE epic_id = d.epic_id),
+			(SELECT board_id FROM board WHERE board_id = d.board_id),
+			-extract(epoch FROM coalesce(d.board_entered_at, d.created_at)), d.status, -coalesce(d.estimate, 0), -1
+		FROM deleted_story d),
+	wip AS (
+		INSERT INTO board_wip AS w (board_id, stories, entered)
+		SELECT board_id, sum(stories), sum(entered) FROM changes WHERE board_id IS NOT NULL AND status <> 3
+		GROUP BY board_id ORDER BY board_id
+		ON CONFLICT (board_id) DO UPDATE SET stories = w.stories + excluded.stories, entered = w.entered + excluded.entered),
+	burndown AS (
+		INSERT INTO sprint_burndown AS b (sprint_id, day, status, estimate, stories)
+		SELECT sprint_id, current_date, status, sum(estimate), sum(stories) FROM changes WHERE sprint_id IS NOT NULL
+		GROUP BY sprint_id, status ORDER BY sprint_id, status
+		ON CONFLICT (sprint_id, day, status)
+		DO UPDATE SET estimate = b.estimate + excluded.estimate, stories = b.stories + excluded.stories),
+	epic_rolled AS (
+		INSERT INTO epic_rollup AS r (epic_id, status, estimate, stories)
+		SELECT epic_id, status, sum(estimate), sum(stories) FROM changes WHERE epic_id IS NOT NULL
+		GROUP BY epic_id, status ORDER BY epic_id, status
+		ON CONFLICT (epic_id, status)
+		DO UPDATE SET estimate = r.estimate + excluded.estimate, stories = r.stories + excluded.stories)
+	INSERT INTO sprint_rollup AS r (sprint_id, status, estimate, stories)
+	SELECT sprint_id, status, sum(estimate), sum(stories) FROM changes WHERE sprint_id IS NOT NULL
+	GROUP BY sprint_id, status ORDER BY sprint_id, status
+	ON CONFLICT (sprint_id, status)
+	DO UPDATE SET estimate = r.estimate + excluded.estimate, stories = r.stories + excluded.stories;
+	RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER story_deleted_aggregates AFTER DELETE ON story REFERENCING OLD TABLE AS deleted_story
+	FOR EACH STATEMENT EXECUTE FUNCTION story_deleted_aggregates();
@@ -1,9 +1,15 @@
 """Main entrypoint of RESTful API service."""
+from dataclasses import asdict
+import csv
+from datetime import datetime
 from http import HTTPStatus as status
+import io
+import json
+import resource
 import traceback
 
-from flask import Flask
-from flask import jsonify, request, make_response
+from flask import Flask, Response
+from flask import jsonify, request, make_response, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import (
     fresh_jwt_required,
@@ -16,13 +22,21 @@ from flask_jwt_extended import (
 from flasgger import swag_from, Swagger
 
 from funwithflags.definitions import (RegisterRequest, LoginRequest, LogoutRequest, FreshLoginRequest,
-                                      UserUpdateRequest)
-from funwithflags.definitions import BadRequestError, DatabaseQueryError
-from funwithflags.definitions import ACCESS_EXPIRES, REFRESH_EXPIRES
+                                      UserReadRequest, UsersReadRequest, UserUpdateRequest, ProjectCreateRequest,
+                                      ProjectExportRequest, ProjectListRequest, FlowMetricsRequest, StoryCreateRequest,
+                                      StoryMoveRequest, StorySearchRequest, StoryUpdateRequest)
+from funwithflags.definitions import BadRequestError, DatabaseQueryError, ServiceUnavailableError
+from funwithflags.definitions import ACCESS_EXPIRES, DEFAULT_PAGE_SIZE, REFRESH_EXPIRES, ProjectType
 from funwithflags.entities.logging_util import get_module_logger
 from funwithflags.gateways import Context
-from funwithflags.use_cases import (register, login, fresh_login, logout, read_user_basic, refresh_access_token,
-                                    update_user)
+from funwithflags.use_cases import (register, login, fresh_login, logout, read_user_basic, read_users_basic,
+                                    refresh_access_token, update_user, is_token_revoked, list_sessions,
+                                    revoke_all_sessions, token_claims, create_project, export_project_rows,
+                                    list_projects, read_project, read_project_tree, create_story, read_story,
+                                    update_story, delete_story, read_board, subscribe_board, search_stories,
+                                    read_burndown, read_flow_metrics, move_story, read_story_subtree,
+                                    read_story_ancestors, read_story_rollup, read_sprint_progress,
+                                    read_epic_progress)
 
 logger = get_module_logger(__name__)
 context = Context()
@@ -34,18 +48,28 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = ACCESS_EXPIRES
 app.config['JWT_REFRESH_TOKEN_EXPIRES'] = REFRESH_EXPIRES
 app.config['JWT_BLACKLIST_ENABLED'] = True
 app.config['JWT_BLACKLIST_TOKEN_CHECKS'] = ['refresh']  # Only check refresh token
+app.config['JWT_CLAIMS_IN_REFRESH_TOKEN'] = True  # Refresh tokens carry the token generation checked on revocation
 jwt = JWTManager(app)
 
 # Setup CORS
 CORS(app)
 
 
+@jwt.user_claims_loader
+def add_claims_to_token(identity):
+    """Return the claims added to every token issued to identity."""
+    return token_claims(identity, context)
+
+
 @jwt.token_in_blacklist_loader
 def check_if_token_is_revoked(decrypted_token):
     """Return true if decrypted_token is revoked."""
-    jti = decrypted_token['jti']
-    value = context.redis_gateway.get(jti)
-    return value is None or value == "logout"
+    return is_token_revoked(
+        decrypted_token['jti'],
+        context,
+        identity=decrypted_token.get('identity'),
+        generation=decrypted_token.get('user_claims', {}).get('gen', 0),
+    )
 
 
 # Setup Swagger config
@@ -83,9 +107,6 @@ swagger_config = {
 swagger = Swagger(app, config=swagger_config)
 
 
-UNSUPPORTED = "Unsupported function"
-
-
 def app_response(code, message, **data):
     """Helper function of Flask to return json response. Will return a json object with structure of
     {"code": code, "msg": message, "data": data}, e.g. {"code": 200, "msg": "OK", "data": 1}.
@@ -93,12 +114,84 @@ def app_response(code, message, **data):
     return make_response(jsonify(message=message, **data), code)
 
 
+def json_text_response(code, message, name, text):
+    """Helper function of Flask to return a json response like `app_response` with the field `name` set to the json
+    `text`, which is embedded as is instead of being parsed and serialized again.
+    """
+    body = f"{json.dumps({'message': message})[:-1]}, {json.dumps(name)}: {text}}}"
+    return Response(body, status=code, mimetype="application/json")
+
+
+def stream_response(rows, fmt="json", code=status.OK):
+    """Helper function of Flask to stream an iterable of json serializable `rows` as a json array, as newline
+    delimited json if `fmt` is "ndjson", or as CSV lines of sequences if `fmt` is "csv", written incrementally so rows
+    are never all held in memory. An error while streaming is logged and truncates the body, as the status code is
+    sent already.
+    """
+    def generate():
+        try:
+            if fmt == "ndjson":
+                for row in rows:
+                    yield json.dumps(row, default=str) + "\n"
+                return
+            if fmt == "csv":
+                line = io.StringIO()
+                writer = csv.writer(line)
+                for row in rows:
+                    writer.writerow(row)
+                    yield line.getvalue()
+                    line.seek(0)
+                    line.truncate()
+                return
+            yield "["
+            for i, row in enumerate(rows):
+                yield ("," if i else "") + json.dumps(row, default=str)
+            yield "]"
+        except Exception:
+            logger.info(f"An exception happened when streaming response: {traceback.format_exc()}")
+        finally:
+            # Release the rows source, e.g. a server-side cursor, also when the client disconnects early.
+            if hasattr(rows, "close"):
+                rows.close()
+
+    mimetype = {"ndjson": "application/x-ndjson", "csv": "text/csv"}.get(fmt, "application/json")
+    return Response(stream_with_context(generate()), status=code, mimetype=mimetype)
+
+
+def event_stream_response(subscription, heartbeat):
+    """Helper function of Flask to stream the events of a board `subscription` as server-sent events, with a
+    keep-alive comment after `heartbeat` seconds without events. The subscription is closed when the client
+    disconnects, which is noticed on the next write at the latest.
+    """
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    name, data = event
+                    yield f"event: {name}\ndata: {data}\n\n"
+        finally:
+            subscription.close()
+
+    # X-Accel-Buffering tells nginx to pass events on at once instead of buffering the response.
+    return Response(stream_with_context(generate()), status=status.OK, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 def handle_internal_error(func):
     """ Define the decorator for Flask API functions to log unhandled exceptions.
     """
     def error_handler(*args, **kwargs):
         try:
             return func(*args, **kwargs)
+        except ServiceUnavailableError as e:
+            logger.info(f'Service unavailable when handling {func.__name__} request: {e}')
+            response = app_response(status.SERVICE_UNAVAILABLE, message="Service unavailable")
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
         except:
             logger.info(f'An exception happened when handling {func.__name__} request: {traceback.format_exc()}')
             return app_response(status.INTERNAL_SERVER_ERROR, message="Internal error")
@@ -111,22 +204,68 @@ def hello_world():
     return "Hello, World!"
 
 
+@app.route("/api/metrics", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/metrics.yml")
+@handle_internal_error
+def metrics():
+    pool_metrics = context.postgres_gateway.pool_metrics()
+    hashing_stats = context.hashing_service.stats()
+    token_cache_stats = context.token_cache.stats()
+    user_cache_stats = context.user_cache.stats() if context.user_cache else None
+    board_event_stats = context.board_events.stats() if context.board_events else None
+    return app_response(
+        status.OK,
+        message="OK",
+        postgres_pool=dict(asdict(pool_metrics), avg_wait_time=pool_metrics.avg_wait_time) if pool_metrics else None,
+        password_hashing=dict(asdict(hashing_stats), avg_time=hashing_stats.avg_time),
+        token_cache=dict(asdict(token_cache_stats), hit_ratio=token_cache_stats.hit_ratio),
+        user_cache=dict(asdict(user_cache_stats), hit_ratio=user_cache_stats.hit_ratio,
+                        avg_latency=user_cache_stats.avg_latency) if user_cache_stats else None,
+        board_events=asdict(board_event_stats) if board_event_stats else None,
+        max_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    )
+
+
 @app.route("/api/user/user/<user_id>", methods=["GET"])
 @jwt_required
 @swag_from("swagger_docs/user_read.yml")
 @handle_internal_error
 def user_read(user_id):
     try:
-        user = read_user_basic(int(user_id), context)
-        return app_response(status.OK, message="OK", **user)
+        fields = request.args.get("fields", None)
+        read_request = UserReadRequest(user_id=int(user_id), fields=fields.split(",") if fields is not None else None)
     except ValueError:
         return app_response(status.BAD_REQUEST, message="Invalid user id")
+    except BadRequestError:
+        return app_response(status.BAD_REQUEST, message="Invalid fields")
+    try:
+        user = read_user_basic(read_request.user_id, context, read_request.fields)
+        return app_response(status.OK, message="OK", **user)
     except BadRequestError as e:
         return app_response(status.NOT_FOUND, message="User not found")
     except DatabaseQueryError as e:
         return app_response(status.NOT_FOUND, message="Read user error")
 
 
+@app.route("/api/user/users", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/users_read.yml")
+@handle_internal_error
+def users_read():
+    try:
+        ids = request.args.get("ids", "")
+        fields = request.args.get("fields", None)
+        read_request = UsersReadRequest(user_ids=[int(user_id) for user_id in ids.split(",") if user_id],
+                                        fields=fields.split(",") if fields is not None else None)
+    except ValueError:
+        return app_response(status.BAD_REQUEST, message="Invalid user ids")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    users, missing = read_users_basic(read_request.user_ids, context, read_request.fields)
+    return app_response(status.OK, message="OK", users=users, missing=missing)
+
+
 @app.route("/api/user/register", methods=["POST"])
 @swag_from("swagger_docs/user_register.yml")
 @handle_internal_error
@@ -205,11 +344,29 @@ def user_logout():
     user_id = get_jwt_identity()
     if not jti or not user_id:
         return app_response(status.UNAUTHORIZED, message="Unauthorized error")
-    logout_request = LogoutRequest(jti)
+    logout_request = LogoutRequest(jti, user_id)
     logout(logout_request, context)
     return app_response(status.OK, message="OK")
 
 
+@app.route("/api/user/sessions", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/user_sessions_read.yml")
+@handle_internal_error
+def user_sessions_read():
+    sessions = list_sessions(get_jwt_identity(), context)
+    return app_response(status.OK, message="OK", sessions=sessions)
+
+
+@app.route("/api/user/sessions", methods=["DELETE"])
+@jwt_required
+@swag_from("swagger_docs/user_sessions_revoke.yml")
+@handle_internal_error
+def user_sessions_revoke():
+    revoke_all_sessions(get_jwt_identity(), context)
+    return app_response(status.OK, message="OK")
+
+
 @app.route("/api/user/update", methods=["POST"])
 @jwt_required
 @swag_from("swagger_docs/user_update.yml")
@@ -242,18 +399,343 @@ def user_update_secret():
         return app_response(status.UNAUTHORIZED, "Unauthorized error: user not found")
 
 
+@app.route("/api/projects", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/projects_list.yml")
+@handle_internal_error
+def projects_list():
+    try:
+        team_id = request.args.get("team_id", None)
+        list_request = ProjectListRequest(user_id=get_jwt_identity(),
+                                          team_id=int(team_id) if team_id is not None else None,
+                                          limit=int(request.args.get("limit", DEFAULT_PAGE_SIZE)),
+                                          cursor=request.args.get("cursor", None))
+        projects, next_cursor = list_projects(list_request, context)
+        return app_response(status.OK, message="OK", projects=projects, next_cursor=next_cursor)
+    except ValueError:
+        return app_response(status.BAD_REQUEST, message="Invalid team id or limit")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Team not found")
+
+
 @app.route("/api/project/<project_id>", methods=["GET"])
+@jwt_required
 @swag_from("swagger_docs/project_read.yml")
 @handle_internal_error
 def project_read(project_id):
-    return app_response(status.FORBIDDEN, message=UNSUPPORTED)
+    try:
+        project = read_project(int(project_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="OK", **project)
+    except ValueError:
+        return app_response(status.BAD_REQUEST, message="Invalid project id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Project not found")
 
 
-@app.route("/api/project/create", methods=["POST"])
+@app.route("/api/project/<project_id>/tree", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/project_tree.yml")
+@handle_internal_error
+def project_tree(project_id):
+    try:
+        tree = read_project_tree(int(project_id), get_jwt_identity(), context)
+        return json_text_response(status.OK, "OK", "project", tree)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid project id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Project not found")
+
+
+@app.route("/api/project/<project_id>/export", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/project_export.yml")
 @handle_internal_error
+def project_export(project_id):
+    try:
+        export_request = ProjectExportRequest(project_id=int(project_id), fmt=request.args.get("format", "ndjson"),
+                                              after=int(request.args.get("after", 0)))
+    except ValueError:
+        return app_response(status.BAD_REQUEST, message="Invalid project id or story id cursor")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    try:
+        rows = export_project_rows(export_request, get_jwt_identity(), context)
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Project not found")
+    return stream_response(rows, fmt=export_request.fmt)
+
+
+@app.route("/api/project/create", methods=["POST"])
+@jwt_required
 @swag_from("swagger_docs/project_create.yml")
+@handle_internal_error
 def project_create():
-    return app_response(status.FORBIDDEN, message=UNSUPPORTED)
+    try:
+        content = request.get_json(force=True)
+        create_request = ProjectCreateRequest(
+            admin_id=get_jwt_identity(),
+            project_name=content["project_name"],
+            project_type=content.get("project_type", ProjectType.PERSONAL.value),
+            project_note=content.get("project_note", None),
+            project_public=content.get("public", False),
+            team_id=content.get("team_id", None),
+        )
+        project_id = create_project(create_request, context)
+        return app_response(status.CREATED, message="OK", project_id=project_id)
+    except (KeyError, TypeError, AttributeError):
+        return app_response(status.BAD_REQUEST, message="Invalid request")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+
+
+@app.route("/api/project/<project_id>/stories/search", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/stories_search.yml")
+@handle_internal_error
+def stories_search(project_id):
+    try:
+        search_request = StorySearchRequest(project_id=int(project_id), user_id=get_jwt_identity(),
+                                             text=request.args.get("q", ""),
+                                             limit=int(request.args.get("limit", DEFAULT_PAGE_SIZE)),
+                                             cursor=request.args.get("cursor", None))
+        stories, next_cursor = search_stories(search_request, context)
+        return app_response(status.OK, message="OK", stories=stories, next_cursor=next_cursor)
+    except ValueError:
+        return app_response(status.BAD_REQUEST, message="Invalid project id or limit")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Project not found")
+
+
+@app.route("/api/project/<project_id>/flow", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/project_flow.yml")
+@handle_internal_error
+def project_flow(project_id):
+    try:
+        since, until = (request.args.get(name, None) for name in ("since", "until"))
+        flow_request = FlowMetricsRequest(project_id=int(project_id), user_id=get_jwt_identity(),
+                                          since=datetime.fromisoformat(since) if since else None,
+                                          until=datetime.fromisoformat(until) if until else None)
+        return app_response(status.OK, message="OK", **read_flow_metrics(flow_request, context))
+    except ValueError:
+        return app_response(status.BAD_REQUEST, message="Invalid project id, since or until")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Project not found")
+
+
+@app.route("/api/story/create", methods=["POST"])
+@jwt_required
+@swag_from("swagger_docs/story_create.yml")
+@handle_internal_error
+def story_create():
+    try:
+        content = request.get_json(force=True)
+        fields = {field: content[field] for field in StoryUpdateRequest.valid_fields if field in content}
+        create_request = StoryCreateRequest(created_by=get_jwt_identity(), project_id=content["project_id"], **fields)
+        story_id = create_story(create_request, context)
+        return app_response(status.CREATED, message="OK", story_id=story_id)
+    except (KeyError, TypeError, AttributeError):
+        return app_response(status.BAD_REQUEST, message="Invalid request")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Project not found")
+
+
+@app.route("/api/story/<story_id>", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/story_read.yml")
+@handle_internal_error
+def story_read(story_id):
+    try:
+        story = read_story(int(story_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="OK", **story)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid story id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Story not found")
+
+
+@app.route("/api/story/<story_id>/update", methods=["POST"])
+@jwt_required
+@swag_from("swagger_docs/story_update.yml")
+@handle_internal_error
+def story_update(story_id):
+    try:
+        content = request.get_json(force=True)
+        update_request = StoryUpdateRequest(story_id=int(story_id), user_id=get_jwt_identity(), fields=dict(content))
+        story = update_story(update_request, context)
+        return app_response(status.OK, message="Updated", **story)
+    except (ValueError, TypeError, AttributeError):
+        return app_response(status.BAD_REQUEST, message="Invalid request")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Story not found")
+
+
+@app.route("/api/story/<story_id>/move", methods=["POST"])
+@jwt_required
+@swag_from("swagger_docs/story_move.yml")
+@handle_internal_error
+def story_move(story_id):
+    try:
+        content = request.get_json(force=True)
+        move_request = StoryMoveRequest(story_id=int(story_id), user_id=get_jwt_identity(),
+                                        board_id=content.get("board_id", None), after_id=content.get("after_id", None),
+                                        before_id=content.get("before_id", None))
+        story = move_story(move_request, context)
+        return app_response(status.OK, message="Moved", **story)
+    except (ValueError, TypeError, AttributeError):
+        return app_response(status.BAD_REQUEST, message="Invalid request")
+    except BadRequestError as e:
+        return app_response(status.BAD_REQUEST, message=str(e))
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Story not found")
+
+
+@app.route("/api/story/<story_id>/subtree", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/story_subtree.yml")
+@handle_internal_error
+def story_subtree(story_id):
+    try:
+        depth = request.args.get("depth", None)
+        subtree = read_story_subtree(int(story_id), get_jwt_identity(), context,
+                                     max_depth=int(depth) if depth is not None else None)
+        return app_response(status.OK, message="OK", **subtree)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid story id or depth")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Story not found")
+
+
+@app.route("/api/story/<story_id>/ancestors", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/story_ancestors.yml")
+@handle_internal_error
+def story_ancestors(story_id):
+    try:
+        ancestors = read_story_ancestors(int(story_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="OK", **ancestors)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid story id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Story not found")
+
+
+@app.route("/api/story/<story_id>/rollup", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/story_rollup.yml")
+@handle_internal_error
+def story_rollup(story_id):
+    try:
+        rollup = read_story_rollup(int(story_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="OK", **rollup)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid story id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Story not found")
+
+
+@app.route("/api/story/<story_id>", methods=["DELETE"])
+@jwt_required
+@swag_from("swagger_docs/story_delete.yml")
+@handle_internal_error
+def story_delete(story_id):
+    try:
+        delete_story(int(story_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="Deleted")
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid story id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Story not found or has sub-stories")
+
+
+@app.route("/api/board/<board_id>", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/board_read.yml")
+@handle_internal_error
+def board_read(board_id):
+    try:
+        version, document = read_board(int(board_id), get_jwt_identity(), context)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid board id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Board not found")
+    if version is None:
+        return json_text_response(status.OK, "OK", "board", document)
+    # The version is the entity tag, so clients polling with If-None-Match skip unchanged boards.
+    if request.if_none_match.contains(str(version)):
+        response = Response(status=status.NOT_MODIFIED)
+    else:
+        response = json_text_response(status.OK, "OK", "board", document)
+    response.set_etag(str(version))
+    return response
+
+
+@app.route("/api/board/<board_id>/events", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/board_events.yml")
+@handle_internal_error
+def board_events(board_id):
+    if context.board_events is None:
+        return app_response(status.NOT_FOUND, message="Board events are not enabled")
+    try:
+        subscription = subscribe_board(int(board_id), get_jwt_identity(), context)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid board id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Board not found")
+    return event_stream_response(subscription, context.board_events.heartbeat)
+
+
+@app.route("/api/sprint/<sprint_id>/burndown", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/sprint_burndown.yml")
+@handle_internal_error
+def sprint_burndown(sprint_id):
+    try:
+        burndown = read_burndown(int(sprint_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="OK", **burndown)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid sprint id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Sprint not found")
+
+
+@app.route("/api/sprint/<sprint_id>/progress", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/sprint_progress.yml")
+@handle_internal_error
+def sprint_progress(sprint_id):
+    try:
+        progress = read_sprint_progress(int(sprint_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="OK", **progress)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid sprint id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Sprint not found")
+
+
+@app.route("/api/epic/<epic_id>/progress", methods=["GET"])
+@jwt_required
+@swag_from("swagger_docs/epic_progress.yml")
+@handle_internal_error
+def epic_progress(epic_id):
+    try:
+        progress = read_epic_progress(int(epic_id), get_jwt_identity(), context)
+        return app_response(status.OK, message="OK", **progress)
+    except (ValueError, BadRequestError):
+        return app_response(status.BAD_REQUEST, message="Invalid epic id")
+    except DatabaseQueryError:
+        return app_response(status.NOT_FOUND, message="Epic not found")
 
 
 def main():
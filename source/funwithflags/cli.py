@@ -2,19 +2,211 @@
 
 """Console script for funwithflags."""
 import argparse
+import os
 import sys
 
+from funwithflags.definitions import EXPORT_FORMATS, ProjectExportRequest
+from funwithflags.entities import HashingService, calibrate_rounds
+from funwithflags.gateways import Context, PostgresGateway, RedisGateway
+from funwithflags.use_cases import export_project, import_users, read_user_records
 
-def main():
-    """Console script for funwithflags."""
-    parser = argparse.ArgumentParser()
-    parser.add_argument("_", nargs="*")
-    args = parser.parse_args()
 
-    print("Arguments: " + str(args._))
-    print("Replace this message by putting your code into " "funwithflags.cli.main")
+def calibrate_bcrypt(args) -> int:
+    """Measure bcrypt hash latency on this host and print the cost to configure as `rounds` in the [hashing]
+    section of config.ini.
+    """
+    rounds, timings = calibrate_rounds(args.target_ms / 1000, args.min_rounds, args.max_rounds, args.samples)
+    for cost, elapsed in timings:
+        print(f"rounds={cost}: {elapsed * 1000:.1f} ms")
+    print(f"Recommended [hashing] rounds={rounds} for a target of {args.target_ms} ms")
+    return 0
+
+
+def export_project_command(args) -> int:
+    """Stream the backlog of a project to a file or to stdout with COPY, reporting progress and throughput on stderr.
+    An interrupted export is resumed with `--after` set to the last story id reported, appending to the output file.
+    """
+    request = ProjectExportRequest(project_id=args.project_id, fmt=args.format, after=args.after)
+    context = Context(postgres_gateway=PostgresGateway.create(args.config),
+                      redis_gateway=RedisGateway.create(args.config))
+
+    def progress(rows, last_story_id, elapsed):
+        print(f"{rows} rows in {elapsed:.1f} s ({rows / elapsed if elapsed else 0:.0f} rows/s), "
+              f"last story_id={last_story_id}", file=sys.stderr)
+
+    out = open(args.output, "a" if args.after else "w", newline="") if args.output else sys.stdout
+    try:
+        rows = export_project(request, context, out, batch_size=args.batch_size, progress=progress)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {rows} rows of project {args.project_id}", file=sys.stderr)
+    return 0
+
+
+def import_users_command(args) -> int:
+    """Register the users of a CSV or NDJSON file in bulk, reporting progress and throughput on stderr and listing the
+    rejected records. Return 1 if any record was rejected.
+    """
+    fmt = args.format or ("csv" if args.file.endswith(".csv") else "ndjson")
+    context = Context(postgres_gateway=PostgresGateway.create(args.config),
+                      redis_gateway=RedisGateway.create(args.config),
+                      hashing_service=HashingService.create(args.config))
+    if args.rounds is not None:
+        context.hashing_service.rounds = args.rounds
+
+    def progress(report):
+        print(f"{report.imported} users imported, {len(report.rejected)} rejected in {report.elapsed:.1f} s "
+              f"({report.rate:.0f} users/s)", file=sys.stderr)
+
+    with open(args.file, newline="") as source:
+        report = import_users(read_user_records(source, fmt), context, workers=args.workers,
+                              batch_size=args.batch_size, progress=progress)
+    for record_num, reason in report.rejected:
+        print(f"Rejected record at line {record_num}: {reason}", file=sys.stderr)
+    progress(report)
+    return 1 if report.rejected else 0
+
+
+def rebuild_burndown_command(args) -> int:
+    """Recompute the burndown aggregate of a sprint, or of all sprints, from their stories, or with `--check` only
+    report the totals that differ from a full recompute. Return 1 if `--check` found a difference.
+    """
+    gateway = PostgresGateway.create(args.config)
+    if args.check:
+        drift = gateway.check_burndown(args.sprint_id)
+        for sprint_id, status, estimate, stories, expected_estimate, expected_stories in drift:
+            print(f"Sprint {sprint_id} status {status}: estimate {estimate} stories {stories}, recomputed estimate "
+                  f"{expected_estimate} stories {expected_stories}", file=sys.stderr)
+        print(f"{len(drift)} burndown totals differ from the stories", file=sys.stderr)
+        return 1 if drift else 0
+    rows = gateway.rebuild_burndown(args.sprint_id)
+    print(f"Rebuilt the burndown with {rows} daily rows", file=sys.stderr)
+    return 0
+
+
+def rebuild_wip_command(args) -> int:
+    """Backfill the board times of the stories and recompute the work in progress counters of the boards, or with
+    `--check` only report the counters that differ from a full recompute. Return 1 if `--check` found a difference.
+    """
+    gateway = PostgresGateway.create(args.config)
+    if args.check:
+        drift = gateway.check_wip()
+        for board_id, stories, entered, expected_stories, expected_entered in drift:
+            print(f"Board {board_id}: stories {stories} entered {entered}, recomputed stories {expected_stories} "
+                  f"entered {expected_entered}", file=sys.stderr)
+        print(f"{len(drift)} work in progress counters differ from the stories", file=sys.stderr)
+        return 1 if drift else 0
+    boards = gateway.rebuild_wip()
+    print(f"Rebuilt the work in progress of {boards} boards", file=sys.stderr)
+    return 0
+
+
+def check_rollups_command(args) -> int:
+    """Report the totals of the epic and sprint rollups that differ from a full recompute from the stories, and with
+    `--repair` recompute them. Return 1 if a difference was found and not repaired.
+    """
+    gateway = PostgresGateway.create(args.config)
+    drift = gateway.repair_rollups() if args.repair else gateway.check_rollups()
+    for key, key_id, status, estimate, stories, expected_estimate, expected_stories in drift:
+        print(f"{key.capitalize()} {key_id} status {status}: estimate {estimate} stories {stories}, recomputed "
+              f"estimate {expected_estimate} stories {expected_stories}", file=sys.stderr)
+    print(f"{len(drift)} rollup totals {'repaired' if args.repair else 'differ from the stories'}", file=sys.stderr)
+    return 1 if drift and not args.repair else 0
+
+
+def rebuild_story_closure_command(args) -> int:
+    """Recompute the closure of the story hierarchy from the parents of the stories, e.g. to backfill it, or with
+    `--check` only report the closure rows that differ from a full recompute. Return 1 if `--check` found a difference.
+    """
+    gateway = PostgresGateway.create(args.config)
+    if args.check:
+        drift = gateway.check_story_closure()
+        for ancestor_id, descendant_id, depth, expected_depth in drift:
+            print(f"Story {descendant_id} below story {ancestor_id}: depth {depth}, recomputed depth {expected_depth}",
+                  file=sys.stderr)
+        print(f"{len(drift)} closure rows differ from the story parents", file=sys.stderr)
+        return 1 if drift else 0
+    rows = gateway.rebuild_story_closure()
+    print(f"Rebuilt the story hierarchy with {rows} closure rows", file=sys.stderr)
     return 0
 
 
+def rebalance_ranks_command(args) -> int:
+    """Respace the ranks of the stories of a board evenly, keeping their order. Without a board, rank the stories of
+    every board that has unranked stories, e.g. stories created before board ranks existed, after its ranked ones.
+    """
+    gateway = PostgresGateway.create(args.config)
+    board_ids = [args.board_id] if args.board_id is not None else gateway.read_unranked_boards()
+    for board_id in board_ids:
+        stories = gateway.rebalance_board_ranks(board_id)
+        print(f"Rebalanced the ranks of {stories} stories of board {board_id}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    """Console script for funwithflags."""
+    parser = argparse.ArgumentParser(prog="funwithflags")
+    subparsers = parser.add_subparsers(dest="command")
+
+    calibrate = subparsers.add_parser("calibrate-bcrypt", help="pick the bcrypt cost meeting a target hash latency")
+    calibrate.add_argument("--target-ms", type=float, default=250, help="target hash latency in milliseconds")
+    calibrate.add_argument("--min-rounds", type=int, default=10)
+    calibrate.add_argument("--max-rounds", type=int, default=16)
+    calibrate.add_argument("--samples", type=int, default=3, help="measurements per cost, the best one is kept")
+    calibrate.set_defaults(func=calibrate_bcrypt)
+
+    export = subparsers.add_parser("export-project", help="stream the backlog of a project as NDJSON or CSV")
+    export.add_argument("project_id", type=int)
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    export.add_argument("--after", type=int, default=0, help="resume after this story id, appending to the output")
+    export.add_argument("--batch-size", type=int, default=10000, help="stories copied per batch")
+    export.add_argument("--output", help="output file, stdout by default")
+    export.add_argument("--config", default="config.ini", help="config file with the postgresql section")
+    export.set_defaults(func=export_project_command)
+
+    importer = subparsers.add_parser("import-users", help="register users in bulk from a CSV or NDJSON file")
+    importer.add_argument("file", help="users with username, nickname, email and password fields")
+    importer.add_argument("--format", choices=("csv", "ndjson"), help="file format, from the file extension by default")
+    importer.add_argument("--workers", type=int, default=os.cpu_count(), help="password hashing processes")
+    importer.add_argument("--batch-size", type=int, default=1000, help="users loaded per COPY")
+    importer.add_argument("--rounds", type=int, help="bcrypt cost, the [hashing] rounds of the config by default")
+    importer.add_argument("--config", default="config.ini", help="config file with the postgresql section")
+    importer.set_defaults(func=import_users_command)
+
+    burndown = subparsers.add_parser("rebuild-burndown", help="recompute sprint burndowns from the stories")
+    burndown.add_argument("--sprint-id", type=int, help="sprint to rebuild, all sprints by default")
+    burndown.add_argument("--check", action="store_true", help="only report totals differing from a recompute")
+    burndown.add_argument("--config", default="config.ini", help="config file with the postgresql section")
+    burndown.set_defaults(func=rebuild_burndown_command)
+
+    wip = subparsers.add_parser("rebuild-wip", help="backfill story board times and recompute the work in progress")
+    wip.add_argument("--check", action="store_true", help="only report counters differing from a recompute")
+    wip.add_argument("--config", default="config.ini", help="config file with the postgresql section")
+    wip.set_defaults(func=rebuild_wip_command)
+
+    rollups = subparsers.add_parser("check-rollups", help="detect drift of the epic and sprint rollups")
+    rollups.add_argument("--repair", action="store_true", help="recompute the totals found to differ")
+    rollups.add_argument("--config", default="config.ini", help="config file with the postgresql section")
+    rollups.set_defaults(func=check_rollups_command)
+
+    closure = subparsers.add_parser("rebuild-story-closure", help="recompute the story hierarchy from story parents")
+    closure.add_argument("--check", action="store_true", help="only report closure rows differing from a recompute")
+    closure.add_argument("--config", default="config.ini", help="config file with the postgresql section")
+    closure.set_defaults(func=rebuild_story_closure_command)
+
+    rebalance = subparsers.add_parser("rebalance-ranks", help="respace the story ranks of a board, keeping their order")
+    rebalance.add_argument("board_id", type=int, nargs="?",
+                           help="board to rebalance, by default every board with unranked stories")
+    rebalance.add_argument("--config", default="config.ini", help="config file with the postgresql section")
+    rebalance.set_defaults(func=rebalance_ranks_command)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    return args.func(args)
+
+
 if __name__ == "__main__":
     sys.exit(main())  # pragma: no cover
@@ -1,6 +1,12 @@
 """Initialize the package."""
-from .constants import ACCESS_EXPIRES, REFRESH_EXPIRES
-from .exceptions import ApplicationError, BadRequestError, DatabaseQueryError, InternalError
-from .requests import RegisterRequest, LoginRequest, LogoutRequest, FreshLoginRequest, UserUpdateRequest
+from .constants import (ACCESS_EXPIRES, DEFAULT_PAGE_SIZE, EXPORT_FORMATS, FLOW_WINDOW, MAX_BULK_USER_IDS,
+                        MAX_FLOW_WINDOW, MAX_PAGE_SIZE, REFRESH_EXPIRES, ProjectType, StoryStatus, TokenPolicy)
+from .exceptions import ApplicationError, BadRequestError, DatabaseQueryError, InternalError, ServiceUnavailableError
+from .requests import (RegisterRequest, LoginRequest, LogoutRequest, FreshLoginRequest, UserReadRequest,
+                       UsersReadRequest, UserUpdateRequest, ProjectCreateRequest, ProjectExportRequest,
+                       ProjectListRequest, FlowMetricsRequest, StoryCreateRequest, StoryMoveRequest,
+                       StorySearchRequest, StoryUpdateRequest)
 from .requests import validate_email, validate_password
+from .project import Project
+from .story import Story
 from .user import User
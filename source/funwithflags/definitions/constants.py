@@ -1,5 +1,41 @@
 """Definition of constant values."""
 from datetime import timedelta
+from enum import Enum, IntEnum
 
 ACCESS_EXPIRES = timedelta(minutes=10)
 REFRESH_EXPIRES = timedelta(days=7)
+MAX_BULK_USER_IDS = 100
+EXPORT_FORMATS = ("ndjson", "csv")
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+FLOW_WINDOW = timedelta(days=30)
+MAX_FLOW_WINDOW = timedelta(days=366)
+
+
+class ProjectType(Enum):
+    """Owner of a project: a user for PERSONAL projects, a team for TEAM projects."""
+
+    PERSONAL = "personal"
+    TEAM = "team"
+
+
+class StoryStatus(IntEnum):
+    """Workflow status of a story, stored as an integer. A story is closed once DONE."""
+
+    TODO = 0
+    IN_PROGRESS = 1
+    IN_REVIEW = 2
+    DONE = 3
+
+
+class TokenPolicy(Enum):
+    """Policy deciding which issued tokens have their jti state stored in Redis.
+
+    STATELESS: no issued token is stored, only logged out refresh tokens are, unknown tokens are valid.
+    REFRESH: refresh tokens are stored, the only ones checked against the blacklist, unknown tokens are revoked.
+    ALL: access and refresh tokens are stored, unknown tokens are revoked.
+    """
+
+    STATELESS = "stateless"
+    REFRESH = "refresh"
+    ALL = "all"
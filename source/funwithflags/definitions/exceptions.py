@@ -16,3 +16,11 @@ class BadRequestError(ApplicationError):
 
 class InternalError(ApplicationError):
     """Exception of unexpected internal error."""
+
+
+class ServiceUnavailableError(ApplicationError):
+    """Exception of a saturated or unavailable resource, the request may be retried after `retry_after` seconds."""
+
+    def __init__(self, message: str = "", retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,20 @@
+"""Module defining the Project class."""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass
+class Project:
+    """Class representing a Project, owned by a user if personal or by a team otherwise.
+    """
+
+    project_id: int = -1
+    project_name: str = ""
+    project_note: Optional[str] = None
+    project_type: str = "personal"
+    project_public: bool = False
+    user_id: Optional[int] = None
+    team_id: Optional[int] = None
+    admin_id: int = -1
+    created_at: Optional[datetime] = None
@@ -1,8 +1,11 @@
 """Module for user signup request."""
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 import re
-from typing import Mapping
+from typing import Mapping, Optional, Sequence
 
+from .constants import (DEFAULT_PAGE_SIZE, EXPORT_FORMATS, FLOW_WINDOW, MAX_BULK_USER_IDS, MAX_FLOW_WINDOW,
+                        MAX_PAGE_SIZE, ProjectType, StoryStatus)
 from .exceptions import BadRequestError
 
 
@@ -43,6 +46,199 @@ class RegisterRequest:
             raise BadRequestError("Invalid username, email or password")
 
 
+@dataclass
+class UserReadRequest:
+    user_id: int
+    fields: Optional[Sequence[str]] = None
+
+    def __post_init__(self):
+        if self.fields is None:
+            self.fields = list(UserReadRequest.public_fields)
+        elif len(self.fields) == 0 or not set(self.fields).issubset(UserReadRequest.public_fields):
+            raise BadRequestError("Invalid fields")
+
+    public_fields = ("userid", "username", "nickname", "email", "created_at")
+
+
+@dataclass
+class UsersReadRequest:
+    user_ids: Sequence[int]
+    fields: Optional[Sequence[str]] = None
+
+    def __post_init__(self):
+        if (
+            len(self.user_ids) == 0
+            or len(self.user_ids) > MAX_BULK_USER_IDS
+            or any(user_id <= 0 for user_id in self.user_ids)
+        ):
+            raise BadRequestError(f"Invalid user ids, at most {MAX_BULK_USER_IDS} ids are allowed")
+        self.fields = UserReadRequest(user_id=self.user_ids[0], fields=self.fields).fields
+
+
+@dataclass
+class ProjectCreateRequest:
+    admin_id: int
+    project_name: str
+    project_type: str = ProjectType.PERSONAL.value
+    project_note: Optional[str] = None
+    project_public: bool = False
+    team_id: Optional[int] = None
+
+    def __post_init__(self):
+        if not isinstance(self.project_name, str) or not 0 < len(self.project_name) <= 128:
+            raise BadRequestError("Invalid project name")
+        if self.project_type not in {project_type.value for project_type in ProjectType}:
+            raise BadRequestError("Invalid project type")
+        if (self.project_type == ProjectType.TEAM.value) != (self.team_id is not None):
+            raise BadRequestError("Team projects, and only them, need a team id")
+        if self.project_note is not None and not isinstance(self.project_note, str):
+            raise BadRequestError("Invalid project note")
+        if not isinstance(self.project_public, bool):
+            raise BadRequestError("Invalid project public flag")
+
+
+@dataclass
+class ProjectListRequest:
+    user_id: int
+    team_id: Optional[int] = None
+    limit: int = DEFAULT_PAGE_SIZE
+    cursor: Optional[str] = None
+
+    def __post_init__(self):
+        if not 0 < self.limit <= MAX_PAGE_SIZE:
+            raise BadRequestError(f"Invalid limit, at most {MAX_PAGE_SIZE} projects per page are allowed")
+        if self.team_id is not None and self.team_id <= 0:
+            raise BadRequestError("Invalid team id")
+
+
+@dataclass
+class ProjectExportRequest:
+    project_id: int
+    fmt: str = "ndjson"
+    after: int = 0
+
+    def __post_init__(self):
+        if self.project_id <= 0 or self.after < 0:
+            raise BadRequestError("Invalid project id or story id cursor")
+        if self.fmt not in EXPORT_FORMATS:
+            raise BadRequestError(f"Invalid format, expected one of {', '.join(EXPORT_FORMATS)}")
+
+
+@dataclass
+class FlowMetricsRequest:
+    project_id: int
+    user_id: int
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    def __post_init__(self):
+        if not isinstance(self.project_id, int) or self.project_id <= 0:
+            raise BadRequestError("Invalid project id")
+        self.until = self.until or datetime.now()
+        self.since = self.since or self.until - FLOW_WINDOW
+        if not timedelta(0) < self.until - self.since <= MAX_FLOW_WINDOW:
+            raise BadRequestError(f"Invalid window, since must be before until by at most {MAX_FLOW_WINDOW.days} days")
+
+
+@dataclass
+class StoryCreateRequest:
+    created_by: int
+    project_id: int
+    story_name: str
+    story_type: int = 0
+    status: int = StoryStatus.TODO.value
+    estimate: Optional[int] = None
+    board_id: Optional[int] = None
+    epic_id: Optional[int] = None
+    assignee: Optional[int] = None
+    reporter: Optional[int] = None
+    description: Optional[str] = None
+    priority: Optional[int] = None
+    parent_story: Optional[int] = None
+    sprint_id: Optional[int] = None
+
+    def __post_init__(self):
+        if not isinstance(self.project_id, int) or self.project_id <= 0:
+            raise BadRequestError("Invalid project id")
+        validate_story_fields({field: value for field, value in vars(self).items()
+                               if field in StoryUpdateRequest.valid_fields})
+
+
+@dataclass
+class StoryUpdateRequest:
+    story_id: int
+    user_id: int
+    fields: Mapping[str, object]
+
+    def __post_init__(self):
+        if not isinstance(self.story_id, int) or self.story_id <= 0:
+            raise BadRequestError("Invalid story id")
+        if not self.fields or not set(self.fields).issubset(StoryUpdateRequest.valid_fields):
+            raise BadRequestError(f"Invalid fields, expected some of {', '.join(StoryUpdateRequest.valid_fields)}")
+        validate_story_fields(self.fields)
+
+    valid_fields = ("story_name", "story_type", "status", "estimate", "board_id", "epic_id", "assignee", "reporter",
+                    "description", "priority", "parent_story", "sprint_id")
+
+
+@dataclass
+class StoryMoveRequest:
+    story_id: int
+    user_id: int
+    board_id: Optional[int] = None
+    after_id: Optional[int] = None
+    before_id: Optional[int] = None
+
+    def __post_init__(self):
+        if not isinstance(self.story_id, int) or self.story_id <= 0:
+            raise BadRequestError("Invalid story id")
+        for field in ("board_id", "after_id", "before_id"):
+            value = getattr(self, field)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+                raise BadRequestError(f"Invalid {field.replace('_', ' ')}")
+        if self.after_id is not None and self.before_id is not None:
+            raise BadRequestError("Expected at most one of after id and before id")
+        if self.story_id in (self.after_id, self.before_id):
+            raise BadRequestError("A story can't be moved next to itself")
+
+
+@dataclass
+class StorySearchRequest:
+    project_id: int
+    user_id: int
+    text: str
+    limit: int = DEFAULT_PAGE_SIZE
+    cursor: Optional[str] = None
+
+    def __post_init__(self):
+        if not isinstance(self.project_id, int) or self.project_id <= 0:
+            raise BadRequestError("Invalid project id")
+        if not isinstance(self.text, str) or not 0 < len(self.text.strip()) <= 256:
+            raise BadRequestError("Invalid search text, at most 256 characters are allowed")
+        if not 0 < self.limit <= MAX_PAGE_SIZE:
+            raise BadRequestError(f"Invalid limit, at most {MAX_PAGE_SIZE} stories per page are allowed")
+
+
+def validate_story_fields(fields: Mapping[str, object]) -> None:
+    """Raise BadRequestError if any of the story `fields` has an invalid value. Fields other than the name, type,
+    status and description are nullable integers.
+    """
+    for field, value in fields.items():
+        if field == "story_name":
+            valid = isinstance(value, str) and 0 < len(value) <= 128
+        elif field == "description":
+            valid = value is None or isinstance(value, str)
+        elif field == "status":
+            valid = value in {status.value for status in StoryStatus}
+        elif field == "story_type":
+            valid = isinstance(value, int) and value >= 0
+        else:
+            valid = value is None or (isinstance(value, int) and not isinstance(value, bool) and
+                                      (value > 0 or field in ("estimate", "priority") and value == 0))
+        if not valid:
+            raise BadRequestError(f"Invalid story {field.replace('_', ' ')}")
+
+
 @dataclass
 class LoginRequest:
     username: str
@@ -52,6 +248,7 @@ class LoginRequest:
 @dataclass
 class LogoutRequest:
     jti:     str
+    user_id: Optional[int] = None
 
 
 @dataclass
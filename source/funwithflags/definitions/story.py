@@ -0,0 +1,31 @@
+"""Module defining the Story class."""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+
+@dataclass
+class Story:
+    """Class representing a Story of a project, on a board of the project or in its backlog if `board_id` is None.
+    """
+
+    story_id: int = -1
+    story_name: str = ""
+    story_type: int = 0
+    status: int = 0
+    estimate: Optional[int] = None
+    created_at: Optional[datetime] = None
+    created_by: Optional[int] = None
+    closed_at: Optional[datetime] = None
+    closed_by: Optional[int] = None
+    project_id: int = -1
+    board_id: Optional[int] = None
+    board_history: Optional[List[int]] = None
+    epic_id: Optional[int] = None
+    assignee: Optional[int] = None
+    reporter: Optional[int] = None
+    description: Optional[str] = None
+    priority: Optional[int] = None
+    parent_story: Optional[int] = None
+    sprint_id: Optional[int] = None
+    board_rank: Optional[str] = None
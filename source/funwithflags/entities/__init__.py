@@ -1,3 +1,8 @@
 """Initialize the package."""
-from .auth import hash_password_with_salt, generate_salt_hash_password
+from .auth import (hash_password_with_salt, generate_salt_hash_password, get_hash_rounds, calibrate_rounds,
+                   measure_hash_time)
 from .db_util import generate_update_params, read_config_file
+from .hashing_service import HashingService, HashingStats
+from .pagination import decode_cursor, encode_cursor
+from .rank import RANK_DIGITS, rank_between, spread_ranks
+from .ttl_cache import CacheStats, TTLCache
@@ -1,13 +1,62 @@
 """Module for authentication utilities."""
+from time import perf_counter
+from typing import List, Optional, Tuple
+
 import bcrypt
 
 
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
 def hash_password_with_salt(password: str, salt: bytes) -> bytes:
     """Hash a password string with a salt bytes."""
     return bcrypt.hashpw(bytes(password.encode()), salt)
 
 
-def generate_salt_hash_password(password: str) -> (bytes, bytes):
-    """Hash a password string with generated salt, return a 'bytes' hashed password and the 'bytes' salt."""
-    salt = bcrypt.gensalt()
+def generate_salt_hash_password(password: str, rounds: Optional[int] = None) -> (bytes, bytes):
+    """Hash a password string with generated salt, return a 'bytes' hashed password and the 'bytes' salt. The salt is
+    generated with `rounds` as bcrypt cost, or with the library default if `rounds` is None.
+    """
+    salt = bcrypt.gensalt(rounds) if rounds is not None else bcrypt.gensalt()
     return hash_password_with_salt(password, salt), salt
+
+
+def get_hash_rounds(salt: bytes) -> int:
+    """Return the bcrypt cost encoded in a salt or hashed password, e.g. 12 for b"$2b$12$...". Raise ValueError if
+    `salt` is not a bcrypt salt.
+    """
+    parts = bytes(salt).split(b"$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        raise ValueError("Invalid bcrypt salt")
+    return int(parts[2])
+
+
+def measure_hash_time(rounds: int, samples: int = 3, password: str = "CalibrationPassword1@") -> float:
+    """Return the best of `samples` measured times, in seconds, of hashing a password with bcrypt cost `rounds`."""
+    salt = bcrypt.gensalt(rounds)
+    timings = []
+    for _ in range(samples):
+        start = perf_counter()
+        hash_password_with_salt(password, salt)
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def calibrate_rounds(target_seconds: float, min_rounds: int = MIN_ROUNDS, max_rounds: int = 16,
+                     samples: int = 3) -> Tuple[int, List[Tuple[int, float]]]:
+    """Measure bcrypt hash latency on this host and return the highest cost between `min_rounds` and `max_rounds`
+    whose hash time stays within `target_seconds`, together with the measured (rounds, seconds) pairs. Each extra round
+    doubles the hash time, so measuring stops at the first cost over the target.
+    """
+    if not MIN_ROUNDS <= min_rounds <= max_rounds <= MAX_ROUNDS:
+        raise ValueError(f"Invalid rounds range: {min_rounds} to {max_rounds}")
+    chosen = min_rounds
+    timings = []
+    for rounds in range(min_rounds, max_rounds + 1):
+        elapsed = measure_hash_time(rounds, samples)
+        timings.append((rounds, elapsed))
+        if elapsed > target_seconds:
+            break
+        chosen = rounds
+    return chosen, timings
@@ -4,9 +4,10 @@ from typing import List, Mapping
 
 
 def read_config_file(
-    filename: str = "config.ini", section: str = "postgresql"
+    filename: str = "config.ini", section: str = "postgresql", required: bool = True
 ) -> Mapping[str, str]:
-    """Read configuration file and return a dictionary mapping from field name to field value.
+    """Read configuration file and return a dictionary mapping from field name to field value. If the section is
+    missing, raise an exception if `required`, otherwise return an empty dictionary.
     """
     parser = ConfigParser()
     parser.read(filename)
@@ -15,7 +16,7 @@ def read_config_file(
         params = parser.items(section)
         for param in params:
             db[param[0]] = param[1]
-    else:
+    elif required:
         raise Exception(
             f"{filename} does not have section {section}, sections are {parser.sections()}"
         )
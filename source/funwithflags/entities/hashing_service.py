@@ -0,0 +1,168 @@
+"""Module for the password hashing service."""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+import logging
+import threading
+from time import monotonic
+from typing import Any, Callable, Optional
+
+from funwithflags.definitions import ServiceUnavailableError
+from .auth import generate_salt_hash_password, get_hash_rounds, hash_password_with_salt
+from .db_util import read_config_file
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HashingStats:
+    """Snapshot of password hashing timings, in seconds.
+    """
+
+    calls: int = 0
+    rejected: int = 0
+    timeouts: int = 0
+    pending: int = 0
+    total_time: float = 0.0
+    total_queue_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+def _timed_call(func: Callable, *args) -> (Any, float):
+    """Run `func` in a pool worker and return its result together with the time spent computing it."""
+    start = monotonic()
+    result = func(*args)
+    return result, monotonic() - start
+
+
+class HashingService:
+    """Service running bcrypt password hashing off the request thread. Hashes are computed by a pool of `workers`
+    processes, or inline in the calling thread if `workers` is 0. At most `max_pending` hashes are queued or running
+    at a time, further calls are rejected with `ServiceUnavailableError` instead of piling up behind the pool.
+    New salts are generated with bcrypt cost `rounds`, or the library default if None.
+    """
+
+    def __init__(self, workers: int = 0, max_pending: int = 16, timeout: float = 5.0, retry_after: int = 1,
+                 rounds: Optional[int] = None):
+        self._workers = workers
+        self.rounds = rounds
+        self._timeout = timeout
+        self._retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = HashingStats()
+
+    def hash_password(self, password: str, salt: bytes) -> bytes:
+        """Hash a password string with a salt bytes."""
+        return self._run(hash_password_with_salt, password, salt)
+
+    def generate_salt_hash_password(self, password: str) -> (bytes, bytes):
+        """Hash a password string with generated salt, return a 'bytes' hashed password and the 'bytes' salt."""
+        return self._run(generate_salt_hash_password, password, self.rounds)
+
+    def needs_rehash(self, salt: bytes) -> bool:
+        """Return true if `salt` was generated with a bcrypt cost below the configured one. Stronger hashes are kept, so
+        lowering the cost never downgrades them.
+        """
+        if self.rounds is None:
+            return False
+        try:
+            return get_hash_rounds(salt) < self.rounds
+        except ValueError:
+            return False
+
+    def stats(self) -> HashingStats:
+        """Return a snapshot of the hashing statistics."""
+        with self._lock:
+            return HashingStats(**vars(self._stats))
+
+    def shutdown(self) -> None:
+        """Shut down the worker processes, if any."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so worker processes are forked from the serving process, not from a pre-fork master.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+            return self._executor
+
+    def _reset_executor(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _release(self, _=None) -> None:
+        with self._lock:
+            self._stats.pending -= 1
+        self._slots.release()
+
+    def _run(self, func: Callable, *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats.rejected += 1
+            raise ServiceUnavailableError("Password hashing queue is full", retry_after=self._retry_after)
+        with self._lock:
+            self._stats.pending += 1
+        start = monotonic()
+        if self._workers <= 0:
+            try:
+                result, compute_time = _timed_call(func, *args)
+            finally:
+                self._release()
+        else:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_timed_call, func, *args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._release()
+                self._reset_executor(executor)
+                raise ServiceUnavailableError(f"Password hashing pool unavailable: {e}", retry_after=self._retry_after)
+            # The slot is only freed once the worker is done, so abandoned hashes still count against the bound.
+            future.add_done_callback(self._release)
+            try:
+                result, compute_time = future.result(timeout=self._timeout)
+            except TimeoutError:
+                with self._lock:
+                    self._stats.timeouts += 1
+                raise ServiceUnavailableError("Password hashing timed out", retry_after=self._retry_after)
+            except BrokenProcessPool as e:
+                self._reset_executor(executor)
+                raise ServiceUnavailableError(f"Password hashing pool unavailable: {e}", retry_after=self._retry_after)
+        elapsed = monotonic() - start
+        with self._lock:
+            self._stats.calls += 1
+            self._stats.total_time += elapsed
+            self._stats.total_queue_time += elapsed - compute_time
+            self._stats.max_time = max(self._stats.max_time, elapsed)
+        logger.debug(f"HashingService {func.__name__} took {elapsed:.3f}s, {elapsed - compute_time:.3f}s queued.")
+        return result
+
+    @staticmethod
+    def create(filename="config.ini") -> "HashingService":
+        """Factory method to create a `HashingService` object. Hashing runs inline if the config file has no
+        "hashing" section.
+        """
+        section = "hashing"
+        config = read_config_file(filename, section, required=False)
+        try:
+            return HashingService(
+                workers=int(config.get("workers", 0)),
+                max_pending=int(config.get("max_pending", 16)),
+                timeout=float(config.get("timeout", 5.0)),
+                retry_after=int(config.get("retry_after", 1)),
+                rounds=int(config["rounds"]) if "rounds" in config else None,
+            )
+        except ValueError as e:
+            logger.error(f"Invalid config file \"{filename}\" section \"{section}\": {e}")
+            raise e
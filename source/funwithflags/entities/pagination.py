@@ -0,0 +1,27 @@
+"""Utility module for keyset pagination cursors."""
+import base64
+from datetime import datetime
+import json
+from typing import Any, Tuple
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key `values` of the last row of a page into an opaque cursor string, datetime values in ISO
+    format.
+    """
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types: type) -> Tuple:
+    """Decode a `cursor` string of `encode_cursor` into a tuple of values of the given `types`. Raise ValueError if
+    the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(f"Expected {len(types)} values")
+        return tuple(datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+                     for value_type, value in zip(types, values))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor}: {e}")
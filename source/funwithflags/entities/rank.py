@@ -0,0 +1,69 @@
+"""Utility module for lexicographic ranks ordering the items of a list, so moving an item only changes its own rank.
+
+A rank is a string of base 62 digits read as the fraction digits of a number between 0 and 1, without trailing zeros,
+so ranks compare like these numbers both as Python strings and as Postgres text in the "C" collation.
+"""
+import random
+from typing import List, Optional
+
+RANK_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_BASE = len(RANK_DIGITS)
+
+
+def _validate_rank(rank: str) -> None:
+    if not rank or rank[-1] == RANK_DIGITS[0] or any(digit not in RANK_DIGITS for digit in rank):
+        raise ValueError(f"Invalid rank {rank!r}")
+
+
+def _midpoint(low: str, high: Optional[str]) -> str:
+    """Return the shortest rank between `low`, "" being 0, and `high`, None being 1, with low < high."""
+    if high is not None:
+        common = 0
+        while (low[common] if common < len(low) else RANK_DIGITS[0]) == high[common]:
+            common += 1
+        if common > 0:
+            return high[:common] + _midpoint(low[common:], high[common:])
+    digit_low = RANK_DIGITS.index(low[0]) if low else 0
+    digit_high = RANK_DIGITS.index(high[0]) if high is not None else _BASE
+    if digit_high - digit_low > 1:
+        return RANK_DIGITS[(digit_low + digit_high + 1) // 2]
+    if high is not None and len(high) > 1:
+        return high[:1]
+    return RANK_DIGITS[digit_low] + _midpoint(low[1:], None)
+
+
+def rank_between(before: Optional[str], after: Optional[str], jitter: int = 2) -> str:
+    """Return a rank sorting after `before` and before `after`, None meaning the start and the end of the list. Unless
+    `jitter` is 0, that many random digits are appended when the rank stays below `after`, so concurrent moves to the
+    same place almost never get equal ranks. Raise ValueError if a rank is invalid or `before` doesn't sort before
+    `after`.
+    """
+    for rank in (before, after):
+        if rank is not None:
+            _validate_rank(rank)
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Rank {before!r} doesn't sort before {after!r}")
+    rank = _midpoint(before or "", after)
+    if jitter > 0:
+        suffix = "".join(random.choices(RANK_DIGITS, k=jitter - 1)) + random.choice(RANK_DIGITS[1:])
+        if after is None or rank + suffix < after:
+            rank += suffix
+    return rank
+
+
+def spread_ranks(count: int) -> List[str]:
+    """Return `count` increasing ranks of equal length spread evenly over the whole range, leaving room for about
+    `len(RANK_DIGITS)` short ranks between any two of them.
+    """
+    width = 1
+    while _BASE ** width < (count + 1) * _BASE:
+        width += 1
+    step = _BASE ** width // (count + 1)
+    ranks = []
+    for position in range(1, count + 1):
+        value, digits = position * step, []
+        for _ in range(width):
+            value, digit = divmod(value, _BASE)
+            digits.append(RANK_DIGITS[digit])
+        ranks.append("".join(reversed(digits)).rstrip(RANK_DIGITS[0]))
+    return ranks
@@ -0,0 +1,97 @@
+"""Module for the in-process TTL/LRU cache."""
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+from time import monotonic
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    """Snapshot of cache counters.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TTLCache:
+    """Thread-safe in-process cache holding at most `max_size` entries. Entries expire `ttl` seconds after being set
+    and the least recently used entry is evicted when the cache is full. None is a valid cached value, use `lookup`
+    to tell it apart from a miss.
+    """
+
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = monotonic):
+        if max_size < 1 or ttl <= 0:
+            raise ValueError(f"Invalid cache settings: max_size={max_size}, ttl={ttl}")
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return a pair of whether `key` is cached and its value, counting a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._stats.misses += 1
+            return False, None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache `value` for `key` for `ttl` seconds, or the default TTL of the cache if None."""
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def setdefault(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> Any:
+        """Cache `value` for `key` unless a live entry exists already, e.g. one set concurrently while `value` was
+        being loaded. Return the value cached for `key` afterwards.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                return entry[0]
+            self._set(key, value, ttl)
+            return value
+
+    def _set(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        self._entries[key] = (value, self._clock() + (ttl if ttl is not None else self._ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                size=len(self._entries),
+            )
@@ -1,4 +1,12 @@
 """Initialize the package."""
+from .board_cache import BoardCache
+from .board_events import RESYNC_EVENT, STORY_EVENT, BoardEventHub, BoardEventStats, BoardSubscription
+from .connection_pool import ConnectionPool, PoolMetrics
 from .context import Context
-from .db_gateway import PostgresGateway
+from .db_gateway import STORY_EXPORT_COLUMNS, PostgresGateway
+from .rank_rebalancer import RankRebalancer
 from .redis_gateway import RedisGateway
+from .session_registry import SessionRegistry
+from .statement_registry import StatementRegistry
+from .token_cache import TokenStateCache
+from .user_cache import UserCache, UserCacheStats
@@ -0,0 +1,210 @@
+"""Module for the board read model cached in Redis."""
+from datetime import timedelta
+import json
+import logging
+import select
+import threading
+from time import sleep
+from typing import List, Optional, Tuple
+
+import psycopg2
+
+from funwithflags.definitions import DatabaseQueryError
+from funwithflags.entities import read_config_file
+from .db_gateway import PostgresGateway
+from .redis_gateway import RedisGateway
+
+
+logger = logging.getLogger(__name__)
+
+# Postgres notification channel of the boards whose project changed who may read it, see the board schema.
+BOARD_ACCESS_CHANNEL = "board_access"
+# Readers of a public project.
+PUBLIC_READERS = "*"
+
+
+def board_key(board_id: int) -> str:
+    """Return the Redis key of a board document."""
+    return f"board:{board_id}"
+
+
+def board_version_key(board_id: int) -> str:
+    """Return the Redis key of the version counter of a board."""
+    return f"board-version:{board_id}"
+
+
+def pack_board(version: int, project_id: int, readers: str, document: str) -> str:
+    """Return the cached value of a board document, prefixed with its version, project id and readers so a read
+    doesn't need to parse the document.
+    """
+    return f"{version}:{project_id}:{readers}:{document}"
+
+
+def unpack_board(value: str) -> Tuple[int, int, str, str]:
+    """Return the version, project id, readers and document text of a cached board value."""
+    version, project_id, readers, document = value.split(":", 3)
+    return int(version), int(project_id), readers, document
+
+
+def pack_readers(access: Tuple[bool, List[int]]) -> str:
+    """Return the readers of a project of access (public, writer ids) as cached with its boards: "*" if the project
+    is public, else the comma separated ids of its writers.
+    """
+    public, writers = access
+    return PUBLIC_READERS if public else ",".join(str(user_id) for user_id in writers)
+
+
+def can_read(readers: str, user_id: int) -> bool:
+    """Return true if user `user_id` is one of the cached `readers` of a project."""
+    return readers == PUBLIC_READERS or str(user_id) in readers.split(",")
+
+
+class BoardCache:
+    """Read model of the board view kept in Redis: one json document per board with the board and the cards of all
+    its stories, including the names of their assignee and reporter, and who may read its project, so reading a
+    board and checking access is one Redis GET.
+
+    A document is built from the database on the first read, then patched card by card by the `PostgresGateway`
+    listener whenever a story of the board is written, instead of being rebuilt. Every write bumps the version of the
+    board, kept in its own key so it survives the expiry of the document, and clients may skip a board whose version
+    they already have. Builds and patches are optimistic Redis transactions watching both keys, and a patch reads the
+    card from the database inside the transaction, so concurrent writers and readers never leave a stale card behind.
+    Renamed users show their new name on a card once the card is written again or the document expires after `ttl`
+    seconds.
+
+    Team memberships and projects are written around the application, so a trigger of the schema notifies the boards
+    of a project whose readers changed on the board_access channel. Each worker LISTENs to it on a dedicated
+    connection from its first read, and drops the documents of the notified boards. As notifications sent while no
+    worker listens are lost, every document is dropped whenever the listener connects.
+    """
+
+    def __init__(self, postgres_gateway: PostgresGateway, redis_gateway: RedisGateway, ttl: float = 3600.0):
+        self._postgres_gateway = postgres_gateway
+        self._redis_gateway = redis_gateway
+        self._ttl = timedelta(seconds=ttl)
+        self._lock = threading.Lock()
+        self._listener = None
+        postgres_gateway.add_story_write_listener(self.refresh_story)
+
+    def read_board(self, board_id: int, user_id: int) -> Tuple[int, int, bool, str]:
+        """Return the version, project id, whether user `user_id` may read the project, and json document text of
+        board `board_id`, read from Redis or built from the database and cached if missing. Raise DatabaseQueryError
+        if the board doesn't exist.
+        """
+        self._ensure_listener()
+        value = self._redis_gateway.get(board_key(board_id))
+        if value is None:
+            value = self._build(board_id)
+        version, project_id, readers, document = unpack_board(value)
+        return version, project_id, can_read(readers, user_id), document
+
+    def _build(self, board_id: int) -> str:
+        built = None
+
+        def build(values: List[Optional[str]]) -> dict:
+            nonlocal built
+            value, version = values
+            if value is not None:
+                built = value
+                return {}
+            board = self._postgres_gateway.read_board(board_id)
+            access = self._postgres_gateway.read_project_access(board[0]) if board is not None else None
+            if access is None:
+                raise DatabaseQueryError(f"Board {board_id} not found")
+            project_id, document = board
+            version = int(version or 0)
+            built = pack_board(version, project_id, pack_readers(access),
+                               json.dumps(dict(json.loads(document), version=version)))
+            return {board_key(board_id): (built, self._ttl)}
+
+        if self._redis_gateway.compare_and_set([board_key(board_id), board_version_key(board_id)], build) is None:
+            logger.info(f"BoardCache gave up caching board {board_id} after conflicting writes")
+        return built
+
+    def refresh_story(self, board_id: int, story_id: Optional[int]) -> None:
+        """Bump the version of board `board_id` and patch the card of story `story_id` in its document if cached:
+        replace it by the card read from the database, or remove it if the story was deleted or moved to another
+        board. The document is dropped if it can't be patched, or if `story_id` is None as many stories changed, to
+        be rebuilt by the next read.
+        """
+        if story_id is None:
+            self._drop(board_id)
+            return
+
+        def patch(values: List[Optional[str]]) -> dict:
+            value, version = values
+            version = int(version or 0) + 1
+            entries = {board_version_key(board_id): (str(version), None)}
+            if value is not None:
+                _, project_id, readers, document = unpack_board(value)
+                board = json.loads(document)
+                card = self._postgres_gateway.read_board_story(board_id, story_id)
+                stories = [story for story in board["stories"] if story["story_id"] != story_id]
+                if card is not None:
+                    stories.append(json.loads(card))
+                    stories.sort(key=lambda story: (story["board_rank"] is None, story["board_rank"] or "",
+                                                    story["story_id"]))
+                board.update(stories=stories, version=version)
+                entries[board_key(board_id)] = (pack_board(version, project_id, readers, json.dumps(board)), self._ttl)
+            return entries
+
+        if self._redis_gateway.compare_and_set([board_key(board_id), board_version_key(board_id)], patch) is None:
+            logger.info(f"BoardCache failed to patch board {board_id}, dropping it")
+            self._drop(board_id)
+
+    def _drop(self, board_id: int) -> None:
+        # Bumping the version after the delete makes a concurrent build watching it fail.
+        self._redis_gateway.delete(board_key(board_id))
+        self._redis_gateway.incr(board_version_key(board_id))
+
+    def _drop_all(self) -> None:
+        for name in self._redis_gateway.scan(board_key("*")):
+            self._drop(int(name[len(board_key("")):]))
+
+    def _listen(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = self._postgres_gateway.listen_connection()
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {BOARD_ACCESS_CHANNEL}")
+                self._drop_all()
+                while True:
+                    # Polling on timeout too detects a connection closed by the server.
+                    select.select([conn], [], [], 60)
+                    conn.poll()
+                    while conn.notifies:
+                        self._drop(int(conn.notifies.pop(0).payload))
+            except (psycopg2.Error, OSError) as e:
+                logger.info(f"BoardCache access listener connection lost, will retry in 1 second. Error: {e}")
+                sleep(1)
+            except Exception as e:
+                logger.error(f"BoardCache access listener failed, will retry in 1 second. Error: {e}")
+                sleep(1)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _ensure_listener(self) -> None:
+        # Started lazily so the listener thread belongs to the serving worker process.
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name="board-access-listener", daemon=True)
+                    self._listener.start()
+
+    @staticmethod
+    def create(postgres_gateway: PostgresGateway, redis_gateway: RedisGateway,
+               filename="config.ini") -> Optional["BoardCache"]:
+        """Factory method to create a `BoardCache` object, configured by the optional "board_cache" section. Return
+        None if the section is missing or the cache is not enabled.
+        """
+        section = "board_cache"
+        config = read_config_file(filename, section, required=False)
+        if config.get("enabled", "false").lower() != "true":
+            return None
+        try:
+            return BoardCache(postgres_gateway, redis_gateway, ttl=float(config.get("ttl", 3600.0)))
+        except ValueError as e:
+            logger.error(f"Invalid config file \"{filename}\" section \"{section}\": {e}")
+            raise e
@@ -0,0 +1,227 @@
+"""Module for the fan-out of board events from Postgres notifications."""
+from dataclasses import dataclass
+import json
+import logging
+import os
+import queue
+import select
+import threading
+from time import sleep
+from typing import Dict, Optional, Set, Tuple
+
+import psycopg2
+
+from funwithflags.entities import read_config_file
+from .db_gateway import GatewayConnection, PostgresGateway
+
+
+logger = logging.getLogger(__name__)
+
+STORY_EVENT = "story"
+# Sent instead of events that were lost, e.g. while the listener was reconnecting, so clients read the board again.
+RESYNC_EVENT = "resync"
+
+
+def board_channel(board_id: int) -> str:
+    """Return the Postgres notification channel of a board."""
+    return f"board_{board_id}"
+
+
+@dataclass
+class BoardEventStats:
+    """Snapshot of board event counters of this worker."""
+
+    subscribers: int = 0
+    channels: int = 0
+    published: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    reconnects: int = 0
+
+
+class BoardSubscription:
+    """Bounded queue of the events of one board for one client, as pairs of event name and json data. When the client
+    falls behind by more than `max_events` events, its queue is replaced by a single resync event.
+    """
+
+    def __init__(self, hub: "BoardEventHub", board_id: int, max_events: int):
+        self.board_id = board_id
+        self._hub = hub
+        self._events = queue.Queue(max_events)
+
+    def get(self, timeout: float) -> Optional[Tuple[str, str]]:
+        """Return the next event, waiting for at most `timeout` seconds, or None if there is none."""
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, event: Tuple[str, str]) -> bool:
+        """Queue `event` without blocking, return false if the queue overflowed and was reset to a resync event."""
+        try:
+            self._events.put_nowait(event)
+            return True
+        except queue.Full:
+            with self._events.mutex:
+                self._events.queue.clear()
+            self._events.put_nowait((RESYNC_EVENT, json.dumps({"board_id": self.board_id})))
+            return False
+
+    def close(self) -> None:
+        self._hub.unsubscribe(self)
+
+    def __enter__(self) -> "BoardSubscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class BoardEventHub:
+    """Push channel of board changes. Every story write on a board is sent as a Postgres notification on the channel
+    of the board once committed, after the other story write listeners such as the board read model ran, so a client
+    reading the board on an event sees the write.
+
+    Each worker process has one hub with one dedicated listening connection, shared by all its subscribers: the
+    connection LISTENs to the channel of a board while the board has subscribers in this worker, and a daemon thread
+    fans out every notification to the subscription queues. The thread is started by the first subscription. After
+    the connection is lost it is reopened and every subscriber gets a resync event, as notifications sent meanwhile
+    are lost. Streams of events should send a keep-alive every `heartbeat` seconds.
+    """
+
+    def __init__(self, postgres_gateway: PostgresGateway, max_events: int = 100, heartbeat: float = 15.0):
+        self._postgres_gateway = postgres_gateway
+        self._max_events = max_events
+        self.heartbeat = heartbeat
+        self._subscribers: Dict[int, Set[BoardSubscription]] = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._wakeup_read, self._wakeup_write = None, None
+        self._stats = BoardEventStats()
+        postgres_gateway.add_story_write_listener(self.publish)
+
+    def publish(self, board_id: int, story_id: Optional[int]) -> None:
+        """Notify the subscribers of board `board_id`, in every worker, of a write of story `story_id`, or of many
+        stories of the board if None.
+        """
+        self._postgres_gateway.notify(board_channel(board_id),
+                                      json.dumps({"board_id": board_id, "story_id": story_id}))
+        with self._lock:
+            self._stats.published += 1
+
+    def subscribe(self, board_id: int) -> BoardSubscription:
+        """Return a new subscription to the events of board `board_id`, to be closed when the client leaves."""
+        self._ensure_listener()
+        subscription = BoardSubscription(self, board_id, self._max_events)
+        with self._lock:
+            self._subscribers.setdefault(board_id, set()).add(subscription)
+        self._wake_up()
+        return subscription
+
+    def unsubscribe(self, subscription: BoardSubscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.board_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.board_id, None)
+        self._wake_up()
+
+    def stats(self) -> BoardEventStats:
+        with self._lock:
+            return BoardEventStats(**dict(vars(self._stats),
+                                          subscribers=sum(len(subs) for subs in self._subscribers.values()),
+                                          channels=len(self._subscribers)))
+
+    def _dispatch(self, channel: str, payload: str) -> None:
+        board_id = int(channel[len("board_"):])
+        with self._lock:
+            subscribers = list(self._subscribers.get(board_id, ()))
+        dropped = sum(not subscription.put((STORY_EVENT, payload)) for subscription in subscribers)
+        with self._lock:
+            self._stats.delivered += len(subscribers) - dropped
+            self._stats.dropped += dropped
+
+    def _resync(self) -> None:
+        with self._lock:
+            subscribers = [subscription for subs in self._subscribers.values() for subscription in subs]
+        for subscription in subscribers:
+            subscription.put((RESYNC_EVENT, json.dumps({"board_id": subscription.board_id})))
+
+    def _wake_up(self) -> None:
+        """Make the listener thread update the channels it listens to."""
+        if self._wakeup_write is not None:
+            try:
+                os.write(self._wakeup_write, b"\0")
+            except BlockingIOError:
+                pass  # The pipe is full of wake-ups the thread has yet to read.
+
+    def _sync_channels(self, conn: GatewayConnection, listening: Set[int]) -> None:
+        with self._lock:
+            boards = set(self._subscribers)
+        with conn.cursor() as cur:
+            for board_id in boards - listening:
+                cur.execute(f"LISTEN {board_channel(board_id)}")
+            for board_id in listening - boards:
+                cur.execute(f"UNLISTEN {board_channel(board_id)}")
+        listening.clear()
+        listening.update(boards)
+
+    def _listen(self) -> None:
+        connected = False
+        while True:
+            conn = None
+            try:
+                conn = self._postgres_gateway.listen_connection()
+                listening = set()
+                self._sync_channels(conn, listening)
+                if connected:
+                    with self._lock:
+                        self._stats.reconnects += 1
+                    self._resync()
+                connected = True
+                while True:
+                    readable, _, _ = select.select([conn, self._wakeup_read], [], [], 60)
+                    if self._wakeup_read in readable:
+                        os.read(self._wakeup_read, 4096)
+                        self._sync_channels(conn, listening)
+                    if conn in readable or not readable:
+                        # Polling on timeout too detects a connection closed by the server.
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            self._dispatch(notify.channel, notify.payload)
+            except (psycopg2.Error, OSError) as e:
+                logger.info(f"BoardEventHub listening connection lost, will retry in 1 second. Error: {e}")
+                sleep(1)
+            except Exception as e:
+                logger.error(f"BoardEventHub listener failed, will retry in 1 second. Error: {e}")
+                sleep(1)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _ensure_listener(self) -> None:
+        # Started lazily so the listener thread belongs to the serving worker process.
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._wakeup_read, self._wakeup_write = os.pipe()
+                    os.set_blocking(self._wakeup_write, False)
+                    self._listener = threading.Thread(target=self._listen, name="board-event-listener", daemon=True)
+                    self._listener.start()
+
+    @staticmethod
+    def create(postgres_gateway: PostgresGateway, filename="config.ini") -> Optional["BoardEventHub"]:
+        """Factory method to create a `BoardEventHub` object, configured by the optional "board_events" section.
+        Return None if the section is missing or the events are not enabled.
+        """
+        section = "board_events"
+        config = read_config_file(filename, section, required=False)
+        if config.get("enabled", "false").lower() != "true":
+            return None
+        try:
+            return BoardEventHub(postgres_gateway, max_events=int(config.get("max_events", 100)),
+                                 heartbeat=float(config.get("heartbeat", 15.0)))
+        except ValueError as e:
+            logger.error(f"Invalid config file \"{filename}\" section \"{section}\": {e}")
+            raise e
@@ -0,0 +1,182 @@
+"""Module for the thread-safe Postgres connection pool."""
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+import logging
+import threading
+from time import monotonic
+from typing import Any, Callable, Optional
+
+from funwithflags.definitions import ServiceUnavailableError
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolMetrics:
+    """Snapshot of connection pool usage.
+    """
+
+    size: int = 0
+    in_use: int = 0
+    idle: int = 0
+    waiting: int = 0
+    checkouts: int = 0
+    timeouts: int = 0
+    discarded: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+    @property
+    def avg_wait_time(self) -> float:
+        return self.total_wait_time / self.checkouts if self.checkouts else 0.0
+
+
+class ConnectionPool:
+    """A bounded pool of database connections shared by the threads of one worker process. Connections are created
+    lazily by `connect` up to `max_size`, a caller waits for at most `timeout` seconds for a free connection, and an
+    idle connection is validated with `validate` before being handed out again. `connect` is given the monotonic
+    deadline of the checkout it serves, or None for the `min_size` connections opened upfront.
+    """
+
+    def __init__(self, connect: Callable[[Optional[float]], Any], validate: Callable[[Any], bool],
+                 close: Callable[[Any], None], min_size: int = 1, max_size: int = 10, timeout: float = 5.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self._validate = validate
+        self._close = close
+        self._min_size = min_size
+        self._max_size = max_size
+        self._timeout = timeout
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append(self._connect(None))
+            self._size += 1
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    def getconn(self) -> Any:
+        """Check out a live connection from the pool. Raise `ServiceUnavailableError` if no connection becomes
+        available within the checkout timeout.
+        """
+        start = monotonic()
+        deadline = start + self._timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise ServiceUnavailableError("Connection pool is closed")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self._max_size:
+                        # Reserve the slot before connecting so other threads cannot overshoot max_size.
+                        self._size += 1
+                        conn = None
+                        break
+                    remaining = deadline - monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if not self._idle and self._size >= self._max_size:
+                            self._timeouts += 1
+                            raise ServiceUnavailableError("Timed out waiting for a database connection")
+            finally:
+                self._waiting -= 1
+            self._in_use += 1
+        try:
+            if conn is not None and not self._validate(conn):
+                logger.info("ConnectionPool discarded a dead connection on checkout.")
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect(deadline)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._size -= 1
+                self._cond.notify()
+            raise
+        wait_time = monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+        return conn
+
+    def putconn(self, conn: Any, broken: bool = False) -> None:
+        """Return a checked out connection to the pool. A `broken` connection is closed instead of being reused.
+        """
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+        if broken or self._closed:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager checking out a connection and returning it to the pool on exit. The connection is
+        discarded if the block raises an exception and left the connection unusable.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = bool(getattr(conn, "closed", False))
+            raise
+        finally:
+            self.putconn(conn, broken=broken)
+
+    def metrics(self) -> PoolMetrics:
+        """Return a snapshot of the pool metrics.
+        """
+        with self._cond:
+            return PoolMetrics(
+                size=self._size,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                waiting=self._waiting,
+                checkouts=self._checkouts,
+                timeouts=self._timeouts,
+                discarded=self._discarded,
+                total_wait_time=self._total_wait_time,
+                max_wait_time=self._max_wait_time,
+            )
+
+    def close(self) -> None:
+        """Close all idle connections. Connections still checked out are closed when they are returned.
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+    def _discard(self, conn: Any) -> None:
+        with self._cond:
+            self._discarded += 1
+        try:
+            self._close(conn)
+        except Exception as e:
+            logger.info(f"ConnectionPool failed to close a connection: {e}")
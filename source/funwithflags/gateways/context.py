@@ -2,8 +2,16 @@
 from dataclasses import dataclass
 from typing import Optional
 
+from funwithflags.definitions import TokenPolicy
+from funwithflags.entities import HashingService, read_config_file
+from .board_cache import BoardCache
+from .board_events import BoardEventHub
 from .db_gateway import PostgresGateway
+from .rank_rebalancer import RankRebalancer
 from .redis_gateway import RedisGateway
+from .session_registry import SessionRegistry
+from .token_cache import TokenStateCache
+from .user_cache import UserCache
 
 
 @dataclass
@@ -13,7 +21,34 @@ class Context:
 
     postgres_gateway: PostgresGateway
     redis_gateway: RedisGateway
+    hashing_service: HashingService
+    token_cache: TokenStateCache
+    token_policy: TokenPolicy
+    session_registry: SessionRegistry
+    user_cache: Optional[UserCache]
+    board_cache: Optional[BoardCache]
+    board_events: Optional[BoardEventHub]
+    rank_rebalancer: Optional[RankRebalancer]
 
-    def __init__(self, postgres_gateway: Optional[PostgresGateway] = None, redis_gateway: Optional[RedisGateway] = None):
+    def __init__(self, postgres_gateway: Optional[PostgresGateway] = None, redis_gateway: Optional[RedisGateway] = None,
+                 hashing_service: Optional[HashingService] = None, token_cache: Optional[TokenStateCache] = None,
+                 token_policy: Optional[TokenPolicy] = None, user_cache: Optional[UserCache] = None,
+                 board_cache: Optional[BoardCache] = None, board_events: Optional[BoardEventHub] = None,
+                 rank_rebalancer: Optional[RankRebalancer] = None):
         self.postgres_gateway = postgres_gateway if postgres_gateway else PostgresGateway.create()
         self.redis_gateway = redis_gateway if redis_gateway else RedisGateway.create()
+        self.hashing_service = hashing_service if hashing_service else HashingService.create()
+        self.token_cache = token_cache if token_cache else TokenStateCache.create(self.redis_gateway)
+        self.token_policy = token_policy if token_policy else Context._read_token_policy()
+        self.session_registry = SessionRegistry(self.redis_gateway, self.token_cache)
+        self.user_cache = user_cache if user_cache else UserCache.create(self.postgres_gateway, self.redis_gateway)
+        self.board_cache = board_cache if board_cache else BoardCache.create(self.postgres_gateway, self.redis_gateway)
+        # Created after the board cache, so events are sent once the board read model is patched.
+        self.board_events = board_events if board_events else BoardEventHub.create(self.postgres_gateway)
+        self.rank_rebalancer = rank_rebalancer if rank_rebalancer else RankRebalancer.create(self.postgres_gateway)
+
+    @staticmethod
+    def _read_token_policy(filename="config.ini") -> TokenPolicy:
+        """Read the token storage policy from the optional "auth" section, tracking refresh tokens by default."""
+        config = read_config_file(filename, "auth", required=False)
+        return TokenPolicy(config.get("token_policy", TokenPolicy.REFRESH.value))
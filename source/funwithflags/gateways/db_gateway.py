@@ -1,36 +1,340 @@
 """Module for the Postgres database gateway."""
+from contextlib import contextmanager
+import csv
+from datetime import date, datetime
+import io
+from itertools import count
 import logging
-from time import sleep
-from typing import Any, Optional
+from math import ceil
+import threading
+from time import monotonic, sleep
+from typing import IO, Any, Callable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
 
 import psycopg2
+import psycopg2.errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
 
+from .connection_pool import ConnectionPool, PoolMetrics
 from .db_gateway_abc import DbGateway
-from funwithflags.definitions import BadRequestError, DatabaseQueryError, InternalError, User
-from funwithflags.entities import generate_update_params, read_config_file
+from .statement_registry import StatementRegistry
+from funwithflags.definitions import (BadRequestError, DatabaseQueryError, InternalError, Project,
+                                      ServiceUnavailableError, Story, StoryStatus, User)
+from funwithflags.entities import generate_update_params, read_config_file, spread_ranks
 
 
 logger = logging.getLogger(__name__)
 
+USER_COLUMNS = ("user_id", "username", "nickname", "password", "salt", "email", "created_at")
+BYTEA_USER_COLUMNS = {"password", "salt"}
+PROJECT_COLUMNS = ("project_id", "project_name", "project_note", "project_type", "project_public", "user_id", "team_id",
+                   "admin_id", "created_at")
+STORY_COLUMNS = ("story_id", "story_name", "story_type", "status", "estimate", "created_at", "created_by", "closed_at",
+                 "closed_by", "project_id", "board_id", "board_history", "epic_id", "assignee", "reporter", "description",
+                 "priority", "parent_story", "sprint_id", "board_rank")
+STORY_EXPORT_COLUMNS = STORY_COLUMNS
+# The board history of a story is not stored with it but derived from its transitions: the boards it left in order, or
+# NULL if it never left one.
+STORY_TABLE_COLUMNS = tuple(column for column in STORY_COLUMNS if column != "board_history")
+BOARD_HISTORY = """(SELECT array_agg(t.from_board ORDER BY t.transition_id) FROM story_transition t
+        WHERE t.story_id = {story}.story_id AND t.from_board IS NOT NULL)"""
+STORY_SELECT = ", ".join(BOARD_HISTORY.format(story="s") if column == "board_history" else f"s.{column}"
+                         for column in STORY_COLUMNS)
+STORY_SEARCH_COLUMNS = ("story_id", "story_name", "story_type", "status", "board_id", "rank", "name_highlight",
+                        "description_highlight")
+# Highlighted words are wrapped in <mark> tags, the rest of the text is returned as is.
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5, HighlightAll=false"
+PROJECT_RECORDS_QUERY = """SELECT record FROM (
+        SELECT 0 AS rank, project_id AS id, jsonb_build_object('kind', 'project') || to_jsonb(p) AS record
+        FROM project p WHERE project_id = %s
+        UNION ALL
+        SELECT 1, epic_id, jsonb_build_object('kind', 'epic') || to_jsonb(e) FROM epic e WHERE project_id = %s
+        UNION ALL
+        SELECT 2, sprint_id, jsonb_build_object('kind', 'sprint') || to_jsonb(s) FROM sprint s
+        WHERE project_id = %s
+    ) records ORDER BY rank, id"""
+# Whether the user of the three parameters may write, or read, the project p.
+PROJECT_WRITABLE = """(p.user_id = %s OR p.admin_id = %s
+    OR EXISTS (SELECT 1 FROM teammates t WHERE t.team_id = p.team_id AND t.user_id = %s))"""
+PROJECT_READABLE = f"(p.project_public OR {PROJECT_WRITABLE})"
+# Progress of the epic or sprint of the rows r of its rollup: total and done stories, total and remaining estimate.
+ROLLUP_PROGRESS = f"""json_build_object(
+            'stories', coalesce(sum(r.stories), 0),
+            'done', coalesce(sum(r.stories) FILTER (WHERE r.status = {StoryStatus.DONE.value}), 0),
+            'estimate', coalesce(sum(r.estimate), 0),
+            'remaining', coalesce(sum(r.estimate) FILTER (WHERE r.status <> {StoryStatus.DONE.value}), 0))"""
+PROJECT_TREE_QUERY = f"""SELECT json_build_object(
+        'project_id', p.project_id, 'project_name', p.project_name, 'project_note', p.project_note,
+        'project_type', p.project_type, 'public', p.project_public, 'user_id', p.user_id, 'team_id', p.team_id,
+        'admin_id', p.admin_id, 'created_at', p.created_at::text,
+        'boards', boards.list, 'epics', epics.list, 'sprints', sprints.list)::text
+    FROM project p
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(json_agg(json_build_object(
+            'board_id', b.board_id, 'board_name', b.board_name, 'board_note', b.board_note, 'admin_id', b.admin_id,
+            'created_at', b.created_at::text) ORDER BY b.board_id), '[]') AS list
+        FROM board b WHERE b.project_id = p.project_id) boards
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(json_agg(json_build_object(
+            'epic_id', e.epic_id, 'epic_name', e.epic_name, 'epic_note', e.epic_note,
+            'progress', (SELECT {ROLLUP_PROGRESS} FROM epic_rollup r WHERE r.epic_id = e.epic_id))
+            ORDER BY e.epic_id), '[]') AS list
+        FROM epic e WHERE e.project_id = p.project_id) epics
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(json_agg(json_build_object(
+            'sprint_id', s.sprint_id, 'sprint_num', s.sprint_num, 'sprint_name', s.sprint_name, 'status', s.status,
+            'created_at', s.created_at::text, 'begin_time', s.begin_time::text, 'end_time', s.end_time::text,
+            'progress', (SELECT {ROLLUP_PROGRESS} FROM sprint_rollup r WHERE r.sprint_id = s.sprint_id))
+            ORDER BY s.sprint_num), '[]') AS list
+        FROM sprint s WHERE s.project_id = p.project_id AND s.closed_at IS NULL) sprints
+    WHERE p.project_id = %s AND {PROJECT_READABLE}"""
+# Card of the story s on the board read model, with the names of its assignee a and reporter r.
+BOARD_STORY_ENTRY = """json_build_object(
+        'story_id', s.story_id, 'story_name', s.story_name, 'story_type', s.story_type, 'status', s.status,
+        'estimate', s.estimate, 'priority', s.priority, 'epic_id', s.epic_id, 'sprint_id', s.sprint_id,
+        'parent_story', s.parent_story, 'board_rank', s.board_rank,
+        'assignee', s.assignee, 'assignee_name', a.nickname, 'reporter', s.reporter, 'reporter_name', r.nickname,
+        'created_at', s.created_at::text, 'closed_at', s.closed_at::text)"""
+BOARD_STORY_JOINS = """LEFT JOIN users a ON a.user_id = s.assignee LEFT JOIN users r ON r.user_id = s.reporter"""
+BOARD_QUERY = f"""SELECT b.project_id, json_build_object(
+        'board_id', b.board_id, 'board_name', b.board_name, 'board_note', b.board_note, 'project_id', b.project_id,
+        'admin_id', b.admin_id, 'created_at', b.created_at::text, 'stories', stories.list)::text
+    FROM board b
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(json_agg({BOARD_STORY_ENTRY} ORDER BY s.board_rank, s.story_id), '[]') AS list
+        FROM story s {BOARD_STORY_JOINS} WHERE s.board_id = b.board_id) stories
+    WHERE b.board_id = %s"""
+STORY_TREE_COLUMNS = ("story_id", "story_name", "story_type", "status", "estimate", "board_id", "parent_story", "depth")
+# Links the subtree of a story `u` of the statement to the ancestors of its new parent when it is reparented: the paths
+# from its former ancestors that are not ancestors of the new parent are deleted and the paths from the ancestors of
+# the new parent upserted, so the two never write the same row. The paths are read from the snapshot of the statement,
+# so the caller locks the subtree, its old ancestors and its new ancestors first, see `lock_story_subtree`.
+STORY_CLOSURE_CHANGES = """unlinked AS (
+        DELETE FROM story_closure c USING updated u, story_closure up, story_closure down
+        WHERE u.old_parent_story IS DISTINCT FROM u.parent_story
+            AND up.descendant_id = u.story_id AND up.depth > 0 AND down.ancestor_id = u.story_id
+            AND up.ancestor_id NOT IN (SELECT ancestor_id FROM story_closure WHERE descendant_id = u.parent_story)
+            AND c.ancestor_id = up.ancestor_id AND c.descendant_id = down.descendant_id),
+    linked AS (
+        INSERT INTO story_closure (ancestor_id, descendant_id, depth)
+        SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1
+        FROM updated u JOIN story_closure up ON up.descendant_id = u.parent_story
+        JOIN story_closure down ON down.ancestor_id = u.story_id
+        WHERE u.old_parent_story IS DISTINCT FROM u.parent_story
+        ON CONFLICT (ancestor_id, descendant_id) DO UPDATE SET depth = excluded.depth)"""
+STORY_CLOSURE_RECOMPUTE = """WITH RECURSIVE paths(ancestor_id, descendant_id, depth) AS (
+        SELECT story_id, story_id, 0 FROM story
+        UNION ALL
+        SELECT p.ancestor_id, s.story_id, p.depth + 1 FROM paths p JOIN story s ON s.parent_story = p.descendant_id)
+    SELECT ancestor_id, descendant_id, depth FROM paths"""
+STORY_CLOSURE_REBUILD_QUERY = f"""INSERT INTO story_closure (ancestor_id, descendant_id, depth)
+    {STORY_CLOSURE_RECOMPUTE}"""
+# Closure rows that differ from a recompute from the story parents, as rows of (ancestor_id, descendant_id, depth,
+# recomputed depth), a missing row having a NULL depth.
+STORY_CLOSURE_CHECK_QUERY = f"""SELECT ancestor_id, descendant_id, c.depth, r.depth
+    FROM story_closure c FULL JOIN ({STORY_CLOSURE_RECOMPUTE}) r USING (ancestor_id, descendant_id)
+    WHERE c.depth IS DISTINCT FROM r.depth
+    ORDER BY ancestor_id, descendant_id"""
+# Adds the `changes` to the totals of each status of the `{key}_rollup` table. Rows are upserted in key order, so
+# concurrent writes lock the rows they share in the same order.
+ROLLUP_CHANGES = """{key}_rolled AS (
+        INSERT INTO {key}_rollup AS r ({key}_id, status, estimate, stories)
+        SELECT {key}_id, status, sum(estimate), sum(stories) FROM changes WHERE {key}_id IS NOT NULL
+        GROUP BY {key}_id, status HAVING sum(estimate) <> 0 OR sum(stories) <> 0 ORDER BY {key}_id, status
+        ON CONFLICT ({key}_id, status)
+        DO UPDATE SET estimate = r.estimate + excluded.estimate, stories = r.stories + excluded.stories)"""
+ROLLUP_KEYS = ("epic", "sprint")
+# Adds the changes of the open stories to the work in progress of their boards, the epochs they entered the boards
+# summed so the mean age needs no story. A story staying open on its board nets to zero and writes nothing.
+WIP_CHANGES = f"""wip AS (
+        INSERT INTO board_wip AS w (board_id, stories, entered)
+        SELECT board_id, sum(stories), sum(entered) FROM changes WHERE board_id IS NOT NULL
+            AND status <> {StoryStatus.DONE.value}
+        GROUP BY board_id HAVING sum(stories) <> 0 OR sum(entered) <> 0 ORDER BY board_id
+        ON CONFLICT (board_id)
+        DO UPDATE SET stories = w.stories + excluded.stories, entered = w.entered + excluded.entered)"""
+# Adds the changes of the stories written by a statement to the burndown of their sprints on the current day, to the
+# rollups of their epics and sprints and to the work in progress of their boards, in the same statement so the
+# aggregates commit or roll back with the writes. `changes` selects rows of (sprint_id, epic_id, board_id, entered,
+# status, estimate, stories), `entered` being the epoch the story entered its board, negative for the stories leaving
+# a status or board.
+#
+# The aggregates are kept by two mechanisms with the same upserts. Creates and updates only go through the gateway
+# and apply their changes here, next to the transition and closure changes of the same statement. Deletes also come
+# from the cascades of board and project deletes, which the gateway never sees, so they are applied by the
+# story_deleted_aggregates trigger of the schema for every deleted story instead. A change to the aggregates must be
+# made in both places; check_burndown, check_rollups and check_wip compare both with a recompute.
+STORY_AGGREGATE_CHANGES = """changes (sprint_id, epic_id, board_id, entered, status, estimate, stories) AS ({changes}),
+    """ + WIP_CHANGES + """,
+    burndown AS (
+        INSERT INTO sprint_burndown AS b (sprint_id, day, status, estimate, stories)
+        SELECT sprint_id, current_date, status, sum(estimate), sum(stories) FROM changes WHERE sprint_id IS NOT NULL
+        GROUP BY sprint_id, status HAVING sum(estimate) <> 0 OR sum(stories) <> 0 ORDER BY sprint_id, status
+        ON CONFLICT (sprint_id, day, status)
+        DO UPDATE SET estimate = b.estimate + excluded.estimate, stories = b.stories + excluded.stories),
+    """ + ",\n    ".join(ROLLUP_CHANGES.format(key=key) for key in ROLLUP_KEYS)
+ROLLUP_QUERY = "SELECT status, stories, estimate FROM {key}_rollup WHERE {key}_id = %s AND stories <> 0 ORDER BY status"
+ROLLUP_RECOMPUTE = """SELECT {key}_id, status, sum(coalesce(estimate, 0))::bigint AS estimate, count(*) AS stories
+    FROM story WHERE {key}_id IS NOT NULL AND ({key}_id = ANY(%s::integer[]) OR %s::integer[] IS NULL)
+    GROUP BY {key}_id, status"""
+# Totals of the rollup that differ from a recompute from the stories, as rows of (key, id, status, estimate, stories,
+# recomputed estimate, recomputed stories).
+ROLLUP_CHECK_QUERY = """SELECT '{key}', {key}_id, status, coalesce(a.estimate, 0), coalesce(a.stories, 0),
+        coalesce(r.estimate, 0), coalesce(r.stories, 0)
+    FROM {key}_rollup a FULL JOIN ({recompute}) r USING ({key}_id, status)
+    WHERE coalesce(a.estimate, 0) <> coalesce(r.estimate, 0) OR coalesce(a.stories, 0) <> coalesce(r.stories, 0)"""
+# A story counts in its status from the day it was created, or as TODO until the day it was closed if it is done.
+BURNDOWN_REBUILD_QUERY = """INSERT INTO sprint_burndown (sprint_id, day, status, estimate, stories)
+    SELECT s.sprint_id, c.day, c.status, sum(c.estimate), sum(c.stories)
+    FROM story s CROSS JOIN LATERAL (VALUES
+        (false, s.created_at::date, CASE WHEN s.status = %s AND s.closed_at IS NOT NULL THEN %s
+                                         ELSE s.status END, coalesce(s.estimate, 0), 1),
+        (true, s.closed_at::date, %s, -coalesce(s.estimate, 0), -1),
+        (true, s.closed_at::date, s.status, coalesce(s.estimate, 0), 1)) c(closing, day, status, estimate, stories)
+    WHERE s.sprint_id IS NOT NULL AND (%s::integer IS NULL OR s.sprint_id = %s)
+        AND (NOT c.closing OR s.status = %s AND s.closed_at IS NOT NULL)
+    GROUP BY s.sprint_id, c.day, c.status HAVING sum(c.estimate) <> 0 OR sum(c.stories) <> 0"""
+BURNDOWN_CHECK_QUERY = """SELECT sprint_id, status, coalesce(a.estimate, 0), coalesce(a.stories, 0),
+        coalesce(r.estimate, 0), coalesce(r.stories, 0)
+    FROM (SELECT sprint_id, status, sum(estimate)::bigint AS estimate, sum(stories)::bigint AS stories
+          FROM sprint_burndown WHERE %s::integer IS NULL OR sprint_id = %s GROUP BY sprint_id, status) a
+    FULL JOIN (SELECT sprint_id, status, sum(coalesce(estimate, 0))::bigint AS estimate, count(*) AS stories
+               FROM story WHERE sprint_id IS NOT NULL AND (%s::integer IS NULL OR sprint_id = %s)
+               GROUP BY sprint_id, status) r USING (sprint_id, status)
+    WHERE coalesce(a.estimate, 0) <> coalesce(r.estimate, 0) OR coalesce(a.stories, 0) <> coalesce(r.stories, 0)
+    ORDER BY sprint_id, status"""
+# Totals of every status on every day of a sprint, from its begin, or its first change if earlier, to its end, today
+# or its last change, as running sums of the daily changes.
+BURNDOWN_QUERY = """SELECT d.day, st.status,
+        sum(coalesce(b.estimate, 0)) OVER totals, sum(coalesce(b.stories, 0)) OVER totals
+    FROM sprint s
+    CROSS JOIN LATERAL (SELECT min(day) AS first_day, max(day) AS last_day
+                        FROM sprint_burndown WHERE sprint_id = s.sprint_id) changed
+    CROSS JOIN LATERAL (SELECT generate_series(
+        coalesce(least(s.begin_time::date, changed.first_day), current_date),
+        greatest(least(coalesce(s.end_time::date, current_date), current_date), changed.last_day),
+        interval '1 day')::date AS day) d
+    CROSS JOIN generate_series(%s::integer, %s::integer) st(status)
+    LEFT JOIN sprint_burndown b ON b.sprint_id = s.sprint_id AND b.day = d.day AND b.status = st.status
+    WHERE s.sprint_id = %s
+    WINDOW totals AS (PARTITION BY st.status ORDER BY d.day)
+    ORDER BY d.day, st.status"""
+# Stories closed in a time window with their lead time, from creation, and cycle time, from the first move onto a
+# board, in seconds. The percentiles need the times of every story of the window, so they can't be summed per day like
+# the burndown: the window is read from the story_closed_idx index and the story rows only.
+FLOW_TIMES_QUERY = """SELECT count(*),
+        avg(lead), percentile_cont(0.5) WITHIN GROUP (ORDER BY lead),
+        percentile_cont(0.85) WITHIN GROUP (ORDER BY lead),
+        avg(cycle), percentile_cont(0.5) WITHIN GROUP (ORDER BY cycle),
+        percentile_cont(0.85) WITHIN GROUP (ORDER BY cycle)
+    FROM story s
+    CROSS JOIN LATERAL (SELECT extract(epoch FROM s.closed_at - s.created_at) AS lead,
+                               extract(epoch FROM s.closed_at - s.started_at) AS cycle) times
+    WHERE s.project_id = %s AND s.closed_at >= %s AND s.closed_at < %s AND s.status = %s"""
+# Open stories on each board of a project, with their mean age on the board, from their last move, in seconds.
+WIP_QUERY = """SELECT w.board_id, w.stories, extract(epoch FROM %s::timestamp) - w.entered / w.stories
+    FROM board b JOIN board_wip w ON w.board_id = b.board_id
+    WHERE b.project_id = %s AND w.stories > 0
+    ORDER BY w.board_id"""
+# Open stories of each board recomputed from the stories, the ones not yet backfilled counting from their creation.
+WIP_RECOMPUTE = """SELECT board_id, count(*) AS stories,
+        sum(extract(epoch FROM coalesce(board_entered_at, created_at))) AS entered
+    FROM story WHERE board_id IS NOT NULL AND status <> %s GROUP BY board_id"""
+# Counters of the work in progress that differ from a recompute from the stories, as rows of (board_id, stories,
+# entered, recomputed stories, recomputed entered).
+WIP_CHECK_QUERY = f"""SELECT board_id, coalesce(w.stories, 0), coalesce(w.entered, 0), coalesce(r.stories, 0),
+        coalesce(r.entered, 0)
+    FROM board_wip w FULL JOIN ({WIP_RECOMPUTE}) r USING (board_id)
+    WHERE coalesce(w.stories, 0) <> coalesce(r.stories, 0) OR coalesce(w.entered, 0) <> coalesce(r.entered, 0)
+    ORDER BY board_id"""
+# Sets the board times of the stories written before they were kept, from their transitions: the last move onto their
+# current board and the first move onto a board.
+STORY_TIMES_BACKFILL_QUERY = """UPDATE story s
+    SET board_entered_at = CASE WHEN s.board_id IS NOT NULL
+                                THEN coalesce(s.board_entered_at, t.entered_at, s.created_at) END,
+        started_at = coalesce(s.started_at, t.started_at)
+    FROM (SELECT story_id, min(moved_at) FILTER (WHERE to_board IS NOT NULL) AS started_at,
+                 (array_agg(moved_at ORDER BY transition_id DESC))[1] AS entered_at
+          FROM story_transition GROUP BY story_id) t
+    WHERE t.story_id = s.story_id
+        AND (s.board_id IS NOT NULL AND s.board_entered_at IS NULL
+             OR s.started_at IS NULL AND t.started_at IS NOT NULL)"""
+
+
+class GatewayConnection(psycopg2.extensions.connection):
+    """Postgres connection class keeping the bookkeeping state the gateway needs per connection.
+    """
+
+    last_used: float = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.stale_statements = False
+
 
 class PostgresGateway(DbGateway):
-    def __init__(self, host: str, port: int, dbname: str, user: str, password: str):
+    def __init__(self, host: str, port: int, dbname: str, user: str, password: str, pool_min_size: int = 0,
+                 pool_max_size: int = 0, pool_timeout: float = 5.0, pool_validate_after: float = 30.0,
+                 prepared_statements: bool = False, cursor_itersize: int = 2000, stream_max_connections: int = 4):
         """Constructor. Try to connect to Postgres database with given parameters. Will retry after connection failure
         for up to 20 times, each time wait for 2 seconds. Raises an exception if all retry fails.
+
+        If `pool_max_size` is positive, the gateway runs in pooled mode: every query checks out its own connection
+        from a `ConnectionPool` of `pool_min_size` to `pool_max_size` connections, waiting for at most `pool_timeout`
+        seconds. A pooled connection idle for more than `pool_validate_after` seconds is pinged before reuse.
+        Otherwise a single connection is shared by all queries, one at a time, and reopened if it was closed.
+
+        If `prepared_statements` is true, the hot user queries are prepared once per connection and run with EXECUTE.
+        Server-side cursors of `query_iter` fetch `cursor_itersize` rows per round trip by default. Without a pool, at
+        most `stream_max_connections` streams hold a connection of their own at once, a stream waits for at most
+        `pool_timeout` seconds for its turn.
         """
         self._conn_str = (
             f"host={host} port={port} dbname={dbname} user={user} password={password}"
         )
         self._conn_retry_limit = 20
         self._conn_retry_interval = 2
+        self._validate_after = pool_validate_after
+        self._user_write_listeners = []
+        self._story_write_listeners = []
         self._active = False
+        self._pool = None
+        self._conn_lock = threading.RLock()
+        self._local = threading.local()
+        self._statements = StatementRegistry() if prepared_statements else None
+        self._cursor_itersize = cursor_itersize
+        self._cursor_ids = count(1)
+        self._stream_slots = threading.BoundedSemaphore(stream_max_connections)
+        self._stream_timeout = pool_timeout
+
+        if pool_max_size > 0:
+            self._pool = ConnectionPool(
+                connect=self._connect,
+                validate=self._validate,
+                close=lambda conn: conn.close(),
+                min_size=max(pool_min_size, 1),
+                max_size=pool_max_size,
+                timeout=pool_timeout,
+            )
+        else:
+            self._conn = self._connect()
+        self._active = True
 
+    def _connect(self, deadline: Optional[float] = None):
+        """Open a new connection, retrying on failure. Raises an exception if all retry fails.
+        If the `monotonic` `deadline` of a pool checkout is given, stop retrying with `ServiceUnavailableError` once the
+        next attempt would start past it.
+        """
         retry = 0
         for _ in range(self._conn_retry_limit):
             try:
                 retry += 1
-                self._conn = psycopg2.connect(self._conn_str)
+                conn = psycopg2.connect(self._conn_str, connection_factory=GatewayConnection,
+                                        **self._connect_timeout(deadline))
             except Exception as e:
+                if deadline is not None and monotonic() + self._conn_retry_interval >= deadline:
+                    logger.error(f"PostgresGateway connection failed after {retry} times, checkout timed out.")
+                    raise ServiceUnavailableError("Timed out connecting to the database") from e
                 logger.info(
                     f"PostgresGateway connection failed, will retry for #{retry} "
                     f"in {self._conn_retry_interval} seconds. Error: {e}"
@@ -38,15 +342,74 @@ class PostgresGateway(DbGateway):
                 sleep(self._conn_retry_interval)
                 continue
             else:
-                self._active = True
-                break
-        if not self._active:
-            logger.error(
-                f"PostgresGateway connection failed after {retry} times, stopping retry."
-            )
-            raise Exception("PostgresGateway connection failure after retries.")
-        else:
-            logger.info("PostgresGateway connection success!")
+                logger.info("PostgresGateway connection success!")
+                conn.last_used = monotonic()
+                return conn
+        logger.error(
+            f"PostgresGateway connection failed after {retry} times, stopping retry."
+        )
+        raise Exception("PostgresGateway connection failure after retries.")
+
+    @staticmethod
+    def _connect_timeout(deadline: Optional[float]) -> dict:
+        """Return the connect arguments bounding one connection attempt by `deadline`, if given. libpq rounds
+        `connect_timeout` up to 2 seconds.
+        """
+        if deadline is None:
+            return {}
+        return dict(connect_timeout=max(2, ceil(deadline - monotonic())))
+
+    def listen_connection(self) -> GatewayConnection:
+        """Open a new connection in autocommit mode, outside of the pool, for a listener of Postgres notifications
+        to LISTEN on. The caller owns the connection and closes it. Raises an exception if all retry fails.
+        """
+        conn = self._connect()
+        conn.autocommit = True
+        return conn
+
+    def notify(self, channel: str, payload: str) -> None:
+        """Send a Postgres notification with `payload` on `channel`, delivered to the listeners of the channel once
+        the current transaction, if any, is committed. Raise DatabaseQueryError if query failed.
+        """
+        self.query("SELECT pg_notify(%s, %s)", channel, payload, statement="notify")
+
+    def _validate(self, conn) -> bool:
+        """Check if a pooled connection is still usable before handing it out. Connections left inside a
+        transaction are rolled back, and connections idle for long are pinged with a trivial query.
+        """
+        if conn.closed:
+            return False
+        try:
+            status = conn.get_transaction_status()
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if monotonic() - conn.last_used > self._validate_after:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @contextmanager
+    def _connection(self):
+        """Context manager providing the connection a query should run on: a connection checked out from the pool
+        in pooled mode, or the shared connection otherwise.
+        """
+        if self._pool is None:
+            with self._conn_lock:
+                if self._conn.closed:
+                    logger.info("PostgresGateway connection closed, reconnecting.")
+                    self._conn = self._connect()
+                yield self._conn
+            return
+        with self._pool.connection() as conn:
+            try:
+                yield conn
+            finally:
+                conn.last_used = monotonic()
 
     def __del__(self):
         """Destructor.
@@ -55,19 +418,101 @@ class PostgresGateway(DbGateway):
             self.deactivate()
 
     def deactivate(self):
-        """Deactivate the gateway. Close the connection.
+        """Deactivate the gateway. Close the connection or the connection pool.
         """
         self._active = False
-        self._conn.close()
+        if self._pool is not None:
+            self._pool.close()
+        else:
+            self._conn.close()
+
+    def pool_metrics(self) -> Optional[PoolMetrics]:
+        """Return a snapshot of the connection pool metrics, or None if the gateway is not pooled.
+        """
+        return self._pool.metrics() if self._pool is not None else None
+
+    def add_user_write_listener(self, listener: Callable[[int], None]) -> None:
+        """Register a `listener` called with the user id after every successful write of a user, e.g. to invalidate
+        a cache of users.
+        """
+        self._user_write_listeners.append(listener)
+
+    def add_story_write_listener(self, listener: Callable[[int, Optional[int]], None]) -> None:
+        """Register a `listener` called with the board id and the story id after every successful write of a story on
+        a board, e.g. to patch a read model of the board. A story moved between boards is notified for both. The
+        story id is None after a write of many stories of the board, e.g. a rebalance of their ranks.
+        """
+        self._story_write_listeners.append(listener)
+
+    def _notify_user_write(self, user_id: int) -> None:
+        self._notify(self._user_write_listeners, user_id)
+
+    def _notify_story_write(self, story_id: Optional[int], *board_ids: Optional[int]) -> None:
+        for board_id in dict.fromkeys(board_ids):
+            if board_id is not None:
+                self._notify(self._story_write_listeners, board_id, story_id)
+
+    def _notify(self, listeners: List[Callable], *args) -> None:
+        """Call the write `listeners` with `args`, or once the current transaction is committed if any."""
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending[(id(listeners), args)] = listeners
+            return
+        for listener in listeners:
+            listener(*args)
+
+    @contextmanager
+    def transaction(self):
+        """Context manager grouping all queries of the block run by this thread into one transaction on one
+        connection, committed when the block exits or rolled back if it raises. A nested block runs in a savepoint,
+        so catching the error of a nested block only rolls back the queries of that block. Write listeners are notified
+        once the outer transaction is committed. Raise DatabaseQueryError if the commit failed.
+        """
+        local = self._local
+        if getattr(local, "conn", None) is not None:
+            local.depth += 1
+            savepoint = f"savepoint_{local.depth}"
+            try:
+                with local.conn.cursor() as cur:
+                    cur.execute(f"SAVEPOINT {savepoint}")
+                yield
+                with local.conn.cursor() as cur:
+                    cur.execute(f"RELEASE SAVEPOINT {savepoint}")
+            except Exception:
+                if not local.conn.closed:
+                    with local.conn.cursor() as cur:
+                        cur.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                raise
+            finally:
+                local.depth -= 1
+            return
+
+        pending = {}
+        with self._connection() as conn:
+            local.conn, local.depth, local.pending = conn, 0, pending
+            try:
+                yield
+                conn.commit()
+            except Exception as e:
+                if not conn.closed:
+                    conn.rollback()
+                if isinstance(e, psycopg2.Error):
+                    raise DatabaseQueryError(f"Transaction failed: {e}")
+                raise
+            finally:
+                local.conn, local.pending = None, None
+        for (_, args), listeners in pending.items():
+            self._notify(listeners, *args)
 
     @staticmethod
-    def _read_user_query(user_id: Optional[int] = None, username: Optional[str] = None):
+    def _read_user_query(user_id: Optional[int] = None, username: Optional[str] = None,
+                         columns: Sequence[str] = USER_COLUMNS):
         """Given `user_id` integer and `username` string, generate pair of query
-        string and user id or username to read the user. If `user_id` is not None,
+        string and user id or username to read the `columns` of the user. If `user_id` is not None,
         return query for reading by user id; else if `username` is not None, return
         query for reading by `username`; else return a pair of None.
         """
-        query = "SELECT user_id, username, nickname, password, salt, email, created_at FROM users WHERE "
+        query = f"SELECT {', '.join(columns)} FROM users WHERE "
         if user_id:
             return query + "user_id = %s", user_id
         elif username:
@@ -75,27 +520,190 @@ class PostgresGateway(DbGateway):
         else:
             return None, None
 
-    def query(self, query: str, *args) -> Any:
+    @staticmethod
+    def _user_columns(columns: Optional[Iterable[str]] = None) -> Sequence[str]:
+        """Return the user table columns to read, in table order, for a requested set of `columns`. `user_id` is
+        always read. Raise BadRequestError if any requested column is not a user column.
+        """
+        if columns is None:
+            return USER_COLUMNS
+        requested = set(columns) | {"user_id"}
+        if not requested.issubset(USER_COLUMNS):
+            raise BadRequestError(f"Invalid user columns: {requested.difference(USER_COLUMNS)}")
+        return tuple(column for column in USER_COLUMNS if column in requested)
+
+    def query(self, query: str, *args, fetch: str = "one", size: Optional[int] = None,
+              statement: Optional[str] = None) -> Any:
         """Given a `query` string, do the query and return result, raise a BadRequestError
         if query is invalid or DatabaseQueryError if anything wrong happens during query.
+        UPDATE and DELETE queries, and other statements returning no rows, return the
+        row count, other queries return the first
+        row if `fetch` is "one", a list of up to `size` rows if "many", or all rows if
+        "all". If `statement` is given and prepared statements are enabled, the query is
+        prepared under that name. The query is committed at once, unless it runs inside
+        a `transaction` block.
         """
         if query is None or len(query) == 0:
             raise BadRequestError("Invalid query statement")
+        if fetch not in ("one", "many", "all"):
+            raise BadRequestError(f"Invalid fetch mode {fetch}")
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return self._run(conn, query, args, fetch, size, statement, commit=False)
+        with self._connection() as conn:
+            return self._run(conn, query, args, fetch, size, statement, commit=True)
+
+    def _run(self, conn: GatewayConnection, query: str, args: Sequence[Any], fetch: str, size: Optional[int],
+             statement: Optional[str], commit: bool) -> Any:
         try:
-            cur = self._conn.cursor()
-            cur.execute(query, args)
-            result = (
-                cur.fetchone()
-                if not query.lstrip().upper().startswith(("UPDATE", "DELETE"))
-                else cur.rowcount
-            )
-            self._conn.commit()
+            cur = conn.cursor()
+            self._execute(conn, cur, query, args, statement, retry=commit)
+            if query.lstrip().upper().startswith(("UPDATE", "DELETE")) or cur.description is None:
+                result = cur.rowcount
+            elif fetch == "all":
+                result = cur.fetchall()
+            elif fetch == "many":
+                result = cur.fetchmany(size) if size is not None else cur.fetchmany()
+            else:
+                result = cur.fetchone()
+            if commit:
+                conn.commit()
             cur.close()
             return result
         except (Exception, psycopg2.DatabaseError) as e:
             logger.error(f"PostgresGateway failed on query: '{query}' with {args}.")
+            if commit and not conn.closed:
+                conn.rollback()
             raise DatabaseQueryError(f"Query {query} with {args} failed: {e}")
 
+    def query_iter(self, query: str, *args, itersize: Optional[int] = None) -> Iterator[tuple]:
+        """Given a `query` string, return an iterator over the result rows, streamed from a named server-side cursor
+        fetching `itersize` rows per round trip, so the result never needs to fit in memory. The connection is held
+        until the iterator is exhausted or closed, and joins the current transaction if any. Without a pool, a stream
+        outside of a transaction opens a connection of its own, so the shared connection is not locked while it is
+        consumed. Raise BadRequestError if query is invalid, iterating raises DatabaseQueryError if anything wrong
+        happens during query, or ServiceUnavailableError if too many streams hold a connection of their own.
+        """
+        if query is None or len(query) == 0:
+            raise BadRequestError("Invalid query statement")
+        return self._iter_rows(query, args, itersize or self._cursor_itersize)
+
+    def _iter_rows(self, query: str, args: Sequence[Any], itersize: int) -> Iterator[tuple]:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield from self._cursor_rows(conn, query, args, itersize)
+            return
+        if self._pool is None:
+            if not self._stream_slots.acquire(timeout=self._stream_timeout):
+                raise ServiceUnavailableError("Timed out waiting for a streaming connection")
+            try:
+                conn = self._connect(monotonic() + self._stream_timeout)
+                try:
+                    yield from self._cursor_rows(conn, query, args, itersize)
+                finally:
+                    conn.close()
+            finally:
+                self._stream_slots.release()
+            return
+        with self._connection() as conn:
+            try:
+                yield from self._cursor_rows(conn, query, args, itersize)
+                conn.commit()
+            except BaseException:
+                # Also reached with GeneratorExit when the consumer stops early, closing the server-side cursor.
+                if not conn.closed:
+                    conn.rollback()
+                raise
+
+    def _cursor_rows(self, conn: GatewayConnection, query: str, args: Sequence[Any], itersize: int) -> Iterator[tuple]:
+        try:
+            with conn.cursor(name=f"query_iter_{next(self._cursor_ids)}") as cur:
+                cur.itersize = itersize
+                cur.execute(query, args)
+                yield from cur
+        except psycopg2.Error as e:
+            logger.error(f"PostgresGateway failed on query: '{query}' with {args}.")
+            raise DatabaseQueryError(f"Query {query} with {args} failed: {e}")
+
+    def copy_out(self, query: str, *args, out: IO[str], fmt: str = "csv", header: bool = False) -> int:
+        """Given a `query` string, run it through COPY ... TO STDOUT and write the rows to the `out` file object as
+        they arrive from the server, as CSV with an optional `header` line, or as one line per row if `fmt` is
+        "ndjson" and the query selects a single json column. Joins the current transaction if any. Return the number
+        of rows written, raise DatabaseQueryError if anything wrong happens during query.
+        """
+        if fmt == "ndjson":
+            # Neither quoting nor escaping: json text never holds these control characters or newlines unescaped.
+            options = "FORMAT csv, DELIMITER E'\\x02', QUOTE E'\\x01'"
+        else:
+            options = "FORMAT csv" + (", HEADER" if header else "")
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return self._copy_out(conn, query, args, out, options, commit=False)
+        with self._connection() as conn:
+            return self._copy_out(conn, query, args, out, options, commit=True)
+
+    def copy_in(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+        """Load `rows` of values of `columns` into `table` with COPY ... FROM STDIN, bytes values as bytea. Joins the
+        current transaction if any. Return the number of rows loaded, raise DatabaseQueryError if the copy failed.
+        """
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for row in rows:
+            writer.writerow(["\\x" + value.hex() if isinstance(value, bytes) else value for value in row])
+        data.seek(0)
+        copy = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        with self.transaction():
+            try:
+                with self._local.conn.cursor() as cur:
+                    cur.copy_expert(copy, data)
+                    return cur.rowcount
+            except psycopg2.Error as e:
+                logger.error(f"PostgresGateway failed on copy into {table}.")
+                raise DatabaseQueryError(f"Copy into {table} failed: {e}")
+
+    @staticmethod
+    def _copy_out(conn: GatewayConnection, query: str, args: Sequence[Any], out: IO[str], options: str,
+                  commit: bool) -> int:
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(f"COPY ({cur.mogrify(query, args).decode()}) TO STDOUT WITH ({options})", out)
+                rows = cur.rowcount
+            if commit:
+                conn.commit()
+            return rows
+        except psycopg2.Error as e:
+            logger.error(f"PostgresGateway failed on copy: '{query}' with {args}.")
+            if commit and not conn.closed:
+                conn.rollback()
+            raise DatabaseQueryError(f"Copy of {query} with {args} failed: {e}")
+
+    def _execute(self, conn: GatewayConnection, cur, query: str, args: Sequence[Any], statement: Optional[str],
+                 retry: bool = True) -> None:
+        """Execute `query` with `args` on the cursor, as the prepared `statement` if prepared statements are enabled.
+        The statement is prepared on first use on each connection. If the prepared statements of the connection went
+        out of sync with the server, e.g. after DISCARD ALL, they are all dropped and the query is retried once if
+        `retry`, otherwise the query fails and they are dropped before the next prepared query on the connection.
+        """
+        name = self._statements.name(statement, query) if statement and self._statements is not None else None
+        if name is None:
+            cur.execute(query, args)
+            return
+        if conn.stale_statements:
+            cur.execute("DEALLOCATE ALL")
+            conn.prepared.clear()
+            conn.stale_statements = False
+        try:
+            if name not in conn.prepared:
+                cur.execute(self._statements.prepare_sql(name))
+                conn.prepared.add(name)
+            cur.execute(StatementRegistry.execute_sql(name, len(args)), args)
+        except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.DuplicatePreparedStatement):
+            conn.stale_statements = True
+            if not retry:
+                raise
+            conn.rollback()
+            self._execute(conn, cur, query, args, statement, retry=False)
+
     def create_user(self, user: User) -> int:
         """Given a `user` object, create user entry in database table and return
         an integer of `user_id` of created user. Raise DatabaseQueryError if creation
@@ -111,37 +719,67 @@ class PostgresGateway(DbGateway):
             user.password,
             user.salt,
             user.created_at,
+            statement="create_user",
         )
         if user_id and len(user_id) == 1:
+            self._notify_user_write(user_id[0])
             return user_id[0]
         else:
             raise DatabaseQueryError
 
-    def read_user(self, user_id: Optional[int] = None, username: Optional[str] = None) -> User:
+    @staticmethod
+    def _row_to_user(columns: Sequence[str], row: Sequence[Any]) -> User:
+        """Build a valid `User` object from a row of the given user `columns`."""
+        return User(
+            valid=True,
+            **{column: bytes(value) if column in BYTEA_USER_COLUMNS else value for column, value in zip(columns, row)},
+        )
+
+    def read_user(self, user_id: Optional[int] = None, username: Optional[str] = None,
+                  columns: Optional[Iterable[str]] = None, for_update: bool = False) -> User:
         """Given a `user_id` integer or a `username` string, read user info from
-        database and return a `User` object. Raise BadRequestError if query argument
-        is invalid or DatabaseQueryError if query failed.
+        database and return a `User` object. Only the given `columns` are read if
+        not None, the other fields of the `User` keep their default values. If
+        `for_update`, the row is locked until the end of the current transaction.
+        Raise BadRequestError if query argument is invalid or DatabaseQueryError if
+        query failed.
         """
         if user_id is not None and user_id <= 0:
             raise BadRequestError("Invalid user id")
-        query, key = PostgresGateway._read_user_query(user_id, username)
+        columns = PostgresGateway._user_columns(columns)
+        query, key = PostgresGateway._read_user_query(user_id, username, columns)
+        if query is not None and for_update:
+            query += " FOR UPDATE"
         try:
-            result = self.query(query, key)
-            return User(
-                user_id=result[0],
-                username=result[1],
-                nickname=result[2],
-                password=bytes(result[3]),
-                salt=bytes(result[4]),
-                email=result[5],
-                created_at=result[6],
-                valid=True,
-            )
+            result = self.query(query, key, statement="read_user_by_id" if user_id else "read_user_by_name")
+            return PostgresGateway._row_to_user(columns, result)
         except BadRequestError:
             raise BadRequestError("Invalid user id and username")
         except (Exception, DatabaseQueryError) as e:
             raise DatabaseQueryError
 
+    def read_users(self, user_ids: Iterable[int],
+                   columns: Optional[Iterable[str]] = None) -> Tuple[List[User], List[int]]:
+        """Given user ids, read the users in one query. Return the list of `User` objects in
+        the order of `user_ids`, without duplicates, and the list of ids with no user. Only
+        the given `columns` are read if not None. Raise BadRequestError if any user id is
+        invalid or DatabaseQueryError if query failed.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if any(user_id <= 0 for user_id in user_ids):
+            raise BadRequestError("Invalid user id")
+        if not user_ids:
+            return [], []
+        columns = PostgresGateway._user_columns(columns)
+        query = f"SELECT {', '.join(columns)} FROM users WHERE user_id = ANY(%s)"
+        rows = self.query(query, user_ids, fetch="all", statement="read_users")
+        found = {}
+        for row in rows:
+            user = PostgresGateway._row_to_user(columns, row)
+            found[user.user_id] = user
+        return ([found[user_id] for user_id in user_ids if user_id in found],
+                [user_id for user_id in user_ids if user_id not in found])
+
     def update_user(self, user_id: int, **kwargs) -> None:
         """Given a `user_id` integer and keyword only arguments, update fields
         specified in `kwargs`. Raise BadRequestError if update request is invalid
@@ -151,9 +789,22 @@ class PostgresGateway(DbGateway):
         if user_id <= 0 or len(field_vals) == 0:
             raise BadRequestError("Invalid user id or update fields")
         query = f"""UPDATE users SET {field_names} WHERE user_id = %s"""
-        result = self.query(query, *field_vals)
+        result = self.query(query, *field_vals, statement="update_user")
         if result != 1:
             raise DatabaseQueryError("Failed to update")
+        self._notify_user_write(user_id)
+
+    def update_user_password(self, user_id: int, password: bytes, salt: bytes) -> None:
+        """Given a `user_id` integer, replace the hashed `password` and its `salt` of the user. Raise
+        BadRequestError if user id is invalid or DatabaseQueryError if update query failed.
+        """
+        if user_id <= 0:
+            raise BadRequestError("Invalid user id")
+        query = """UPDATE users SET password = %s, salt = %s WHERE user_id = %s"""
+        result = self.query(query, password, salt, user_id, statement="update_user_password")
+        if result != 1:
+            raise DatabaseQueryError("Failed to update password")
+        self._notify_user_write(user_id)
 
     def delete_user(self, user_id: int) -> None:
         """Given a `user_id` integer, delete user from database table and raise
@@ -163,9 +814,597 @@ class PostgresGateway(DbGateway):
         if user_id <= 0:
             raise BadRequestError("Invalid user id")
         query = """DELETE FROM users WHERE user_id = %s"""
-        result = self.query(query, user_id)
+        result = self.query(query, user_id, statement="delete_user")
         if result != 1:
             raise DatabaseQueryError("Failed to delete")
+        self._notify_user_write(user_id)
+
+    def import_users(self, users: Sequence[User]) -> List[User]:
+        """Given `users` objects, load them with COPY into a staging table and merge them into the users table in one
+        transaction, skipping users whose username or email is taken, also by a previous user of `users`. Return the
+        imported users with their user id, raise DatabaseQueryError if the import failed.
+        """
+        columns = ("username", "nickname", "email", "password", "salt", "created_at")
+        with self.transaction():
+            self.query("""CREATE TEMP TABLE users_import (row_num serial, username varchar(32), nickname varchar(32),
+                          email varchar(128), password bytea, salt bytea, created_at timestamp) ON COMMIT DROP""")
+            self.copy_in("users_import", columns, ([getattr(user, column) for column in columns] for user in users))
+            rows = self.query(
+                f"""INSERT INTO users({', '.join(columns)}) SELECT {', '.join(columns)} FROM users_import
+                    ORDER BY row_num ON CONFLICT DO NOTHING RETURNING user_id, username, email""", fetch="all")
+            imported = {(username, email): user_id for user_id, username, email in rows}
+            for user_id in imported.values():
+                self._notify_user_write(user_id)
+        return [User(**dict(vars(user), user_id=imported.pop((user.username, user.email)))) for user in users
+                if (user.username, user.email) in imported]
+
+    def create_project(self, project: Project) -> int:
+        """Given a `project` object, create the project entry in database table and return the integer `project_id`
+        of the created project. Raise DatabaseQueryError if creation failed.
+        """
+        query = """INSERT INTO project(project_name, project_note, project_type, project_public, user_id, team_id,
+                   admin_id, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING project_id"""
+        result = self.query(query, project.project_name, project.project_note, project.project_type,
+                            project.project_public, project.user_id, project.team_id, project.admin_id,
+                            project.created_at, statement="create_project")
+        if result is None:
+            raise DatabaseQueryError
+        return result[0]
+
+    def read_project(self, project_id: int) -> Project:
+        """Given a `project_id` integer, read the project from database and return a `Project` object. Raise
+        BadRequestError if project id is invalid or DatabaseQueryError if the project doesn't exist.
+        """
+        if project_id <= 0:
+            raise BadRequestError("Invalid project id")
+        query = f"""SELECT {', '.join(PROJECT_COLUMNS)} FROM project WHERE project_id = %s"""
+        result = self.query(query, project_id, statement="read_project")
+        if result is None:
+            raise DatabaseQueryError(f"Project {project_id} not found")
+        return Project(**dict(zip(PROJECT_COLUMNS, result)))
+
+    def list_projects(self, user_id: Optional[int] = None, team_id: Optional[int] = None,
+                      before: Optional[Tuple[datetime, int]] = None, limit: int = 20) -> List[Project]:
+        """Return up to `limit` projects of a team if `team_id` is not None, or personal projects of user `user_id`
+        otherwise, newest first by (created_at, project_id). Only projects older than the (created_at, project_id)
+        pair `before` are returned if not None, so the next page starts after the last project of the previous one.
+        The key is served by an index per owner column, so the cost of a page doesn't depend on the page number.
+        """
+        owner, owner_id = ("team_id", team_id) if team_id is not None else ("user_id", user_id)
+        query = f"SELECT {', '.join(PROJECT_COLUMNS)} FROM project WHERE {owner} = %s"
+        args = [owner_id]
+        if before is not None:
+            query += " AND (created_at, project_id) < (%s, %s)"
+            args.extend(before)
+        query += " ORDER BY created_at DESC, project_id DESC LIMIT %s"
+        rows = self.query(query, *args, limit, fetch="all", statement=f"list_projects_by_{owner}")
+        return [Project(**dict(zip(PROJECT_COLUMNS, row))) for row in rows]
+
+    def is_team_member(self, team_id: int, user_id: int) -> bool:
+        """Return true if user `user_id` is a member or the admin of team `team_id`."""
+        query = """SELECT 1 FROM team WHERE team_id = %s AND (admin_id = %s
+                   OR EXISTS (SELECT 1 FROM teammates WHERE team_id = %s AND user_id = %s))"""
+        return self.query(query, team_id, user_id, team_id, user_id, statement="is_team_member") is not None
+
+    def can_read_project(self, project_id: int, user_id: int) -> bool:
+        """Return true if project `project_id` exists and user `user_id` may read it: the project is public, it is a
+        personal project of the user, or the user is its admin or a member of its team. Raise DatabaseQueryError if
+        query failed.
+        """
+        query = f"SELECT 1 FROM project p WHERE p.project_id = %s AND {PROJECT_READABLE}"
+        return self.query(query, project_id, user_id, user_id, user_id, statement="can_read_project") is not None
+
+    def read_project_access(self, project_id: int) -> Optional[Tuple[bool, List[int]]]:
+        """Return whether project `project_id` is public and the ids of the users that may write it, its user, its
+        admin and the members of its team, from which `can_read_project` is decided, or None if the project doesn't
+        exist. Raise DatabaseQueryError if query failed.
+        """
+        query = """SELECT p.project_public, array_remove(ARRAY[p.user_id, p.admin_id]
+                          || array(SELECT t.user_id FROM teammates t WHERE t.team_id = p.team_id), NULL)
+                   FROM project p WHERE p.project_id = %s"""
+        result = self.query(query, project_id, statement="read_project_access")
+        return (result[0], list(result[1])) if result is not None else None
+
+    def can_write_project(self, project_id: int, user_id: int) -> bool:
+        """Return true if project `project_id` exists and user `user_id` may write it: it is a personal project of the
+        user, or the user is its admin or a member of its team. Raise DatabaseQueryError if query failed.
+        """
+        query = f"SELECT 1 FROM project p WHERE p.project_id = %s AND {PROJECT_WRITABLE}"
+        return self.query(query, project_id, user_id, user_id, user_id, statement="can_write_project") is not None
+
+    def read_project_tree(self, project_id: int, user_id: int) -> Optional[str]:
+        """Return the project `project_id` with its boards, epics and open sprints as the text of a json object, if
+        the user `user_id` may read it, or None otherwise. The document is assembled by the database in one round
+        trip, each child table being aggregated with an index scan on its project id, and returned without being
+        parsed. Raise DatabaseQueryError if query failed.
+        """
+        result = self.query(PROJECT_TREE_QUERY, project_id, user_id, user_id, user_id, statement="read_project_tree")
+        return result[0] if result is not None else None
+
+    def create_story(self, story: Story) -> int:
+        """Given a `story` object, create the story entry in database table and return the integer `story_id` of the
+        created story. The story is added to the burndown of its sprint, to the rollups of its epic and sprint and
+        below its parent in the hierarchy, and its move onto its board, if any, to the transitions and the work in
+        progress of the board. Raise DatabaseQueryError if creation failed.
+        """
+        columns = STORY_TABLE_COLUMNS[1:]
+        # A story created on a board entered it and started when it was created.
+        entered_at = story.created_at if story.board_id is not None else None
+        changes = """SELECT sprint_id, epic_id, board_id, extract(epoch FROM coalesce(board_entered_at, created_at)),
+                         status, coalesce(estimate, 0), 1 FROM created"""
+        query = f"""WITH created AS (
+                        INSERT INTO story({', '.join(columns)}, board_entered_at, started_at)
+                        VALUES ({', '.join(['%s'] * (len(columns) + 2))})
+                        RETURNING story_id, sprint_id, epic_id, status, estimate, board_id, created_at,
+                                  created_by, parent_story, board_entered_at),
+                    linked AS (
+                        INSERT INTO story_closure (ancestor_id, descendant_id, depth)
+                        SELECT story_id, story_id, 0 FROM created
+                        UNION ALL
+                        SELECT c.ancestor_id, n.story_id, c.depth + 1
+                        FROM created n JOIN story_closure c ON c.descendant_id = n.parent_story),
+                    moved AS (
+                        INSERT INTO story_transition (story_id, from_board, to_board, moved_at, moved_by)
+                        SELECT story_id, NULL, board_id, created_at, created_by FROM created
+                        WHERE board_id IS NOT NULL),
+                    {STORY_AGGREGATE_CHANGES.format(changes=changes)}
+                    SELECT story_id FROM created"""
+        result = self.query(query, *(getattr(story, column) for column in columns), entered_at, entered_at,
+                            statement="create_story")
+        if result is None:
+            raise DatabaseQueryError
+        self._notify_story_write(result[0], story.board_id)
+        return result[0]
+
+    def read_story(self, story_id: int, for_update: bool = False) -> Story:
+        """Given a `story_id` integer, read the story from database and return a `Story` object. If `for_update`, the
+        row is locked until the end of the current transaction. Raise BadRequestError if story id is invalid or
+        DatabaseQueryError if the story doesn't exist.
+        """
+        if story_id <= 0:
+            raise BadRequestError("Invalid story id")
+        query = f"SELECT {STORY_SELECT} FROM story s WHERE s.story_id = %s"
+        if for_update:
+            query += " FOR UPDATE OF s"
+        result = self.query(query, story_id, statement="read_story")
+        if result is None:
+            raise DatabaseQueryError(f"Story {story_id} not found")
+        return Story(**dict(zip(STORY_COLUMNS, result)))
+
+    def update_story(self, story_id: int, fields: Mapping[str, Any], user_id: Optional[int] = None) -> Story:
+        """Given a `story_id` integer, update the story `fields`, a map of column names and values, by user `user_id`
+        and return the updated `Story` object. A move of the story to another board is appended to the transitions,
+        changes of its epic, sprint, board, status or estimate are applied to the sprint burndowns, the epic and sprint
+        rollups and the work in progress of the boards, and a new parent moves its whole subtree in the hierarchy. The
+        new parent must not be in the subtree of the story. Raise BadRequestError if a field is invalid or
+        DatabaseQueryError if the story doesn't exist.
+        """
+        if story_id <= 0 or not fields or not set(fields).issubset(STORY_TABLE_COLUMNS[1:]):
+            raise BadRequestError("Invalid story id or update fields")
+        assignments = [f"{field} = %s" for field in fields]
+        params = list(fields.values())
+        now = datetime.now()
+        if "board_id" in fields:
+            # The right side of SET reads the story before the update, the times change only if the board does.
+            board_id = fields["board_id"]
+            assignments += ["""board_entered_at = CASE WHEN s.board_id IS NOT DISTINCT FROM %s::integer
+                                   THEN s.board_entered_at WHEN %s::integer IS NOT NULL THEN %s::timestamp END""",
+                            """started_at = coalesce(s.started_at, CASE WHEN s.board_id IS DISTINCT FROM %s::integer
+                                   AND %s::integer IS NOT NULL THEN %s::timestamp END)"""]
+            params += [board_id, board_id, now, board_id, board_id, now]
+        # The transition is not visible to the history subquery of the same statement, so it is appended to it.
+        history = f"""array_cat({BOARD_HISTORY.format(story="u")}, CASE WHEN u.old_board_id IS NOT NULL
+                          AND u.old_board_id IS DISTINCT FROM u.board_id THEN ARRAY[u.old_board_id] END)"""
+        changes = """SELECT c.* FROM updated u CROSS JOIN LATERAL (VALUES
+                         (u.old_sprint_id, u.old_epic_id, u.old_board_id,
+                          -extract(epoch FROM coalesce(u.old_board_entered_at, u.old_created_at)), u.old_status,
+                          -coalesce(u.old_estimate, 0), -1),
+                         (u.sprint_id, u.epic_id, u.board_id,
+                          extract(epoch FROM coalesce(u.board_entered_at, u.created_at)), u.status,
+                          coalesce(u.estimate, 0), 1)) c"""
+        query = f"""WITH updated AS (
+                        UPDATE story s SET {', '.join(assignments)} FROM story old
+                        WHERE s.story_id = %s AND old.story_id = s.story_id
+                        RETURNING old.board_id AS old_board_id, old.sprint_id AS old_sprint_id,
+                                  old.epic_id AS old_epic_id, old.status AS old_status, old.estimate AS old_estimate,
+                                  old.parent_story AS old_parent_story, old.created_at AS old_created_at,
+                                  old.board_entered_at AS old_board_entered_at, s.board_entered_at,
+                                  {', '.join(f's.{column}' for column in STORY_TABLE_COLUMNS)}),
+                    {STORY_CLOSURE_CHANGES},
+                    moved AS (
+                        INSERT INTO story_transition (story_id, from_board, to_board, moved_at, moved_by)
+                        SELECT story_id, old_board_id, board_id, %s::timestamp, %s::integer FROM updated
+                        WHERE old_board_id IS DISTINCT FROM board_id),
+                    {STORY_AGGREGATE_CHANGES.format(changes=changes)}
+                    SELECT u.old_board_id, {', '.join(history if column == "board_history" else f"u.{column}"
+                                                      for column in STORY_COLUMNS)}
+                    FROM updated u"""
+        result = self.query(query, *params, story_id, now, user_id, statement="update_story")
+        if result is None:
+            raise DatabaseQueryError(f"Story {story_id} not found")
+        story = Story(**dict(zip(STORY_COLUMNS, result[1:])))
+        self._notify_story_write(story_id, result[0], story.board_id)
+        return story
+
+    def delete_story(self, story_id: int) -> None:
+        """Given a `story_id` integer, delete the story. The story_deleted_aggregates trigger removes it from the
+        burndown of its sprint, the rollups of its epic and sprint and the work in progress of its board, as for the
+        stories deleted with their board or project. Raise BadRequestError if story id is invalid or DatabaseQueryError
+        if the story doesn't exist or can't be deleted, e.g. it has sub-stories.
+        """
+        if story_id <= 0:
+            raise BadRequestError("Invalid story id")
+        result = self.query("DELETE FROM story WHERE story_id = %s RETURNING board_id", story_id,
+                            statement="delete_story")
+        if result is None:
+            raise DatabaseQueryError(f"Story {story_id} not found")
+        self._notify_story_write(story_id, result[0])
+
+    def story_refs_valid(self, project_id: int, board_id: Optional[int] = None, epic_id: Optional[int] = None,
+                         parent_story: Optional[int] = None, sprint_id: Optional[int] = None) -> bool:
+        """Return true if the board, epic, parent story and sprint a story refers to, the ones not None, all belong
+        to the project `project_id`. Raise DatabaseQueryError if query failed.
+        """
+        query = """SELECT (%s::integer IS NULL OR EXISTS (SELECT 1 FROM board WHERE board_id = %s AND project_id = %s))
+                   AND (%s::integer IS NULL OR EXISTS (SELECT 1 FROM epic WHERE epic_id = %s AND project_id = %s))
+                   AND (%s::integer IS NULL
+                        OR EXISTS (SELECT 1 FROM story WHERE story_id = %s AND project_id = %s))
+                   AND (%s::integer IS NULL
+                        OR EXISTS (SELECT 1 FROM sprint WHERE sprint_id = %s AND project_id = %s))"""
+        result = self.query(query, board_id, board_id, project_id, epic_id, epic_id, project_id, parent_story,
+                            parent_story, project_id, sprint_id, sprint_id, project_id, statement="story_refs_valid")
+        return bool(result[0])
+
+    def read_story_project(self, story_id: int) -> Optional[int]:
+        """Return the project id of story `story_id`, or None if it doesn't exist. Raise DatabaseQueryError if query
+        failed.
+        """
+        result = self.query("SELECT project_id FROM story WHERE story_id = %s", story_id, statement="read_story_project")
+        return result[0] if result is not None else None
+
+    def lock_story(self, story_id: int) -> bool:
+        """Share lock the story `story_id` until the end of the current transaction, so it can't be reparented or
+        deleted meanwhile, and return whether it exists. The statements run after it in the transaction see the writes
+        committed by the transactions it waited for. Raise DatabaseQueryError if query failed.
+        """
+        return self.query("SELECT 1 FROM story WHERE story_id = %s FOR SHARE", story_id,
+                          statement="lock_story") is not None
+
+    def lock_story_subtree(self, story_id: int) -> None:
+        """Lock the stories of the subtree of story `story_id`, the story included, for update until the end of the
+        current transaction, in story id order, so no story of the subtree can be reparented, or get a new child,
+        before the story is. Raise DatabaseQueryError if query failed.
+        """
+        self.query("""SELECT 1 FROM story_closure c JOIN story s ON s.story_id = c.descendant_id
+                      WHERE c.ancestor_id = %s ORDER BY s.story_id FOR UPDATE OF s""", story_id, fetch="all",
+                   statement="lock_story_subtree")
+
+    def read_story_subtree(self, story_id: int, max_depth: Optional[int] = None) -> List[Mapping[str, Any]]:
+        """Return the stories of the subtree of story `story_id`, the story included, down to `max_depth` levels
+        below it if not None, ordered by depth then id. Each story is a map of `STORY_TREE_COLUMNS`, its depth being
+        its distance to story `story_id`. The subtree is one range scan of the closure primary key. Raise
+        DatabaseQueryError if query failed.
+        """
+        query = f"""SELECT {', '.join(f"s.{column}" for column in STORY_TREE_COLUMNS[:-1])}, c.depth
+                    FROM story_closure c JOIN story s ON s.story_id = c.descendant_id
+                    WHERE c.ancestor_id = %s AND (%s::integer IS NULL OR c.depth <= %s)
+                    ORDER BY c.depth, s.story_id"""
+        rows = self.query(query, story_id, max_depth, max_depth, fetch="all", statement="read_story_subtree")
+        return [dict(zip(STORY_TREE_COLUMNS, row)) for row in rows]
+
+    def read_story_ancestors(self, story_id: int, lock: bool = False) -> List[Mapping[str, Any]]:
+        """Return the ancestors of story `story_id`, the story excluded, from the root of its tree to its parent. Each
+        story is a map of `STORY_TREE_COLUMNS`, its depth being its distance to story `story_id`. If `lock`, the
+        ancestors are share locked until the end of the current transaction, so they can't be reparented meanwhile;
+        the story itself is not, see `lock_story`.
+        The ancestors are one range scan of the closure descendant index. Raise DatabaseQueryError if query failed.
+        """
+        query = f"""SELECT {', '.join(f"s.{column}" for column in STORY_TREE_COLUMNS[:-1])}, c.depth
+                    FROM story_closure c JOIN story s ON s.story_id = c.ancestor_id
+                    WHERE c.descendant_id = %s AND c.depth > 0 ORDER BY c.depth DESC"""
+        if lock:
+            query += " FOR SHARE OF s"
+        rows = self.query(query, story_id, fetch="all", statement=f"read_story_ancestors{'_lock' if lock else ''}")
+        return [dict(zip(STORY_TREE_COLUMNS, row)) for row in rows]
+
+    def read_story_rollup(self, story_id: int) -> List[Tuple[int, int, int]]:
+        """Return the rollup of the subtree of story `story_id`, the story included, as rows of (status, stories,
+        estimate) of the statuses of its stories, ordered by status. Raise DatabaseQueryError if query failed.
+        """
+        query = """SELECT s.status, count(*), sum(coalesce(s.estimate, 0))
+                   FROM story_closure c JOIN story s ON s.story_id = c.descendant_id
+                   WHERE c.ancestor_id = %s GROUP BY s.status ORDER BY s.status"""
+        rows = self.query(query, story_id, fetch="all", statement="read_story_rollup")
+        return [(status, stories, int(estimate)) for status, stories, estimate in rows]
+
+    def rebuild_story_closure(self) -> int:
+        """Recompute the closure of the story hierarchy from the parents of the stories, e.g. to backfill it. Story
+        writes wait for the rebuild to commit. Return the number of closure rows written. Raise DatabaseQueryError if
+        query failed.
+        """
+        with self.transaction():
+            self.query("LOCK TABLE story_closure IN EXCLUSIVE MODE")
+            self.query("DELETE FROM story_closure")
+            return self.query(STORY_CLOSURE_REBUILD_QUERY)
+
+    def check_story_closure(self) -> List[Tuple[int, int, Optional[int], Optional[int]]]:
+        """Compare the closure of the story hierarchy with a full recompute from the parents of the stories. Return
+        the rows of (ancestor_id, descendant_id, depth, recomputed depth) that differ, a missing row having a None
+        depth, none if the closure is consistent. Raise DatabaseQueryError if query failed.
+        """
+        return self.query(STORY_CLOSURE_CHECK_QUERY, fetch="all")
+
+    def search_stories(self, project_id: int, text: str, after: Optional[Tuple[float, int]] = None,
+                       limit: int = 20) -> List[Mapping[str, Any]]:
+        """Return up to `limit` stories of project `project_id` matching the web search `text`, e.g. `login -oauth`
+        or `"sign up"`, in their name or description, best first by (rank, story_id). Only stories ranked after the
+        (rank, story_id) pair `after` are returned if not None. Each story is a map of `STORY_SEARCH_COLUMNS`, with
+        the matching words of its name and description fragments highlighted. Matches are found with the GIN index on
+        (project_id, search_vector), and highlights are only computed for the stories of the page. Raise
+        DatabaseQueryError if query failed.
+        """
+        keyset = "WHERE (rank, story_id) < (%s::real, %s)" if after is not None else ""
+        query = f"""SELECT story_id, story_name, story_type, status, board_id, rank,
+                           ts_headline('english', story_name, q, %s),
+                           ts_headline('english', coalesce(description, ''), q, %s)
+                    FROM (
+                        SELECT * FROM (
+                            SELECT s.story_id, s.story_name, s.story_type, s.status, s.board_id, s.description, q,
+                                   ts_rank(s.search_vector, q) AS rank
+                            FROM story s, websearch_to_tsquery('english', %s) q
+                            WHERE s.project_id = %s AND s.search_vector @@ q
+                        ) matches {keyset}
+                        ORDER BY rank DESC, story_id DESC LIMIT %s
+                    ) page ORDER BY rank DESC, story_id DESC"""
+        args = [HEADLINE_OPTIONS, HEADLINE_OPTIONS, text, project_id, *(after or ()), limit]
+        rows = self.query(query, *args, fetch="all", statement="search_stories")
+        return [dict(zip(STORY_SEARCH_COLUMNS, row)) for row in rows]
+
+    def read_board(self, board_id: int) -> Optional[Tuple[int, str]]:
+        """Return the pair of project id and board document of board `board_id`, or None if it doesn't exist. The
+        document is the text of a json object of the board with the list of its story cards in id order, each with
+        the names of its assignee and reporter, assembled by the database in one query. Raise DatabaseQueryError if
+        query failed.
+        """
+        return self.query(BOARD_QUERY, board_id, statement="read_board")
+
+    def read_board_project(self, board_id: int) -> Optional[int]:
+        """Return the project id of board `board_id`, or None if it doesn't exist. Raise DatabaseQueryError if query
+        failed.
+        """
+        result = self.query("SELECT project_id FROM board WHERE board_id = %s", board_id, statement="read_board_project")
+        return result[0] if result is not None else None
+
+    def read_rank_gap(self, board_id: int, story_id: int, after_id: Optional[int] = None,
+                      before_id: Optional[int] = None) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Return the pair of ranks a story `story_id` moved on board `board_id` must sort between: right after the
+        story `after_id`, right before the story `before_id`, or at the end of the board if both are None. A None
+        rank is the start or end of the board. Return None if the anchor story is not a ranked story of the board.
+        Each bound is one index lookup on (board_id, board_rank). Raise DatabaseQueryError if query failed.
+        """
+        if after_id is not None:
+            query = """SELECT a.board_rank, (SELECT min(s.board_rank) FROM story s WHERE s.board_id = a.board_id
+                                             AND s.board_rank > a.board_rank AND s.story_id <> %s)
+                       FROM story a WHERE a.story_id = %s AND a.board_id = %s AND a.board_rank IS NOT NULL"""
+            return self.query(query, story_id, after_id, board_id, statement="read_rank_gap_after")
+        if before_id is not None:
+            query = """SELECT (SELECT max(s.board_rank) FROM story s WHERE s.board_id = b.board_id
+                               AND s.board_rank < b.board_rank AND s.story_id <> %s), b.board_rank
+                       FROM story b WHERE b.story_id = %s AND b.board_id = %s AND b.board_rank IS NOT NULL"""
+            return self.query(query, story_id, before_id, board_id, statement="read_rank_gap_before")
+        query = "SELECT max(board_rank), NULL FROM story WHERE board_id = %s AND story_id <> %s"
+        return self.query(query, board_id, story_id, statement="read_rank_gap_end")
+
+    def read_unranked_boards(self) -> List[int]:
+        """Return the ids of the boards with stories that have no rank, e.g. created before stories were ranked,
+        in ascending order. Raise DatabaseQueryError if query failed.
+        """
+        rows = self.query("""SELECT DISTINCT board_id FROM story WHERE board_id IS NOT NULL AND board_rank IS NULL
+                             ORDER BY board_id""", fetch="all")
+        return [row[0] for row in rows]
+
+    def rebalance_board_ranks(self, board_id: int) -> int:
+        """Replace the ranks of the stories of board `board_id` by short ranks spread evenly, keeping their order, and
+        notify the story write listeners once for the whole board. Stories with no rank are ranked after the others,
+        by id. The stories of the board are locked meanwhile, so this runs in the background when ranks grew too
+        long. Return the number of stories ranked. Raise DatabaseQueryError if query failed.
+        """
+        with self.transaction():
+            rows = self.query("""SELECT story_id FROM story WHERE board_id = %s
+                                 ORDER BY board_rank, story_id FOR UPDATE""", board_id, fetch="all")
+            story_ids = [row[0] for row in rows]
+            if story_ids:
+                self.query("""UPDATE story s SET board_rank = v.board_rank
+                              FROM unnest(%s::integer[], %s::text[]) v(story_id, board_rank)
+                              WHERE s.story_id = v.story_id""", story_ids, spread_ranks(len(story_ids)))
+        self._notify_story_write(None, board_id)
+        return len(story_ids)
+
+    def read_sprint_project(self, sprint_id: int) -> Optional[int]:
+        """Return the project id of sprint `sprint_id`, or None if it doesn't exist. Raise DatabaseQueryError if query
+        failed.
+        """
+        result = self.query("SELECT project_id FROM sprint WHERE sprint_id = %s", sprint_id,
+                            statement="read_sprint_project")
+        return result[0] if result is not None else None
+
+    def read_burndown(self, sprint_id: int) -> List[Tuple[date, int, int, int]]:
+        """Return the burndown of sprint `sprint_id` as rows of (day, status, estimate, stories) ordered by day then
+        status, with the total estimate and number of the stories of the sprint in each status at the end of each
+        day, from its begin to its end or today. Only the daily aggregate is read, never the stories. Raise
+        DatabaseQueryError if query failed.
+        """
+        return self.query(BURNDOWN_QUERY, min(StoryStatus).value, max(StoryStatus).value, sprint_id, fetch="all",
+                          statement="read_burndown")
+
+    def rebuild_burndown(self, sprint_id: Optional[int] = None) -> int:
+        """Recompute the burndown of sprint `sprint_id`, or of all sprints if None, from their stories, e.g. to
+        backfill it or to repair it after stories were written around the gateway. Without a history of the stories,
+        a story counts in its current status from the day it was created, or as TODO until the day it was closed if
+        it is done. Story writes wait for the rebuild to commit. Return the number of aggregate rows written. Raise
+        DatabaseQueryError if query failed.
+        """
+        with self.transaction():
+            self.query("LOCK TABLE sprint_burndown IN EXCLUSIVE MODE")
+            self.query("DELETE FROM sprint_burndown WHERE %s::integer IS NULL OR sprint_id = %s", sprint_id, sprint_id)
+            todo, done = StoryStatus.TODO.value, StoryStatus.DONE.value
+            return self.query(BURNDOWN_REBUILD_QUERY, done, todo, todo, sprint_id, sprint_id, done)
+
+    def check_burndown(self, sprint_id: Optional[int] = None) -> List[Tuple[int, int, int, int, int, int]]:
+        """Compare the current totals of the burndown of sprint `sprint_id`, or of all sprints if None, with a full
+        recompute from their stories. Return the rows of (sprint_id, status, estimate, stories, recomputed estimate,
+        recomputed stories) that differ, none if the aggregate is consistent. Raise DatabaseQueryError if query
+        failed.
+        """
+        return self.query(BURNDOWN_CHECK_QUERY, sprint_id, sprint_id, sprint_id, sprint_id, fetch="all")
+
+    def read_epic_project(self, epic_id: int) -> Optional[int]:
+        """Return the project id of epic `epic_id`, or None if it doesn't exist. Raise DatabaseQueryError if query
+        failed.
+        """
+        result = self.query("SELECT project_id FROM epic WHERE epic_id = %s", epic_id, statement="read_epic_project")
+        return result[0] if result is not None else None
+
+    def read_rollup(self, key: str, key_id: int) -> List[Tuple[int, int, int]]:
+        """Return the rollup of the epic, if `key` is "epic", or the sprint, if "sprint", of id `key_id` as rows of
+        (status, stories, estimate) of the statuses of its stories, ordered by status. The rollup is maintained on
+        every story write, so this is one primary key range scan. Raise DatabaseQueryError if query failed.
+        """
+        if key not in ROLLUP_KEYS:
+            raise BadRequestError("Invalid rollup key")
+        rows = self.query(ROLLUP_QUERY.format(key=key), key_id, fetch="all", statement=f"read_{key}_rollup")
+        return [(status, stories, int(estimate)) for status, stories, estimate in rows]
+
+    def check_rollups(self) -> List[Tuple[str, int, int, int, int, int, int]]:
+        """Compare the epic and sprint rollups with a full recompute from the stories, as a safety net against story
+        writes made around the gateway, e.g. with the delete trigger disabled. Return the rows of (key, id, status,
+        estimate, stories, recomputed estimate, recomputed stories) that differ, none if the rollups are consistent.
+        Raise DatabaseQueryError if query failed.
+        """
+        query = " UNION ALL ".join(ROLLUP_CHECK_QUERY.format(key=key, recompute=ROLLUP_RECOMPUTE.format(key=key))
+                                   for key in ROLLUP_KEYS)
+        return self.query(f"{query} ORDER BY 1, 2, 3", *[None, None] * len(ROLLUP_KEYS), fetch="all")
+
+    def repair_rollups(self) -> List[Tuple[str, int, int, int, int, int, int]]:
+        """Check the epic and sprint rollups as `check_rollups` does and recompute the totals of every epic and sprint
+        found to differ from their stories, e.g. to backfill them. Story writes wait for the repair to commit. Return
+        the rows that differed. Raise DatabaseQueryError if query failed.
+        """
+        with self.transaction():
+            self.query(f"LOCK TABLE {', '.join(f'{key}_rollup' for key in ROLLUP_KEYS)} IN EXCLUSIVE MODE")
+            drift = self.check_rollups()
+            for key in ROLLUP_KEYS:
+                key_ids = sorted({key_id for drift_key, key_id, *_ in drift if drift_key == key})
+                if key_ids:
+                    self.query(f"DELETE FROM {key}_rollup WHERE {key}_id = ANY(%s)", key_ids)
+                    self.query(f"""INSERT INTO {key}_rollup ({key}_id, status, estimate, stories)
+                                   {ROLLUP_RECOMPUTE.format(key=key)}""", key_ids, key_ids)
+            return drift
+
+    def read_flow_times(self, project_id: int, since: datetime,
+                        until: datetime) -> Tuple[int, Optional[float], Optional[float], Optional[float],
+                                                  Optional[float], Optional[float], Optional[float]]:
+        """Return the number of stories of project `project_id` closed from `since` to `until`, then the mean, median
+        and 85th percentile of their lead time, from creation to close, and of their cycle time, from their first
+        move onto a board to close, in seconds, or None if no story was closed. Only the stories closed in the window
+        are read, through an index, so the cost follows the window and not the history of the project. The
+        percentiles need every time of the window, which is why they are not kept in a daily aggregate. Raise
+        DatabaseQueryError if query failed.
+        """
+        result = self.query(FLOW_TIMES_QUERY, project_id, since, until, StoryStatus.DONE.value,
+                            statement="read_flow_times")
+        return tuple(float(value) if value is not None and i else value for i, value in enumerate(result))
+
+    def read_wip(self, project_id: int) -> List[Tuple[int, int, float]]:
+        """Return the work in progress of project `project_id` as rows of (board_id, stories, mean age) of the boards
+        with open stories, the mean age being the seconds since the stories moved onto the board. The counters of the
+        boards are maintained on every story write, so no story is read. Raise DatabaseQueryError if query failed.
+        """
+        rows = self.query(WIP_QUERY, datetime.now(), project_id, fetch="all", statement="read_wip")
+        return [(board_id, stories, float(age)) for board_id, stories, age in rows]
+
+    def check_wip(self) -> List[Tuple[int, int, float, int, float]]:
+        """Compare the work in progress counters of the boards with a full recompute from the stories. Return the rows
+        of (board_id, stories, entered, recomputed stories, recomputed entered) that differ, `entered` being the sum of
+        the epochs the stories moved onto the board, none if the counters are consistent. Raise DatabaseQueryError if
+        query failed.
+        """
+        rows = self.query(WIP_CHECK_QUERY, StoryStatus.DONE.value, fetch="all")
+        return [(board_id, stories, float(entered), expected_stories, float(expected_entered))
+                for board_id, stories, entered, expected_stories, expected_entered in rows]
+
+    def rebuild_wip(self) -> int:
+        """Backfill the board times of the stories from their transitions and recompute the work in progress counters
+        of every board from the stories, e.g. after an upgrade or after stories were written around the gateway. Story
+        writes changing the counters wait for the rebuild to commit. Return the number of boards with open stories.
+        Raise DatabaseQueryError if query failed.
+        """
+        with self.transaction():
+            self.query("LOCK TABLE board_wip IN EXCLUSIVE MODE")
+            self.query(STORY_TIMES_BACKFILL_QUERY)
+            self.query("DELETE FROM board_wip")
+            return self.query(f"INSERT INTO board_wip (board_id, stories, entered) {WIP_RECOMPUTE}",
+                              StoryStatus.DONE.value)
+
+    def read_board_story(self, board_id: int, story_id: int) -> Optional[str]:
+        """Return the json text of the card of story `story_id` on the board read model, or None if the story
+        doesn't exist or is not on board `board_id`. Raise DatabaseQueryError if query failed.
+        """
+        query = f"""SELECT {BOARD_STORY_ENTRY}::text FROM story s {BOARD_STORY_JOINS}
+                    WHERE s.story_id = %s AND s.board_id = %s"""
+        result = self.query(query, story_id, board_id, statement="read_board_story")
+        return result[0] if result is not None else None
+
+    @staticmethod
+    def _story_export_query(fmt: str, upper_bound: bool = False) -> str:
+        """Return the query selecting the stories of a project with an id greater than a given one, and at most
+        another one if `upper_bound`, in id order: a json record per story for "ndjson", or the
+        `STORY_EXPORT_COLUMNS` as text for "csv".
+        """
+        if fmt == "ndjson":
+            select = (f"jsonb_build_object('kind', 'story', 'board_history', {BOARD_HISTORY.format(story='s')})"
+                      " || (to_jsonb(s) - 'search_vector')")
+        else:
+            select = ", ".join(f"{BOARD_HISTORY.format(story='s')}::text" if column == "board_history"
+                               else f"s.{column}::text" for column in STORY_EXPORT_COLUMNS)
+        return (f"SELECT {select} FROM story s WHERE s.project_id = %s AND s.story_id > %s"
+                + (" AND s.story_id <= %s" if upper_bound else "") + " ORDER BY s.story_id")
+
+    def iter_project_export(self, project_id: int, fmt: str = "ndjson", after_story_id: int = 0) -> Iterator:
+        """Return an iterator over the export rows of project `project_id`, streamed from server-side cursors. For
+        "ndjson" rows are records with a "kind" field: the project, its epics and sprints, then its stories. For
+        "csv" rows are tuples of `STORY_EXPORT_COLUMNS` of its stories. Only stories with an id greater than
+        `after_story_id` are exported, in id order, and the other records only if it is 0, so an interrupted export
+        can be resumed.
+        """
+        stories = self.query_iter(PostgresGateway._story_export_query(fmt), project_id, after_story_id)
+        if fmt != "ndjson":
+            return stories
+        records = self.query_iter(PROJECT_RECORDS_QUERY, *[project_id] * 3) if after_story_id == 0 else ()
+        return (row[0] for rows in (records, stories) for row in rows)
+
+    def next_story_bound(self, project_id: int, after_story_id: int, batch_size: int) -> Optional[int]:
+        """Return the largest id of the next `batch_size` stories of project `project_id` with an id greater than
+        `after_story_id`, or None if there are none.
+        """
+        query = """SELECT max(story_id) FROM (SELECT story_id FROM story WHERE project_id = %s AND story_id > %s
+                   ORDER BY story_id LIMIT %s) batch"""
+        return self.query(query, project_id, after_story_id, batch_size, statement="next_story_bound")[0]
+
+    def copy_project_records(self, project_id: int, out: IO[str]) -> int:
+        """Write the project, epics and sprints records of project `project_id` to `out` as NDJSON with COPY. Return
+        the number of records written.
+        """
+        return self.copy_out(PROJECT_RECORDS_QUERY, *[project_id] * 3, out=out, fmt="ndjson")
+
+    def copy_project_stories(self, project_id: int, after_story_id: int, upper_story_id: int, out: IO[str],
+                             fmt: str = "ndjson", header: bool = False) -> int:
+        """Write the stories of project `project_id` with an id greater than `after_story_id` and at most
+        `upper_story_id` to `out` with COPY, as NDJSON records or as CSV rows of `STORY_EXPORT_COLUMNS` with an
+        optional `header`. Return the number of stories written.
+        """
+        query = PostgresGateway._story_export_query(fmt, upper_bound=True)
+        return self.copy_out(query, project_id, after_story_id, upper_story_id, out=out, fmt=fmt, header=header)
 
     @staticmethod
     def create(filename="config.ini") -> DbGateway:
@@ -180,6 +1419,13 @@ class PostgresGateway(DbGateway):
                 dbname=config["dbname"],
                 user=config["user"],
                 password=config["password"],
+                pool_min_size=int(config.get("pool_min_size", 0)),
+                pool_max_size=int(config.get("pool_max_size", 0)),
+                pool_timeout=float(config.get("pool_timeout", 5.0)),
+                pool_validate_after=float(config.get("pool_validate_after", 30.0)),
+                prepared_statements=config.get("prepared_statements", "false").lower() == "true",
+                cursor_itersize=int(config.get("cursor_itersize", 2000)),
+                stream_max_connections=int(config.get("stream_max_connections", 4)),
             )
         except KeyError as e:
             logger.error(f"Invalid config file \"{filename}\" section \"{section}\": {e}")
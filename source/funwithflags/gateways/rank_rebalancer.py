@@ -0,0 +1,70 @@
+"""Module for the background rebalancing of story ranks."""
+import logging
+import queue
+import threading
+from typing import Optional, Set
+
+from funwithflags.entities import read_config_file
+from .db_gateway import PostgresGateway
+
+
+logger = logging.getLogger(__name__)
+
+
+class RankRebalancer:
+    """Background worker respacing the ranks of the stories of a board. A move only rewrites the rank of the moved
+    story, taken between the ranks of its new neighbours, so ranks grow longer when stories keep being moved to the
+    same place. Once a move produces a rank longer than `max_length` the board is queued, and a daemon thread, started
+    by the first request, replaces the ranks of all its stories by short ones. Requests for a board already queued
+    are merged.
+    """
+
+    def __init__(self, postgres_gateway: PostgresGateway, max_length: int = 16):
+        self._postgres_gateway = postgres_gateway
+        self.max_length = max_length
+        self._boards = queue.Queue()
+        self._queued: Set[int] = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def check(self, board_id: int, rank: str) -> bool:
+        """Queue a rebalance of board `board_id` if `rank`, just given to one of its stories, is too long. Return true
+        if it was queued.
+        """
+        if len(rank) <= self.max_length:
+            return False
+        with self._lock:
+            if board_id in self._queued:
+                return False
+            self._queued.add(board_id)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="rank-rebalancer", daemon=True)
+                self._worker.start()
+        self._boards.put(board_id)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            board_id = self._boards.get()
+            with self._lock:
+                self._queued.discard(board_id)
+            try:
+                stories = self._postgres_gateway.rebalance_board_ranks(board_id)
+                logger.info(f"RankRebalancer respaced the ranks of {stories} stories of board {board_id}")
+            except Exception as e:
+                logger.error(f"RankRebalancer failed to rebalance board {board_id}. Error: {e}")
+
+    @staticmethod
+    def create(postgres_gateway: PostgresGateway, filename="config.ini") -> Optional["RankRebalancer"]:
+        """Factory method to create a `RankRebalancer` object, configured by the optional "rank_rebalance" section.
+        Return None if the section is missing or the rebalance is not enabled.
+        """
+        section = "rank_rebalance"
+        config = read_config_file(filename, section, required=False)
+        if config.get("enabled", "false").lower() != "true":
+            return None
+        try:
+            return RankRebalancer(postgres_gateway, max_length=int(config.get("max_length", 16)))
+        except ValueError as e:
+            logger.error(f"Invalid config file \"{filename}\" section \"{section}\": {e}")
+            raise e
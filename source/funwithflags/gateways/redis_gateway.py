@@ -1,7 +1,10 @@
 """Module for Redis cache gateway."""
+from contextlib import contextmanager
 from datetime import timedelta
 import logging
-from typing import Optional
+import threading
+from time import sleep
+from typing import Any, Callable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
 
 import redis
 
@@ -11,6 +14,68 @@ from funwithflags.entities import read_config_file
 logger = logging.getLogger(__name__)
 
 
+def _decode(value: Optional[bytes]) -> Optional[str]:
+    return value.decode("utf-8") if value else value
+
+
+class RedisPipeline:
+    """Batch of Redis commands queued inside a `RedisGateway.pipeline` block and sent in one round trip when the block
+    exits. Replies are available in `results` afterwards, in the order the commands were queued.
+    """
+
+    def __init__(self, pipeline):
+        self._pipeline = pipeline
+        self._decoders = []
+        self.results: List[Any] = []
+
+    def set(self, name: str, value: str, expire: Optional[timedelta] = None, nx: bool = False) -> "RedisPipeline":
+        self._pipeline.set(name, value, ex=expire, nx=nx)
+        self._decoders.append(None)
+        return self
+
+    def get(self, name: str) -> "RedisPipeline":
+        self._pipeline.get(name)
+        self._decoders.append(_decode)
+        return self
+
+    def delete(self, *names: str) -> "RedisPipeline":
+        self._pipeline.delete(*names)
+        self._decoders.append(None)
+        return self
+
+    def incr(self, name: str) -> "RedisPipeline":
+        self._pipeline.incr(name)
+        self._decoders.append(None)
+        return self
+
+    def expire(self, name: str, expire: timedelta) -> "RedisPipeline":
+        self._pipeline.expire(name, expire)
+        self._decoders.append(None)
+        return self
+
+    def zadd(self, name: str, mapping: Mapping[str, float]) -> "RedisPipeline":
+        self._pipeline.zadd(name, mapping)
+        self._decoders.append(None)
+        return self
+
+    def zrem(self, name: str, *members: str) -> "RedisPipeline":
+        self._pipeline.zrem(name, *members)
+        self._decoders.append(None)
+        return self
+
+    def zremrangebyscore(self, name: str, min_score: float, max_score: float) -> "RedisPipeline":
+        self._pipeline.zremrangebyscore(name, min_score, max_score)
+        self._decoders.append(None)
+        return self
+
+    def execute(self) -> List[Any]:
+        """Send all queued commands and return their replies. Called by `RedisGateway.pipeline` on exit."""
+        replies = self._pipeline.execute() if self._decoders else []
+        self.results = [decoder(reply) if decoder else reply for decoder, reply in zip(self._decoders, replies)]
+        self._decoders = []
+        return self.results
+
+
 class RedisGateway:
     def __init__(self, host: str, port: int = 6379, db: int = 0):
         self._host = host
@@ -21,9 +86,104 @@ class RedisGateway:
     def set(self, name: str, value: str, expire: Optional[timedelta] = None) -> bool:
         return self._redis.set(name, value, ex=expire)
 
+    def set_if_absent(self, name: str, value: str, expire: Optional[timedelta] = None) -> bool:
+        """Set key `name` only if it doesn't exist, return true if it was set."""
+        return bool(self._redis.set(name, value, ex=expire, nx=True))
+
     def get(self, name: str) -> Optional[str]:
-        value = self._redis.get(name)
-        return value.decode("utf-8") if value else value
+        return _decode(self._redis.get(name))
+
+    def zrangebyscore(self, name: str, min_score: float, max_score: float) -> List[Tuple[str, float]]:
+        """Return (member, score) pairs of the sorted set `name` with scores between `min_score` and `max_score`."""
+        return [(_decode(member), score)
+                for member, score in self._redis.zrangebyscore(name, min_score, max_score, withscores=True)]
+
+    def set_many(self, entries: Mapping[str, Tuple[str, Optional[timedelta]]], nx: bool = False) -> List[bool]:
+        """Set many keys in one round trip. `entries` maps each key name to a pair of value and expire time, so every
+        key can have its own TTL. Only keys that don't exist are set if `nx`.
+        """
+        with self.pipeline() as pipe:
+            for name, (value, expire) in entries.items():
+                pipe.set(name, value, expire, nx=nx)
+        return [bool(result) for result in pipe.results]
+
+    def get_many(self, names: Iterable[str]) -> List[Optional[str]]:
+        """Get many keys in one round trip, return their values in the order of `names`, None for missing keys."""
+        names = list(names)
+        return [_decode(value) for value in self._redis.mget(names)] if names else []
+
+    def compare_and_set(self, names: Sequence[str],
+                        update: Callable[[List[Optional[str]]], Mapping[str, Tuple[str, Optional[timedelta]]]],
+                        retries: int = 10) -> Optional[Mapping[str, Tuple[str, Optional[timedelta]]]]:
+        """Optimistic read-modify-write of the keys `names`: WATCH them, pass their values to `update`, which returns
+        the map of key names to pairs of value and expire time to set, and set these in MULTI/EXEC. If a watched key
+        changed meanwhile nothing is set and `update` is run again with the new values, up to `retries` times. Return
+        the map set, or None if every attempt conflicted.
+        """
+        with self._redis.pipeline() as pipe:
+            for _ in range(retries):
+                try:
+                    pipe.watch(*names)
+                    entries = update([_decode(value) for value in pipe.mget(names)])
+                    pipe.multi()
+                    for name, (value, expire) in entries.items():
+                        pipe.set(name, value, ex=expire)
+                    pipe.execute()
+                    return entries
+                except redis.WatchError:
+                    continue
+                finally:
+                    pipe.reset()
+        return None
+
+    def scan(self, match: str) -> Iterator[str]:
+        """Iterate over the key names matching the glob pattern `match`, with SCAN so Redis is not blocked."""
+        return (_decode(name) for name in self._redis.scan_iter(match=match, count=1000))
+
+    def delete(self, *names: str) -> int:
+        return self._redis.delete(*names)
+
+    def incr(self, name: str) -> int:
+        return self._redis.incr(name)
+
+    def publish(self, channel: str, message: str) -> int:
+        """Publish `message` on `channel`, return the number of subscribers that received it."""
+        return self._redis.publish(channel, message)
+
+    def subscribe(self, channel: str, handler: Callable[[str], None],
+                  on_subscribe: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """Start a daemon thread calling `handler` with every message published on `channel`. The subscription is
+        re-established after connection errors; `on_subscribe` is called each time it is (re)established, as messages
+        published while disconnected are lost.
+        """
+        def listen():
+            while True:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(channel)
+                    if on_subscribe:
+                        on_subscribe()
+                    for message in pubsub.listen():
+                        if message["type"] == "message":
+                            handler(_decode(message["data"]))
+                except redis.RedisError as e:
+                    logger.info(f"RedisGateway subscription to {channel} lost, will retry in 1 second. Error: {e}")
+                    sleep(1)
+                finally:
+                    pubsub.close()
+
+        thread = threading.Thread(target=listen, name=f"redis-subscriber-{channel}", daemon=True)
+        thread.start()
+        return thread
+
+    @contextmanager
+    def pipeline(self, transaction: bool = False):
+        """Context manager yielding a `RedisPipeline`. Commands queued in the block are sent in one round trip on
+        exit, wrapped in MULTI/EXEC if `transaction`. Nothing is sent if the block raises an exception.
+        """
+        pipe = RedisPipeline(self._redis.pipeline(transaction=transaction))
+        yield pipe
+        pipe.execute()
 
     @staticmethod
     def create(filename="config.ini"):
@@ -0,0 +1,49 @@
+"""Module for the per-user session registry."""
+from datetime import timedelta
+from time import time
+from typing import List, Tuple
+
+from .redis_gateway import RedisGateway, RedisPipeline
+from .token_cache import TokenStateCache, generation_key
+
+
+def sessions_key(user_id: int) -> str:
+    """Return the Redis key of the session index of a user."""
+    return f"sessions:{user_id}"
+
+
+class SessionRegistry:
+    """Per-user index of refresh token sessions kept in Redis as a sorted set of jtis scored by their expiry time.
+    Revoking all sessions of a user bumps the user's token generation instead of revoking every jti, so it costs a
+    constant number of Redis commands however many sessions the user has.
+    """
+
+    def __init__(self, redis_gateway: RedisGateway, token_cache: TokenStateCache):
+        self._redis_gateway = redis_gateway
+        self._token_cache = token_cache
+
+    @staticmethod
+    def add(pipe: RedisPipeline, user_id: int, jti: str, expires_in: timedelta) -> None:
+        """Queue the registration of session `jti` of a user on `pipe`, pruning the expired sessions of the user."""
+        now = time()
+        key = sessions_key(user_id)
+        pipe.zadd(key, {jti: now + expires_in.total_seconds()})
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.expire(key, expires_in)
+
+    def remove(self, user_id: int, jti: str) -> None:
+        with self._redis_gateway.pipeline() as pipe:
+            pipe.zrem(sessions_key(user_id), jti)
+
+    def list(self, user_id: int) -> List[Tuple[str, float]]:
+        """Return (jti, expiry timestamp) pairs of the live sessions of a user, ordered by expiry time."""
+        return self._redis_gateway.zrangebyscore(sessions_key(user_id), time(), "+inf")
+
+    def revoke_all(self, user_id: int) -> int:
+        """Revoke every token issued to a user so far and clear the session index. Return the new token generation.
+        """
+        with self._redis_gateway.pipeline(transaction=True) as pipe:
+            pipe.incr(generation_key(user_id)).delete(sessions_key(user_id))
+        generation = pipe.results[0]
+        self._token_cache.push_generation(user_id, generation)
+        return generation
@@ -0,0 +1,55 @@
+"""Module for the registry of named prepared statements."""
+from itertools import count
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+class StatementRegistry:
+    """Thread-safe registry giving a server-side name to each distinct SQL text of the hot gateway queries, so they are
+    parsed and planned once per connection with PREPARE and then run with EXECUTE.
+
+    Statements are registered under a readable `statement` name, e.g. "read_user_by_id". Variants of the same statement
+    with a different SQL text, like dynamic UPDATE statements with different field sets or reads of different columns,
+    get a numbered name each, e.g. "update_user_2". At most `max_statements` statements are registered, queries beyond
+    that run unprepared.
+    """
+
+    def __init__(self, max_statements: int = 256):
+        self._max_statements = max_statements
+        self._names: Dict[Tuple[str, str], str] = {}
+        self._statements: Dict[str, str] = {}
+        self._variants: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def name(self, statement: str, query: str) -> Optional[str]:
+        """Return the name the SQL `query` of `statement` is prepared under, or None if the registry is full."""
+        key = (statement, query)
+        name = self._names.get(key)
+        if name is not None:
+            return name
+        with self._lock:
+            name = self._names.get(key)
+            if name is None and len(self._names) < self._max_statements:
+                variant = self._variants.get(statement, 0) + 1
+                self._variants[statement] = variant
+                name = statement if variant == 1 else f"{statement}_{variant}"
+                self._statements[name] = query
+                self._names[key] = name
+            return name
+
+    def prepare_sql(self, name: str) -> str:
+        """Return the PREPARE statement of the registered statement `name`, with positional parameters."""
+        positions = count(1)
+        return f"PREPARE {name} AS " + _PLACEHOLDER.sub(lambda _: f"${next(positions)}", self._statements[name])
+
+    @staticmethod
+    def execute_sql(name: str, arg_count: int) -> str:
+        """Return the EXECUTE statement of the statement `name` taking `arg_count` arguments, to run with them."""
+        return f"EXECUTE {name} ({', '.join(['%s'] * arg_count)})" if arg_count else f"EXECUTE {name}"
+
+    def __len__(self) -> int:
+        return len(self._names)
@@ -0,0 +1,95 @@
+"""Module for the per-worker cache of token states."""
+from datetime import timedelta
+import logging
+import threading
+from typing import Optional
+
+from funwithflags.entities import CacheStats, TTLCache, read_config_file
+from .redis_gateway import RedisGateway
+
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "token-revocations"
+
+
+def generation_key(user_id: int) -> str:
+    """Return the Redis key of the token generation counter of a user."""
+    return f"token_gen:{user_id}"
+
+
+class TokenStateCache:
+    """In-process TTL/LRU cache of token states ("login", "logout" or None for unknown jti) and of per-user token
+    generations in front of Redis. Revocations and generation bumps are published on `REVOCATION_CHANNEL`, every
+    worker subscribes to it and caches the new state as soon as it is published. Cached states are otherwise
+    refreshed after `ttl` seconds.
+    """
+
+    def __init__(self, redis_gateway: RedisGateway, max_size: int = 100000, ttl: float = 30.0):
+        self._redis_gateway = redis_gateway
+        self._cache = TTLCache(max_size, ttl)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def get(self, jti: str) -> Optional[str]:
+        """Return the state of the token `jti`, from the cache if possible or from Redis otherwise."""
+        self._ensure_listener()
+        found, value = self._cache.lookup(jti)
+        if not found:
+            # A revocation pushed while reading Redis wins over the value read.
+            value = self._cache.setdefault(jti, self._redis_gateway.get(jti))
+        return value
+
+    def revoke(self, jti: str, expire: Optional[timedelta] = None) -> None:
+        """Mark the token `jti` as logged out in Redis and push the revocation to all workers."""
+        self._redis_gateway.set(jti, "logout", expire)
+        self._cache.set(jti, "logout")
+        self._redis_gateway.publish(REVOCATION_CHANNEL, f"logout {jti}")
+
+    def get_generation(self, user_id: int) -> int:
+        """Return the current token generation of a user, 0 if tokens of the user were never revoked all at once."""
+        self._ensure_listener()
+        key = ("generation", user_id)
+        found, value = self._cache.lookup(key)
+        if not found:
+            value = self._cache.setdefault(key, int(self._redis_gateway.get(generation_key(user_id)) or 0))
+        return value
+
+    def push_generation(self, user_id: int, generation: int) -> None:
+        """Push a new token generation of a user, already written to Redis, to all workers."""
+        self._cache.set(("generation", user_id), generation)
+        self._redis_gateway.publish(REVOCATION_CHANNEL, f"generation {user_id} {generation}")
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
+
+    def _on_revocation(self, message: str) -> None:
+        kind, *args = message.split(" ")
+        if kind == "logout":
+            self._cache.set(args[0], "logout")
+        elif kind == "generation":
+            self._cache.set(("generation", int(args[0])), int(args[1]))
+
+    def _ensure_listener(self) -> None:
+        # Started lazily so the subscriber thread belongs to the serving worker process.
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = self._redis_gateway.subscribe(
+                        REVOCATION_CHANNEL, self._on_revocation, on_subscribe=self._cache.clear)
+
+    @staticmethod
+    def create(redis_gateway: RedisGateway, filename="config.ini") -> "TokenStateCache":
+        """Factory method to create a `TokenStateCache` object, configured by the optional "token_cache" section.
+        """
+        section = "token_cache"
+        config = read_config_file(filename, section, required=False)
+        try:
+            return TokenStateCache(
+                redis_gateway,
+                max_size=int(config.get("max_size", 100000)),
+                ttl=float(config.get("ttl", 30.0)),
+            )
+        except ValueError as e:
+            logger.error(f"Invalid config file \"{filename}\" section \"{section}\": {e}")
+            raise e
@@ -0,0 +1,242 @@
+"""Module for the read-through user cache."""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+from time import monotonic
+from typing import Iterable, List, Optional, Tuple
+
+from funwithflags.definitions import BadRequestError, DatabaseQueryError, User
+from funwithflags.entities import TTLCache, read_config_file
+from .db_gateway import PostgresGateway
+from .redis_gateway import RedisGateway
+
+
+logger = logging.getLogger(__name__)
+
+USER_INVALIDATION_CHANNEL = "user-invalidations"
+MISSING = "missing"
+INVALIDATED = "invalidated"
+# Password hashes and salts are never cached, logins read them from the database.
+PUBLIC_USER_COLUMNS = ("user_id", "username", "nickname", "email", "created_at")
+
+
+def user_key(user_id: int) -> str:
+    """Return the Redis key of a cached user."""
+    return f"user:{user_id}"
+
+
+def serialize_user(user: User) -> str:
+    return json.dumps({
+        "user_id": user.user_id,
+        "username": user.username,
+        "nickname": user.nickname,
+        "email": user.email,
+        "created_at": user.created_at.isoformat(),
+    })
+
+
+def deserialize_user(value: str) -> User:
+    fields = json.loads(value)
+    return User(
+        user_id=fields["user_id"],
+        username=fields["username"],
+        nickname=fields["nickname"],
+        email=fields["email"],
+        created_at=datetime.fromisoformat(fields["created_at"]),
+        valid=True,
+    )
+
+
+@dataclass
+class UserCacheStats:
+    """Snapshot of user cache counters, latency in seconds.
+    """
+
+    reads: int = 0
+    l1_hits: int = 0
+    l2_hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def hit_ratio(self) -> float:
+        return (self.l1_hits + self.l2_hits + self.negative_hits) / self.reads if self.reads else 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.reads if self.reads else 0.0
+
+
+class UserCache:
+    """Read-through cache of users by id, with Redis as shared L2 cache and an optional in-process LRU as L1 cache.
+    Missing user ids are cached too, for `negative_ttl` seconds. Only the `PUBLIC_USER_COLUMNS` of the users are read
+    and cached, their password hash and salt are left empty.
+
+    The cache is invalidated by the `PostgresGateway` whenever a user is written. An invalidation replaces the cached
+    entries by a short-lived marker instead of deleting them, and readers only fill an entry that is absent, so a
+    reader racing with a write can't put the row it read before the write back in the cache. L1 invalidations are
+    pushed to all workers through Redis pub/sub.
+    """
+
+    def __init__(self, postgres_gateway: PostgresGateway, redis_gateway: RedisGateway, ttl: float = 300.0,
+                 negative_ttl: float = 30.0, invalidation_ttl: float = 5.0, l1_size: int = 0, l1_ttl: float = 5.0):
+        self._postgres_gateway = postgres_gateway
+        self._redis_gateway = redis_gateway
+        self._ttl = timedelta(seconds=ttl)
+        self._negative_ttl = timedelta(seconds=negative_ttl)
+        self._invalidation_ttl = invalidation_ttl
+        self._l1 = TTLCache(l1_size, l1_ttl) if l1_size > 0 else None
+        self._l1_ttl = l1_ttl
+        self._listener = None
+        self._lock = threading.Lock()
+        self._stats = UserCacheStats()
+        postgres_gateway.add_user_write_listener(self.invalidate)
+
+    def read_user(self, user_id: int) -> User:
+        """Given a `user_id` integer, return the `User` object from the cache or from the database. Raise
+        BadRequestError if user id is invalid or DatabaseQueryError if the user doesn't exist.
+        """
+        if user_id <= 0:
+            raise BadRequestError("Invalid user id")
+        start = monotonic()
+        try:
+            return self._read_user(user_id)
+        finally:
+            with self._lock:
+                self._stats.reads += 1
+                self._stats.total_latency += monotonic() - start
+
+    def _read_user(self, user_id: int) -> User:
+        self._ensure_listener()
+        if self._l1 is not None:
+            value = self._l1.get(user_id)
+            if value is not None and value != INVALIDATED:
+                return self._cached_value(value, "l1_hits")
+        value = self._redis_gateway.get(user_key(user_id))
+        if value is not None and value != INVALIDATED:
+            if self._l1 is not None:
+                self._l1.setdefault(user_id, value)
+            return self._cached_value(value, "l2_hits")
+
+        with self._lock:
+            self._stats.misses += 1
+        try:
+            user = self._postgres_gateway.read_user(user_id=user_id, columns=PUBLIC_USER_COLUMNS)
+            value, ttl = serialize_user(user), self._ttl
+        except DatabaseQueryError:
+            user, value, ttl = None, MISSING, self._negative_ttl
+        self._redis_gateway.set_if_absent(user_key(user_id), value, ttl)
+        if self._l1 is not None:
+            self._l1.setdefault(user_id, value, min(ttl.total_seconds(), self._l1_ttl))
+        if user is None:
+            raise DatabaseQueryError(f"User {user_id} not found")
+        return user
+
+    def read_users(self, user_ids: Iterable[int]) -> Tuple[List[User], List[int]]:
+        """Given user ids, return the list of `User` objects in the order of `user_ids`, without duplicates, and the
+        list of ids with no user. Cached users are read from L1 then in one Redis round trip, the others in one
+        database query, and the cache is filled in one round trip too. Raise BadRequestError if any user id is invalid.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if any(user_id <= 0 for user_id in user_ids):
+            raise BadRequestError("Invalid user id")
+        start = monotonic()
+        try:
+            values = self._read_values(user_ids)
+        finally:
+            with self._lock:
+                self._stats.reads += len(user_ids)
+                self._stats.total_latency += monotonic() - start
+        return ([deserialize_user(values[user_id]) for user_id in user_ids if values[user_id] != MISSING],
+                [user_id for user_id in user_ids if values[user_id] == MISSING])
+
+    def _read_values(self, user_ids: List[int]) -> dict:
+        self._ensure_listener()
+        values, counts = {}, {"l1_hits": 0, "l2_hits": 0, "negative_hits": 0, "misses": 0}
+        if self._l1 is not None:
+            for user_id in user_ids:
+                value = self._l1.get(user_id)
+                if value is not None and value != INVALIDATED:
+                    values[user_id] = value
+                    counts["negative_hits" if value == MISSING else "l1_hits"] += 1
+        remaining = [user_id for user_id in user_ids if user_id not in values]
+        for user_id, value in zip(remaining, self._redis_gateway.get_many(user_key(user_id) for user_id in remaining)):
+            if value is not None and value != INVALIDATED:
+                values[user_id] = value
+                counts["negative_hits" if value == MISSING else "l2_hits"] += 1
+                if self._l1 is not None:
+                    self._l1.setdefault(user_id, value)
+
+        remaining = [user_id for user_id in user_ids if user_id not in values]
+        if remaining:
+            counts["misses"] = len(remaining)
+            users, missing = self._postgres_gateway.read_users(remaining, columns=PUBLIC_USER_COLUMNS)
+            entries = {user.user_id: (serialize_user(user), self._ttl) for user in users}
+            entries.update({user_id: (MISSING, self._negative_ttl) for user_id in missing})
+            self._redis_gateway.set_many({user_key(user_id): entry for user_id, entry in entries.items()}, nx=True)
+            for user_id, (value, ttl) in entries.items():
+                values[user_id] = value
+                if self._l1 is not None:
+                    self._l1.setdefault(user_id, value, min(ttl.total_seconds(), self._l1_ttl))
+        with self._lock:
+            for counter, count in counts.items():
+                setattr(self._stats, counter, getattr(self._stats, counter) + count)
+        return values
+
+    def _cached_value(self, value: str, counter: str) -> User:
+        if value == MISSING:
+            with self._lock:
+                self._stats.negative_hits += 1
+            raise DatabaseQueryError("User not found")
+        with self._lock:
+            setattr(self._stats, counter, getattr(self._stats, counter) + 1)
+        return deserialize_user(value)
+
+    def invalidate(self, user_id: int) -> None:
+        """Invalidate the cached user `user_id` in Redis, in this worker and in all other workers."""
+        self._redis_gateway.set(user_key(user_id), INVALIDATED, timedelta(seconds=self._invalidation_ttl))
+        if self._l1 is not None:
+            self._on_invalidation(str(user_id))
+            self._redis_gateway.publish(USER_INVALIDATION_CHANNEL, str(user_id))
+
+    def stats(self) -> UserCacheStats:
+        with self._lock:
+            return UserCacheStats(**vars(self._stats))
+
+    def _on_invalidation(self, message: str) -> None:
+        self._l1.set(int(message), INVALIDATED, self._invalidation_ttl)
+
+    def _ensure_listener(self) -> None:
+        # Started lazily so the subscriber thread belongs to the serving worker process.
+        if self._l1 is not None and self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = self._redis_gateway.subscribe(
+                        USER_INVALIDATION_CHANNEL, self._on_invalidation, on_subscribe=self._l1.clear)
+
+    @staticmethod
+    def create(postgres_gateway: PostgresGateway, redis_gateway: RedisGateway,
+               filename="config.ini") -> Optional["UserCache"]:
+        """Factory method to create a `UserCache` object, configured by the optional "user_cache" section. Return None
+        if the section is missing or the cache is not enabled.
+        """
+        section = "user_cache"
+        config = read_config_file(filename, section, required=False)
+        if config.get("enabled", "false").lower() != "true":
+            return None
+        try:
+            return UserCache(
+                postgres_gateway,
+                redis_gateway,
+                ttl=float(config.get("ttl", 300.0)),
+                negative_ttl=float(config.get("negative_ttl", 30.0)),
+                invalidation_ttl=float(config.get("invalidation_ttl", 5.0)),
+                l1_size=int(config.get("l1_size", 0)),
+                l1_ttl=float(config.get("l1_ttl", 5.0)),
+            )
+        except ValueError as e:
+            logger.error(f"Invalid config file \"{filename}\" section \"{section}\": {e}")
+            raise e
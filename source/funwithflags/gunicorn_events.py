@@ -0,0 +1,20 @@
+"""Gunicorn settings of the event service, serving the long-lived streams of board events.
+
+Streams are idle most of the time, so workers are gevent workers holding thousands of connections each instead of a
+thread per connection. Run with:
+
+    gunicorn -c python:funwithflags.gunicorn_events funwithflags.app:app
+"""
+bind = "0.0.0.0:8080"
+workers = 2
+worker_class = "gevent"
+worker_connections = 5000
+# Streams stay open until the client leaves, keep-alives are sent by the application.
+timeout = 30
+graceful_timeout = 5
+
+
+def post_fork(server, worker):
+    """Make psycopg2 yield to other greenlets while waiting for Postgres, instead of blocking the whole worker."""
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
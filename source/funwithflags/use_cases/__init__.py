@@ -1,2 +1,11 @@
 """Module for use cases."""
-from .auth import fresh_login, login, logout, read_user_basic, refresh_access_token, register, update_user
+from .auth import (fresh_login, is_token_revoked, list_sessions, login, logout, read_user_basic, read_users_basic,
+                   refresh_access_token, register, revoke_all_sessions, token_claims, update_user)
+from .epic import read_epic_progress
+from .project import (check_project_access, create_project, export_project, export_project_rows, list_projects,
+                      project_fields, read_flow_metrics, read_project, read_project_tree)
+from .sprint import read_burndown, read_sprint_progress
+from .story import (create_story, delete_story, move_story, read_board, read_story, read_story_ancestors,
+                    read_story_rollup, read_story_subtree, search_stories, status_totals, story_fields, subscribe_board,
+                    update_story)
+from .user_import import ImportReport, import_users, read_user_records
@@ -1,22 +1,26 @@
 """Module for user authentication/authorization api."""
-from typing import Any, Mapping
+import logging
+from datetime import datetime
+from typing import Any, Iterable, List, Mapping, Optional, Tuple
 
 import flask_jwt_extended
 
 from funwithflags.definitions import User
 from funwithflags.definitions import RegisterRequest, LoginRequest, FreshLoginRequest, LogoutRequest, UserUpdateRequest
-from funwithflags.definitions import BadRequestError, DatabaseQueryError
-from funwithflags.definitions import ACCESS_EXPIRES, REFRESH_EXPIRES
-from funwithflags.entities import generate_salt_hash_password, hash_password_with_salt
+from funwithflags.definitions import ApplicationError, BadRequestError, DatabaseQueryError
+from funwithflags.definitions import ACCESS_EXPIRES, REFRESH_EXPIRES, TokenPolicy
 from funwithflags.gateways import Context
 
 
+logger = logging.getLogger(__name__)
+
+
 def register(request: RegisterRequest, context: Context):
     """Given a `RegisterRequest` object and `Context` of gateways, execute signup logic.
     This will create a valid `User` object and write it into Postgres database table.
     Return user id got from db gateway.
     """
-    hashed_password, salt = generate_salt_hash_password(request.password)
+    hashed_password, salt = context.hashing_service.generate_salt_hash_password(request.password)
     user = User(
         username=request.username,
         nickname=request.nickname,
@@ -34,12 +38,12 @@ def login(request: LoginRequest, context: Context) -> (str, str, str):
     username is valid but password doesn't match, raise `BadRequestError`.
     """
     user = context.postgres_gateway.read_user(username=request.username)
-    if hash_password_with_salt(request.password, user.salt) != user.password:
+    if context.hashing_service.hash_password(request.password, user.salt) != user.password:
         raise BadRequestError
+    _rehash_if_outdated(user, request.password, context)
     access_token = flask_jwt_extended.create_access_token(identity=user.user_id, fresh=True)
     refresh_token = flask_jwt_extended.create_refresh_token(identity=user.user_id)
-    context.redis_gateway.set(flask_jwt_extended.get_jti(encoded_token=access_token), "login", ACCESS_EXPIRES * 1.2)
-    context.redis_gateway.set(flask_jwt_extended.get_jti(encoded_token=refresh_token), "login", REFRESH_EXPIRES * 1.2)
+    _track_tokens(context, user.user_id, access_token=access_token, refresh_token=refresh_token)
     return user.user_id, user.username, access_token, refresh_token
 
 
@@ -49,18 +53,51 @@ def fresh_login(request: FreshLoginRequest, context: Context) -> str:
     raise `BadRequestError`.
     """
     user = context.postgres_gateway.read_user(user_id=request.user_id)
-    if hash_password_with_salt(request.password, user.salt) != user.password:
+    if context.hashing_service.hash_password(request.password, user.salt) != user.password:
         raise BadRequestError
+    _rehash_if_outdated(user, request.password, context)
     access_token = flask_jwt_extended.create_access_token(identity=user.user_id, fresh=True)
-    context.redis_gateway.set(flask_jwt_extended.get_jti(encoded_token=access_token), "login", ACCESS_EXPIRES * 1.2)
+    _track_tokens(context, user.user_id, access_token=access_token)
     return access_token
 
 
+def _track_tokens(context: Context, user_id: int, access_token: Optional[str] = None,
+                  refresh_token: Optional[str] = None) -> None:
+    """Store the "login" state of newly issued tokens in Redis and register refresh tokens in the session index of the
+    user, in one round trip, as required by the token policy of the context. Nothing is written for tokens the
+    blacklist loader never checks.
+    """
+    with context.redis_gateway.pipeline() as pipe:
+        if access_token and context.token_policy == TokenPolicy.ALL:
+            pipe.set(flask_jwt_extended.get_jti(encoded_token=access_token), "login", ACCESS_EXPIRES * 1.2)
+        if refresh_token and context.token_policy != TokenPolicy.STATELESS:
+            jti = flask_jwt_extended.get_jti(encoded_token=refresh_token)
+            pipe.set(jti, "login", REFRESH_EXPIRES * 1.2)
+            context.session_registry.add(pipe, user_id, jti, REFRESH_EXPIRES * 1.2)
+
+
+def _rehash_if_outdated(user: User, password: str, context: Context) -> None:
+    """Rehash a verified password if its stored hash was generated with an outdated bcrypt cost. A failed rehash is
+    logged and ignored, it will be retried on the next login.
+    """
+    if not context.hashing_service.needs_rehash(user.salt):
+        return
+    try:
+        hashed_password, salt = context.hashing_service.generate_salt_hash_password(password)
+        with context.postgres_gateway.transaction():
+            # Skip the rehash if the password was changed since it was verified.
+            current = context.postgres_gateway.read_user(user_id=user.user_id, columns=["salt"], for_update=True)
+            if current.salt == user.salt:
+                context.postgres_gateway.update_user_password(user.user_id, hashed_password, salt)
+    except ApplicationError as e:
+        logger.info(f"Failed to rehash password of user {user.user_id}: {e}")
+
+
 def refresh_access_token(identity: Any, context: Context) -> str:
     """Give refresh token, refresh the user (identity is user_id) login status and return a new access token.
     """
     new_token = flask_jwt_extended.create_access_token(identity=identity)
-    context.redis_gateway.set(flask_jwt_extended.get_jti(encoded_token=new_token), "login")
+    _track_tokens(context, identity, access_token=new_token)
     return new_token
 
 
@@ -68,19 +105,80 @@ def logout(logout_request: LogoutRequest, context: Context):
     """Logout user with given logout request and context. Current logic is trying to be simple and doesn't check if
     the refresh token is already logged out in Redis cache.
     """
-    context.redis_gateway.set(logout_request.jti, "logout", REFRESH_EXPIRES * 1.2)
+    context.token_cache.revoke(logout_request.jti, REFRESH_EXPIRES * 1.2)
+    if logout_request.user_id is not None:
+        context.session_registry.remove(logout_request.user_id, logout_request.jti)
+
+
+def token_claims(identity: Any, context: Context) -> Mapping[str, Any]:
+    """Return the claims to embed in tokens issued to the user `identity`, i.e. the user's current token generation.
+    """
+    return {"gen": context.token_cache.get_generation(identity)}
+
+
+def is_token_revoked(jti: str, context: Context, identity: Any = None, generation: int = 0) -> bool:
+    """Return true if the token with given `jti` is logged out, or unknown unless the token policy is stateless, or if
+    its `generation` is older than the token generation of its user `identity`. Token states are read through the
+    per-worker token cache, so most checks don't reach Redis.
+    """
+    if identity is not None and generation < context.token_cache.get_generation(identity):
+        return True
+    value = context.token_cache.get(jti)
+    if value is None:
+        return context.token_policy != TokenPolicy.STATELESS
+    return value == "logout"
+
+
+def list_sessions(user_id: int, context: Context) -> List[Mapping[str, Any]]:
+    """List the live sessions (refresh tokens) of a user. Return a list of session jti and expiry time.
+    """
+    return [
+        {"jti": jti, "expires_at": str(datetime.fromtimestamp(expires_at))}
+        for jti, expires_at in context.session_registry.list(user_id)
+    ]
+
 
+def revoke_all_sessions(user_id: int, context: Context) -> None:
+    """Revoke all tokens issued to a user so far, logging the user out everywhere.
+    """
+    context.session_registry.revoke_all(user_id)
 
-def read_user_basic(user_id: int, context: Context) -> Mapping[str, Any]:
-    """Read basic user info. Return a map of field names and values."""
-    user = context.postgres_gateway.read_user(user_id=user_id)
-    return {
-        "userid": user.user_id,
-        "username": user.username,
-        "nickname": user.nickname,
-        "email": user.email,
-        "created_at": str(user.created_at)
-    }
+
+_PUBLIC_USER_FIELDS = {
+    "userid": ("user_id", lambda user: user.user_id),
+    "username": ("username", lambda user: user.username),
+    "nickname": ("nickname", lambda user: user.nickname),
+    "email": ("email", lambda user: user.email),
+    "created_at": ("created_at", lambda user: str(user.created_at)),
+}
+
+
+def read_user_basic(user_id: int, context: Context, fields: Optional[Iterable[str]] = None) -> Mapping[str, Any]:
+    """Read basic user info, through the user cache of the context if enabled. Return a map of field names and values,
+    limited to `fields` if not None.
+    """
+    fields = list(fields) if fields is not None else list(_PUBLIC_USER_FIELDS)
+    if context.user_cache is not None:
+        user = context.user_cache.read_user(user_id)
+    else:
+        user = context.postgres_gateway.read_user(
+            user_id=user_id, columns=[_PUBLIC_USER_FIELDS[field][0] for field in fields])
+    return {field: _PUBLIC_USER_FIELDS[field][1](user) for field in fields}
+
+
+def read_users_basic(user_ids: Iterable[int], context: Context,
+                     fields: Optional[Iterable[str]] = None) -> Tuple[List[Mapping[str, Any]], List[int]]:
+    """Read basic info of many users at once, through the user cache of the context if enabled. Return the list of
+    maps of field names and values in the order of `user_ids`, limited to `fields` if not None, and the list of ids
+    with no user.
+    """
+    fields = list(fields) if fields is not None else list(_PUBLIC_USER_FIELDS)
+    if context.user_cache is not None:
+        users, missing = context.user_cache.read_users(user_ids)
+    else:
+        users, missing = context.postgres_gateway.read_users(
+            user_ids, columns=[_PUBLIC_USER_FIELDS[field][0] for field in fields])
+    return [{field: _PUBLIC_USER_FIELDS[field][1](user) for field in fields} for user in users], missing
 
 
 def read_user_details(user_id: int, context: Context) -> Mapping[str, Any]:
@@ -91,10 +189,19 @@ def read_user_details(user_id: int, context: Context) -> Mapping[str, Any]:
 
 
 def update_user(update_request: UserUpdateRequest, context: Context) -> None:
-    """Update user info. Return a None object if update succeeds, otherwise throw exceptions.
+    """Update user info. Return a None object if update succeeds, otherwise throw exceptions. Changing the password
+    revokes all sessions of the user.
     """
-    password = update_request.fields.get("password", None)
+    fields = dict(update_request.fields)
+    password = fields.pop("password", None)
+    # The new password is hashed with a new salt before any row is locked, so the slow hash holds no lock and no
+    # connection. A concurrent rehash of the old password sees the salt changed and is skipped.
+    hashed = context.hashing_service.generate_salt_hash_password(password) if password is not None else None
+    with context.postgres_gateway.transaction():
+        if hashed is not None:
+            context.postgres_gateway.read_user(user_id=update_request.user_id, columns=["salt"], for_update=True)
+            context.postgres_gateway.update_user_password(update_request.user_id, *hashed)
+        if fields:
+            context.postgres_gateway.update_user(user_id=update_request.user_id, **fields)
     if password is not None:
-        user = context.postgres_gateway.read_user(user_id=update_request.user_id)
-        update_request.fields["password"] = hash_password_with_salt(password, user.salt)
-    context.postgres_gateway.update_user(user_id=update_request.user_id, **update_request.fields)
+        revoke_all_sessions(update_request.user_id, context)
@@ -0,0 +1,22 @@
+"""Module for epic api."""
+from typing import Any, Mapping
+
+from funwithflags.definitions import BadRequestError, DatabaseQueryError
+from funwithflags.gateways import Context
+from .project import check_project_access
+from .story import status_totals
+
+
+def read_epic_progress(epic_id: int, user_id: int, context: Context) -> Mapping[str, Any]:
+    """Read the progress of an epic of a project the user `user_id` may read: the total estimate and number of its
+    stories in each status, and the estimate remaining to be done, from the rollup maintained on story writes. Return
+    a map with the epic id and the totals. Raise BadRequestError if the epic id is invalid or DatabaseQueryError if
+    the epic doesn't exist or the user may not read its project.
+    """
+    if epic_id <= 0:
+        raise BadRequestError("Invalid epic id")
+    project_id = context.postgres_gateway.read_epic_project(epic_id)
+    if project_id is None:
+        raise DatabaseQueryError(f"Epic {epic_id} not found")
+    check_project_access(project_id, user_id, context)
+    return dict(status_totals(context.postgres_gateway.read_rollup("epic", epic_id)), epic_id=epic_id)
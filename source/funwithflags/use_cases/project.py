@@ -0,0 +1,171 @@
+"""Module for project api."""
+from datetime import datetime
+import logging
+from time import monotonic
+from typing import IO, Any, Callable, Iterator, List, Mapping, Optional, Tuple
+
+from funwithflags.definitions import (BadRequestError, DatabaseQueryError, FlowMetricsRequest, Project,
+                                      ProjectCreateRequest, ProjectExportRequest, ProjectListRequest, ProjectType)
+from funwithflags.entities import decode_cursor, encode_cursor
+from funwithflags.gateways import STORY_EXPORT_COLUMNS, Context
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_project_access(project_id: int, user_id: int, context: Context) -> None:
+    """Raise DatabaseQueryError if the project doesn't exist or the user may not read it, so private projects can't be
+    told apart from missing ones.
+    """
+    if not context.postgres_gateway.can_read_project(project_id, user_id):
+        raise DatabaseQueryError(f"Project {project_id} not found")
+
+
+def project_fields(project: Project) -> Mapping[str, Any]:
+    """Return the map of field names and values of a project as returned by the api."""
+    return {
+        "project_id": project.project_id,
+        "project_name": project.project_name,
+        "project_note": project.project_note,
+        "project_type": project.project_type,
+        "public": project.project_public,
+        "user_id": project.user_id,
+        "team_id": project.team_id,
+        "admin_id": project.admin_id,
+        "created_at": str(project.created_at),
+    }
+
+
+def create_project(request: ProjectCreateRequest, context: Context) -> int:
+    """Given a `ProjectCreateRequest`, create a personal project of the requesting user, or a project of a team the
+    user belongs to, administered by the user. Return the project id. Raise BadRequestError if the user is not a member
+    of the team.
+    """
+    personal = request.project_type == ProjectType.PERSONAL.value
+    if not personal and not context.postgres_gateway.is_team_member(request.team_id, request.admin_id):
+        raise BadRequestError("Not a member of the team")
+    project = Project(
+        project_name=request.project_name,
+        project_note=request.project_note,
+        project_type=request.project_type,
+        project_public=request.project_public,
+        user_id=request.admin_id if personal else None,
+        team_id=request.team_id,
+        admin_id=request.admin_id,
+        created_at=datetime.now(),
+    )
+    return context.postgres_gateway.create_project(project)
+
+
+def read_project(project_id: int, user_id: int, context: Context) -> Mapping[str, Any]:
+    """Read a project the user `user_id` may read. Return a map of field names and values. Raise DatabaseQueryError if
+    the project doesn't exist or the user may not read it.
+    """
+    check_project_access(project_id, user_id, context)
+    return project_fields(context.postgres_gateway.read_project(project_id))
+
+
+def read_project_tree(project_id: int, user_id: int, context: Context) -> str:
+    """Read a project the user `user_id` may read with its boards, epics and open sprints. Return the json text of the
+    nested document as built by the database. Raise DatabaseQueryError if the project doesn't exist or the user may
+    not read it.
+    """
+    if project_id <= 0:
+        raise BadRequestError("Invalid project id")
+    tree = context.postgres_gateway.read_project_tree(project_id, user_id)
+    if tree is None:
+        raise DatabaseQueryError(f"Project {project_id} not found")
+    return tree
+
+
+def read_flow_metrics(request: FlowMetricsRequest, context: Context) -> Mapping[str, Any]:
+    """Given a `FlowMetricsRequest`, read the flow metrics of a project the user may read from its board transitions:
+    the throughput, lead time and cycle time of the stories closed in the window, and the current work in progress
+    of each board, read from counters kept on every story write. Times are in seconds. Raise DatabaseQueryError if
+    the project doesn't exist or the user may not read it.
+    """
+    check_project_access(request.project_id, request.user_id, context)
+    gateway = context.postgres_gateway
+    closed, *times = gateway.read_flow_times(request.project_id, request.since, request.until)
+    return {
+        "since": str(request.since),
+        "until": str(request.until),
+        "throughput": closed,
+        "lead_time": dict(zip(("mean", "p50", "p85"), times[:3])),
+        "cycle_time": dict(zip(("mean", "p50", "p85"), times[3:])),
+        "wip": [{"board_id": board_id, "stories": stories, "mean_age": age}
+                for board_id, stories, age in gateway.read_wip(request.project_id)],
+    }
+
+
+def list_projects(request: ProjectListRequest, context: Context) -> Tuple[List[Mapping[str, Any]], Optional[str]]:
+    """Given a `ProjectListRequest`, list a page of the personal projects of the user, or of the projects of a team the
+    user belongs to, newest first. Return the list of maps of project fields and the cursor of the next page, None on
+    the last page. Raise BadRequestError if the cursor is invalid, or DatabaseQueryError if the user is not a member of
+    the team.
+    """
+    try:
+        before = decode_cursor(request.cursor, datetime, int) if request.cursor else None
+    except ValueError:
+        raise BadRequestError("Invalid cursor")
+    if request.team_id is not None and not context.postgres_gateway.is_team_member(request.team_id, request.user_id):
+        raise DatabaseQueryError(f"Team {request.team_id} not found")
+    # One extra project tells whether there is a next page.
+    projects = context.postgres_gateway.list_projects(user_id=request.user_id, team_id=request.team_id, before=before,
+                                                      limit=request.limit + 1)
+    next_cursor = None
+    if len(projects) > request.limit:
+        projects = projects[:request.limit]
+        next_cursor = encode_cursor(projects[-1].created_at, projects[-1].project_id)
+    return [project_fields(project) for project in projects], next_cursor
+
+
+def export_project_rows(request: ProjectExportRequest, user_id: int, context: Context) -> Iterator:
+    """Given a `ProjectExportRequest` of user `user_id`, check the user may read the project and return an iterator
+    over its export rows, streamed from the database: records with a "kind" field for NDJSON, or rows of story columns
+    for CSV, after a header unless the export is resumed after a story. The throughput is logged once the iterator is exhausted or closed.
+    """
+    check_project_access(request.project_id, user_id, context)
+    rows = context.postgres_gateway.iter_project_export(request.project_id, request.fmt, request.after)
+    return _measured_rows(request, rows)
+
+
+def _measured_rows(request: ProjectExportRequest, rows: Iterator) -> Iterator:
+    start, count = monotonic(), 0
+    try:
+        if request.fmt == "csv" and request.after == 0:
+            yield STORY_EXPORT_COLUMNS
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        if hasattr(rows, "close"):
+            rows.close()
+        elapsed = monotonic() - start
+        logger.info(f"Exported {count} rows of project {request.project_id} in {elapsed:.2f} s "
+                    f"({count / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+def export_project(request: ProjectExportRequest, context: Context, out: IO[str], batch_size: int = 10000,
+                   progress: Optional[Callable[[int, int, float], None]] = None) -> int:
+    """Given a `ProjectExportRequest`, write the project export to the `out` file object with COPY, without
+    buffering rows in Python. Stories are copied in batches of `batch_size` in id order, and `progress` is called
+    after each batch with the total number of rows written, the id of the last story written and the elapsed seconds,
+    so an interrupted export can be resumed after that story. Return the total number of rows written.
+    """
+    gateway = context.postgres_gateway
+    start, rows, after = monotonic(), 0, request.after
+    if request.fmt == "ndjson" and after == 0:
+        rows += gateway.copy_project_records(request.project_id, out)
+    header = request.fmt == "csv" and after == 0
+    while True:
+        upper = gateway.next_story_bound(request.project_id, after, batch_size)
+        if upper is None:
+            if header:
+                rows += gateway.copy_project_stories(request.project_id, after, after, out, request.fmt, header)
+            return rows
+        rows += gateway.copy_project_stories(request.project_id, after, upper, out, request.fmt, header)
+        out.flush()
+        header, after = False, upper
+        if progress is not None:
+            progress(rows, after, monotonic() - start)
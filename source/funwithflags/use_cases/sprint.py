@@ -0,0 +1,47 @@
+"""Module for sprint api."""
+from typing import Any, Mapping
+
+from funwithflags.definitions import BadRequestError, DatabaseQueryError, StoryStatus
+from funwithflags.gateways import Context
+from .project import check_project_access
+from .story import status_totals
+
+
+def _check_sprint_access(sprint_id: int, user_id: int, context: Context) -> None:
+    if sprint_id <= 0:
+        raise BadRequestError("Invalid sprint id")
+    project_id = context.postgres_gateway.read_sprint_project(sprint_id)
+    if project_id is None:
+        raise DatabaseQueryError(f"Sprint {sprint_id} not found")
+    check_project_access(project_id, user_id, context)
+
+
+def read_burndown(sprint_id: int, user_id: int, context: Context) -> Mapping[str, Any]:
+    """Read the burndown of a sprint of a project the user `user_id` may read: for each day of the sprint, the total
+    estimate and number of its stories in each status at the end of the day, and the estimate remaining to be done.
+    Return a map with the sprint id and the list of days. Raise BadRequestError if the sprint id is invalid or
+    DatabaseQueryError if the sprint doesn't exist or the user may not read its project.
+    """
+    _check_sprint_access(sprint_id, user_id, context)
+    days = []
+    day = None
+    for when, status, estimate, stories in context.postgres_gateway.read_burndown(sprint_id):
+        if day is None or day["day"] != str(when):
+            day = {"day": str(when), "remaining": 0, "estimates": {}, "stories": {}}
+            days.append(day)
+        name = StoryStatus(status).name.lower()
+        day["estimates"][name] = int(estimate)
+        day["stories"][name] = int(stories)
+        if status != StoryStatus.DONE:
+            day["remaining"] += int(estimate)
+    return {"sprint_id": sprint_id, "days": days}
+
+
+def read_sprint_progress(sprint_id: int, user_id: int, context: Context) -> Mapping[str, Any]:
+    """Read the progress of a sprint of a project the user `user_id` may read: the total estimate and number of its
+    stories in each status, and the estimate remaining to be done, from the rollup maintained on story writes. Return
+    a map with the sprint id and the totals. Raise BadRequestError if the sprint id is invalid or DatabaseQueryError
+    if the sprint doesn't exist or the user may not read its project.
+    """
+    _check_sprint_access(sprint_id, user_id, context)
+    return dict(status_totals(context.postgres_gateway.read_rollup("sprint", sprint_id)), sprint_id=sprint_id)
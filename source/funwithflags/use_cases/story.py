@@ -0,0 +1,261 @@
+"""Module for story and board api."""
+from datetime import datetime
+from typing import Any, Iterable, List, Mapping, Optional, Tuple
+
+from funwithflags.definitions import (BadRequestError, DatabaseQueryError, Story, StoryCreateRequest, StoryMoveRequest,
+                                      StorySearchRequest, StoryStatus, StoryUpdateRequest)
+from funwithflags.entities import decode_cursor, encode_cursor, rank_between
+from funwithflags.gateways import BoardSubscription, Context
+from .project import check_project_access
+
+
+def story_fields(story: Story) -> Mapping[str, Any]:
+    """Return the map of field names and values of a story as returned by the api."""
+    return {field: str(value) if isinstance(value, datetime) else value for field, value in vars(story).items()}
+
+
+def status_totals(rows: Iterable[Tuple[int, int, int]]) -> Mapping[str, Any]:
+    """Return the totals of rows of (status, stories, estimate) as a map of the total estimate, the estimate remaining
+    to be done, and the estimate and number of stories of each status by status name.
+    """
+    totals = {"estimate": 0, "remaining": 0, "estimates": {}, "stories": {}}
+    for status, stories, estimate in rows:
+        name = StoryStatus(status).name.lower()
+        totals["estimates"][name] = estimate
+        totals["stories"][name] = stories
+        totals["estimate"] += estimate
+        if status != StoryStatus.DONE:
+            totals["remaining"] += estimate
+    return totals
+
+
+def _check_write_access(project_id: int, user_id: int, context: Context) -> None:
+    if not context.postgres_gateway.can_write_project(project_id, user_id):
+        raise DatabaseQueryError(f"Project {project_id} not found")
+
+
+def _check_refs(project_id: int, fields: Mapping[str, Any], context: Context) -> None:
+    refs = {field: fields[field] for field in ("board_id", "epic_id", "parent_story", "sprint_id")
+            if fields.get(field) is not None}
+    if refs and not context.postgres_gateway.story_refs_valid(project_id, **refs):
+        raise BadRequestError("Board, epic, parent story or sprint not in the project")
+
+
+def _end_rank(board_id: Optional[int], story_id: int, context: Context) -> Optional[str]:
+    """Return a rank at the end of board `board_id` for story `story_id`, or None for the backlog."""
+    if board_id is None:
+        return None
+    last, _ = context.postgres_gateway.read_rank_gap(board_id, story_id)
+    return rank_between(last, None)
+
+
+def _check_rank(board_id: Optional[int], rank: Optional[str], context: Context) -> None:
+    """Queue a rebalance of board `board_id` if the rank just given to one of its stories grew too long."""
+    if context.rank_rebalancer is not None and board_id is not None and rank is not None:
+        context.rank_rebalancer.check(board_id, rank)
+
+
+def create_story(request: StoryCreateRequest, context: Context) -> int:
+    """Given a `StoryCreateRequest`, create a story in a project the requesting user may write and return the story
+    id. Raise BadRequestError if its board, epic, parent story or sprint is not in the project, or DatabaseQueryError
+    if the project doesn't exist or the user may not write it.
+    """
+    _check_write_access(request.project_id, request.created_by, context)
+    _check_refs(request.project_id, vars(request), context)
+    now = datetime.now()
+    done = request.status == StoryStatus.DONE
+    with context.postgres_gateway.transaction():
+        # The parent is locked before the insert reads its ancestors from the closure, so they can't be reparented
+        # before the new story is linked below them.
+        if request.parent_story is not None and not context.postgres_gateway.lock_story(request.parent_story):
+            raise BadRequestError("Board, epic, parent story or sprint not in the project")
+        story = Story(**vars(request), created_at=now, closed_at=now if done else None,
+                      closed_by=request.created_by if done else None,
+                      board_rank=_end_rank(request.board_id, 0, context))
+        story_id = context.postgres_gateway.create_story(story)
+    _check_rank(story.board_id, story.board_rank, context)
+    return story_id
+
+
+def read_story(story_id: int, user_id: int, context: Context) -> Mapping[str, Any]:
+    """Read a story of a project the user `user_id` may read. Return a map of field names and values. Raise
+    DatabaseQueryError if the story doesn't exist or the user may not read its project.
+    """
+    story = context.postgres_gateway.read_story(story_id)
+    check_project_access(story.project_id, user_id, context)
+    return story_fields(story)
+
+
+def update_story(request: StoryUpdateRequest, context: Context) -> Mapping[str, Any]:
+    """Given a `StoryUpdateRequest`, update a story of a project the requesting user may write, e.g. move it to
+    another board of the project. A story is closed by the user when its status becomes DONE and reopened when it
+    leaves it, and ranked at the end of its new board when it moves to another board. Return the map of field names
+    and values of the updated story. Raise BadRequestError if its new board, epic, parent story or sprint is not in
+    the project or the new parent is in its subtree, or DatabaseQueryError if the story doesn't exist or the user may
+    not write its project.
+    """
+    gateway = context.postgres_gateway
+    with gateway.transaction():
+        story = gateway.read_story(request.story_id, for_update=True)
+        _check_write_access(story.project_id, request.user_id, context)
+        _check_refs(story.project_id, request.fields, context)
+        parent = request.fields.get("parent_story", story.parent_story)
+        if parent != story.parent_story:
+            # The closure rows of the subtree are rewritten from the paths to its old and new ancestors, so the subtree
+            # is locked for update and its old ancestors, the new parent and then its ancestors for share, each in its
+            # own statement so each is read after the reparents it waited for committed. Concurrent reparents of
+            # overlapping paths then run one after the other, or one fails on a deadlock, and none closes a cycle.
+            gateway.lock_story_subtree(story.story_id)
+            gateway.read_story_ancestors(story.story_id, lock=True)
+            if parent is not None and not gateway.lock_story(parent):
+                raise BadRequestError("Board, epic, parent story or sprint not in the project")
+            ancestors = gateway.read_story_ancestors(parent, lock=True) if parent is not None else []
+            if story.story_id == parent or any(ancestor["story_id"] == story.story_id for ancestor in ancestors):
+                raise BadRequestError("A story can't be its own parent or ancestor")
+        fields = dict(request.fields)
+        status = fields.get("status", story.status)
+        if (status == StoryStatus.DONE) != (story.status == StoryStatus.DONE):
+            done = status == StoryStatus.DONE
+            fields.update(closed_at=datetime.now() if done else None, closed_by=request.user_id if done else None)
+        if fields.get("board_id", story.board_id) != story.board_id:
+            fields["board_rank"] = _end_rank(fields["board_id"], story.story_id, context)
+        updated = gateway.update_story(request.story_id, fields, user_id=request.user_id)
+    if "board_rank" in fields:
+        _check_rank(updated.board_id, updated.board_rank, context)
+    return story_fields(updated)
+
+
+def move_story(request: StoryMoveRequest, context: Context) -> Mapping[str, Any]:
+    """Given a `StoryMoveRequest`, move a story of a project the requesting user may write right after or before
+    another story of a board, or to the end of the board, on its board or on another board of the project. Only the
+    rank of the moved story changes, so concurrent moves on a board don't wait for each other, and the board is
+    queued for a rebalance if the rank grew too long. Return the map of field names and values of the moved story.
+    Raise BadRequestError if the story is not on a board and no board is given, or the board or the other story is
+    not in the project, or DatabaseQueryError if the story doesn't exist or the user may not write its project.
+    """
+    gateway = context.postgres_gateway
+    with gateway.transaction():
+        story = gateway.read_story(request.story_id, for_update=True)
+        _check_write_access(story.project_id, request.user_id, context)
+        board_id = request.board_id or story.board_id
+        if board_id is None:
+            raise BadRequestError("Story is not on a board")
+        _check_refs(story.project_id, {"board_id": board_id}, context)
+        gap = gateway.read_rank_gap(board_id, story.story_id, after_id=request.after_id, before_id=request.before_id)
+        if gap is None:
+            raise BadRequestError("Story to move next to not on the board")
+        fields = {"board_rank": rank_between(*gap)}
+        if board_id != story.board_id:
+            fields["board_id"] = board_id
+        moved = gateway.update_story(story.story_id, fields, user_id=request.user_id)
+    _check_rank(board_id, moved.board_rank, context)
+    return story_fields(moved)
+
+
+def delete_story(story_id: int, user_id: int, context: Context) -> None:
+    """Delete a story of a project the user `user_id` may write. Raise DatabaseQueryError if the story doesn't exist,
+    the user may not write its project or the story has sub-stories.
+    """
+    gateway = context.postgres_gateway
+    with gateway.transaction():
+        story = gateway.read_story(story_id, for_update=True)
+        _check_write_access(story.project_id, user_id, context)
+        gateway.delete_story(story_id)
+
+
+def _check_story_access(story_id: int, user_id: int, context: Context) -> None:
+    if story_id <= 0:
+        raise BadRequestError("Invalid story id")
+    project_id = context.postgres_gateway.read_story_project(story_id)
+    if project_id is None:
+        raise DatabaseQueryError(f"Story {story_id} not found")
+    check_project_access(project_id, user_id, context)
+
+
+def read_story_subtree(story_id: int, user_id: int, context: Context,
+                       max_depth: Optional[int] = None) -> Mapping[str, Any]:
+    """Read the subtree of a story of a project the user `user_id` may read, down to `max_depth` levels below the
+    story if not None. Return a map with the story id and the list of the stories of the subtree, the story first,
+    by depth. Raise BadRequestError if the story id or depth is invalid or DatabaseQueryError if the story doesn't
+    exist or the user may not read its project.
+    """
+    if max_depth is not None and max_depth < 0:
+        raise BadRequestError("Invalid depth")
+    _check_story_access(story_id, user_id, context)
+    return {"story_id": story_id, "stories": context.postgres_gateway.read_story_subtree(story_id, max_depth)}
+
+
+def read_story_ancestors(story_id: int, user_id: int, context: Context) -> Mapping[str, Any]:
+    """Read the ancestors of a story of a project the user `user_id` may read. Return a map with the story id and the
+    list of its ancestors from the root of its tree to its parent. Raise BadRequestError if the story id is invalid or
+    DatabaseQueryError if the story doesn't exist or the user may not read its project.
+    """
+    _check_story_access(story_id, user_id, context)
+    return {"story_id": story_id, "ancestors": context.postgres_gateway.read_story_ancestors(story_id)}
+
+
+def read_story_rollup(story_id: int, user_id: int, context: Context) -> Mapping[str, Any]:
+    """Read the rollup of the subtree of a story of a project the user `user_id` may read, the story included: the
+    total estimate and number of its stories in each status, and the estimate remaining to be done. Return a map with
+    the story id and the totals. Raise BadRequestError if the story id is invalid or DatabaseQueryError if the story
+    doesn't exist or the user may not read its project.
+    """
+    _check_story_access(story_id, user_id, context)
+    return dict(status_totals(context.postgres_gateway.read_story_rollup(story_id)), story_id=story_id)
+
+
+def search_stories(request: StorySearchRequest,
+                   context: Context) -> Tuple[List[Mapping[str, Any]], Optional[str]]:
+    """Given a `StorySearchRequest`, search a page of the stories of a project the user may read, best match first.
+    Return the list of maps of story fields with rank and highlights, and the cursor of the next page, None on the
+    last page. Raise BadRequestError if the cursor is invalid, or DatabaseQueryError if the project doesn't exist or
+    the user may not read it.
+    """
+    try:
+        after = decode_cursor(request.cursor, float, int) if request.cursor else None
+    except ValueError:
+        raise BadRequestError("Invalid cursor")
+    check_project_access(request.project_id, request.user_id, context)
+    # One extra story tells whether there is a next page.
+    stories = context.postgres_gateway.search_stories(request.project_id, request.text, after=after,
+                                                      limit=request.limit + 1)
+    next_cursor = None
+    if len(stories) > request.limit:
+        stories = stories[:request.limit]
+        next_cursor = encode_cursor(stories[-1]["rank"], stories[-1]["story_id"])
+    return stories, next_cursor
+
+
+def read_board(board_id: int, user_id: int, context: Context) -> Tuple[Optional[int], str]:
+    """Read a board of a project the user `user_id` may read with the cards of its stories. Return the pair of the
+    board version, None if the board cache is disabled, and the json text of the board document. Raise
+    BadRequestError if the board id is invalid or DatabaseQueryError if the board doesn't exist or the user may not
+    read its project.
+    """
+    if board_id <= 0:
+        raise BadRequestError("Invalid board id")
+    if context.board_cache is not None:
+        version, project_id, readable, document = context.board_cache.read_board(board_id, user_id)
+        if not readable:
+            raise DatabaseQueryError(f"Project {project_id} not found")
+        return version, document
+    board = context.postgres_gateway.read_board(board_id)
+    if board is None:
+        raise DatabaseQueryError(f"Board {board_id} not found")
+    project_id, document = board
+    check_project_access(project_id, user_id, context)
+    return None, document
+
+
+def subscribe_board(board_id: int, user_id: int, context: Context) -> BoardSubscription:
+    """Subscribe the user `user_id` to the events of a board of a project the user may read. Return the subscription,
+    to be closed when the client leaves. Raise BadRequestError if the board id is invalid or DatabaseQueryError if the
+    board doesn't exist or the user may not read its project.
+    """
+    if board_id <= 0:
+        raise BadRequestError("Invalid board id")
+    project_id = context.postgres_gateway.read_board_project(board_id)
+    if project_id is None:
+        raise DatabaseQueryError(f"Board {board_id} not found")
+    check_project_access(project_id, user_id, context)
+    return context.board_events.subscribe(board_id)
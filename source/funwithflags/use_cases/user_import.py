@@ -0,0 +1,123 @@
+"""Module for the bulk user import."""
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import logging
+from time import monotonic
+from typing import IO, Any, Callable, Iterator, List, Mapping, Optional, Tuple
+
+from funwithflags.definitions import BadRequestError, RegisterRequest, User
+from funwithflags.entities import generate_salt_hash_password
+from funwithflags.gateways import Context
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = ("username", "nickname", "email", "password")
+# Column sizes of the users table, a longer value would fail the COPY of its whole batch.
+MAX_FIELD_LENGTHS = {"username": 32, "nickname": 32, "email": 128}
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a bulk user import. `rejected` lists the pairs of record number and reason of every record not
+    imported, either invalid or taken.
+    """
+
+    imported: int = 0
+    rejected: List[Tuple[int, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+
+def read_user_records(source: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Given a `source` file object of users as CSV with a header line or as NDJSON, return an iterator over pairs of
+    record number, the line number for NDJSON, and record: a map of field names and values, or an error message if
+    the record is malformed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_num, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield line_num, record if isinstance(record, dict) else "Record is not an object"
+        except ValueError as e:
+            yield line_num, f"Malformed json: {e}"
+
+
+def _register_request(record: Any) -> RegisterRequest:
+    """Validate a record with the rules of the registration, raise BadRequestError if it is invalid."""
+    if not isinstance(record, Mapping):
+        raise BadRequestError(record)
+    missing = [name for name in IMPORT_FIELDS if not isinstance(record.get(name), str)]
+    if missing:
+        raise BadRequestError(f"Missing fields {', '.join(missing)}")
+    too_long = [name for name, length in MAX_FIELD_LENGTHS.items() if len(record[name]) > length]
+    if too_long:
+        raise BadRequestError(f"Fields too long {', '.join(too_long)}")
+    return RegisterRequest(**{name: record[name] for name in IMPORT_FIELDS})
+
+
+def import_users(records: Iterator[Tuple[int, Any]], context: Context, workers: int = 0, batch_size: int = 1000,
+                 progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """Given an iterator of pairs of record number and record, as returned by `read_user_records`, register the valid
+    users in batches of `batch_size`. Records are validated like registration requests, passwords are hashed with the
+    bcrypt cost of the hashing service on a pool of `workers` processes, or inline if 0, and every batch is loaded
+    with COPY and merged in one transaction. `progress` is called with the report so far after every batch.
+    """
+    report, start = ImportReport(), monotonic()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        batch = []
+        for record_num, record in records:
+            try:
+                batch.append((record_num, _register_request(record)))
+            except BadRequestError as e:
+                report.rejected.append((record_num, str(e)))
+            if len(batch) >= batch_size:
+                _import_batch(batch, context, executor, report)
+                batch = []
+                report.elapsed = monotonic() - start
+                if progress is not None:
+                    progress(report)
+        if batch:
+            _import_batch(batch, context, executor, report)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    report.elapsed = monotonic() - start
+    logger.info(f"Imported {report.imported} users in {report.elapsed:.2f} s ({report.rate:.0f} users/s), "
+                f"rejected {len(report.rejected)}")
+    return report
+
+
+def _import_batch(batch: List[Tuple[int, RegisterRequest]], context: Context,
+                  executor: Optional[ProcessPoolExecutor], report: ImportReport) -> None:
+    passwords = [request.password for _, request in batch]
+    rounds = [context.hashing_service.rounds] * len(batch)
+    if executor is not None:
+        hashes = list(executor.map(generate_salt_hash_password, passwords, rounds,
+                                   chunksize=max(1, len(batch) // 64)))
+    else:
+        hashes = list(map(generate_salt_hash_password, passwords, rounds))
+    created_at = datetime.now()
+    users = [User(username=request.username, nickname=request.nickname, email=request.email, password=password,
+                  salt=salt, created_at=created_at, valid=True)
+             for (_, request), (password, salt) in zip(batch, hashes)]
+    imported = {(user.username, user.email) for user in context.postgres_gateway.import_users(users)}
+    report.imported += len(imported)
+    for record_num, request in batch:
+        if (request.username, request.email) in imported:
+            imported.remove((request.username, request.email))
+        else:
+            report.rejected.append((record_num, "Username or email already taken"))
@@ -14,6 +14,11 @@ dbname=postgres
 user=service
 password=password
 """
+POOLED_DATABASE_CONFIG = DATABASE_CONFIG + """pool_min_size=1
+pool_max_size=4
+pool_timeout=5
+prepared_statements=true
+"""
 REDIS_CONFIG = """[redis]
 host=cacheredis
 port=6379
@@ -53,6 +58,14 @@ def pg_gateway():
         return PostgresGateway.create(temp_file.name)
 
 
+@pytest.fixture
+def pooled_pg_gateway():
+    with tempfile.NamedTemporaryFile(mode="w+t", suffix=".ini") as temp_file:
+        temp_file.write(POOLED_DATABASE_CONFIG)
+        temp_file.seek(0)
+        return PostgresGateway.create(temp_file.name)
+
+
 @pytest.fixture
 def redis_gateway():
     with tempfile.NamedTemporaryFile(mode="w+t", suffix=".ini") as temp_file:
@@ -1,4 +1,5 @@
 """Integration test for database gateway."""
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 
 from funwithflags.definitions import User
@@ -25,6 +26,19 @@ def test_make_postgres_gateway(pg_gateway):
     assert pg_gateway is not None
 
 
+@pytest.mark.usefixtures("pooled_pg_gateway")
+def test_pooled_postgres_gateway_concurrent_queries(pooled_pg_gateway):
+    # When
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda i: pooled_pg_gateway.query("SELECT %s", i), range(32)))
+    metrics = pooled_pg_gateway.pool_metrics()
+    # Then
+    assert results == [(i,) for i in range(32)]
+    assert metrics.size <= 4
+    assert metrics.in_use == 0
+    assert metrics.checkouts == 32
+
+
 @pytest.mark.usefixtures("pg_gateway")
 def test_postgres_gateway_create_user_success(pg_gateway):
     """Success for the first time.
@@ -62,6 +76,123 @@ def test_postgres_gateway_read_user(pg_gateway, user_id_name, expected):
     assert compare_users_without_created_at(expected, user)
 
 
+@pytest.mark.usefixtures("pg_gateway")
+def test_postgres_gateway_read_user_columns(pg_gateway):
+    # When
+    user = pg_gateway.read_user(user_id=1, columns=["username"])
+    # Then
+    assert (user.user_id, user.username) == (1, EXAMPLE_USER.username)
+    assert (user.password, user.salt, user.email) == (b"", b"", "")
+
+
+@pytest.mark.usefixtures("pooled_pg_gateway")
+def test_prepared_statements_survive_deallocate(pooled_pg_gateway):
+    # Given
+    user = pooled_pg_gateway.read_user(user_id=1)
+    with pooled_pg_gateway._connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DEALLOCATE ALL")
+        conn.commit()
+    # When & Then
+    for _ in range(4):
+        assert pooled_pg_gateway.read_user(user_id=1) == user
+    with pytest.raises(DatabaseQueryError):
+        pooled_pg_gateway.read_user(user_id=100)
+
+
+@pytest.mark.usefixtures("pg_gateway")
+def test_postgres_gateway_reconnects(pg_gateway):
+    # Given
+    pg_gateway._conn.close()
+    # When & Then
+    assert pg_gateway.read_user(user_id=1).user_id == 1
+
+
+@pytest.mark.parametrize("fixture", ["pg_gateway", "pooled_pg_gateway"])
+def test_transaction_commit_and_rollback(request, fixture):
+    # Given
+    gateway = request.getfixturevalue(fixture)
+    notified = []
+    gateway.add_user_write_listener(notified.append)
+    # When
+    with pytest.raises(RuntimeError):
+        with gateway.transaction():
+            gateway.update_user(1, nickname="rolledBack")
+            raise RuntimeError
+    with gateway.transaction():
+        gateway.update_user(1, nickname="outer")
+        with pytest.raises(DatabaseQueryError):
+            with gateway.transaction():
+                gateway.update_user(1, nickname="inner")
+                gateway.query("SELECT 1 / 0")
+        assert notified == []
+    # Then
+    assert gateway.read_user(user_id=1).nickname == "outer"
+    assert notified == [1]
+    gateway.update_user(1, nickname=EXAMPLE_USER.nickname)
+
+
+@pytest.mark.usefixtures("pg_gateway")
+def test_query_fetch_modes(pg_gateway):
+    # When
+    with pg_gateway.transaction():
+        many = pg_gateway.query("SELECT generate_series(1, 10)", fetch="many", size=3)
+        every = pg_gateway.query("SELECT generate_series(1, 10)", fetch="all")
+    # Then
+    assert many == [(1,), (2,), (3,)]
+    assert len(every) == 10
+    with pytest.raises(BadRequestError):
+        pg_gateway.query("SELECT 1", fetch="some")
+
+
+@pytest.mark.parametrize("fixture", ["pg_gateway", "pooled_pg_gateway"])
+def test_query_iter(request, fixture):
+    # Given
+    gateway = request.getfixturevalue(fixture)
+    # When
+    rows = gateway.query_iter("SELECT generate_series(1, %s)", 10000, itersize=100)
+    partial = gateway.query_iter("SELECT generate_series(1, 10000)", itersize=100)
+    first = next(partial)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        concurrent = executor.submit(gateway.query, "SELECT 1").result(timeout=5)
+    partial.close()
+    # Then
+    assert concurrent == (1,)
+    assert sum(row[0] for row in rows) == 50005000
+    assert first == (1,)
+    assert gateway.query("SELECT 1") == (1,)
+    with pytest.raises(DatabaseQueryError):
+        list(gateway.query_iter("SELECT 1 / 0"))
+
+
+@pytest.mark.usefixtures("pg_gateway")
+def test_postgres_gateway_import_users(pg_gateway):
+    # Given
+    users = [User(**dict(vars(EXAMPLE_USER), username=f"import{i}", email=f"import{i}@example.com"))
+             for i in range(3)]
+    users.append(User(**dict(vars(EXAMPLE_USER), username="import0", email="other@example.com")))
+    users.append(User(**dict(vars(EXAMPLE_USER), email="import1@example.com")))
+    # When
+    imported = pg_gateway.import_users(users)
+    # Then
+    assert [user.username for user in imported] == ["import0", "import1", "import2"]
+    for user in imported:
+        assert compare_users_without_created_at(user, pg_gateway.read_user(user_id=user.user_id))
+        pg_gateway.delete_user(user.user_id)
+
+
+@pytest.mark.usefixtures("pg_gateway")
+def test_postgres_gateway_read_users(pg_gateway):
+    # When
+    users, missing = pg_gateway.read_users([100, 1, 1], columns=["nickname"])
+    # Then
+    assert [(user.user_id, user.nickname) for user in users] == [(1, EXAMPLE_USER.nickname)]
+    assert missing == [100]
+    assert pg_gateway.read_users([]) == ([], [])
+    with pytest.raises(BadRequestError):
+        pg_gateway.read_users([1, 0])
+
+
 @pytest.mark.usefixtures("pg_gateway")
 @pytest.mark.parametrize(
     "user_id_name,exception",
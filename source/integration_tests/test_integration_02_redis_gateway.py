@@ -3,6 +3,8 @@ from datetime import timedelta
 import pytest
 from time import sleep
 
+from funwithflags.gateways import SessionRegistry, TokenStateCache
+
 
 @pytest.mark.usefixtures("redis_gateway")
 def test_create_redis_gateway(redis_gateway):
@@ -40,3 +42,71 @@ def test_get_expired(redis_gateway):
     name = "testname1"
     # When & Then
     assert redis_gateway.get(name) is None
+
+
+@pytest.mark.usefixtures("redis_gateway")
+def test_set_many_get_many(redis_gateway):
+    # When
+    results = redis_gateway.set_many({
+        "manyname1": ("value1", timedelta(seconds=1)),
+        "manyname2": ("value2", None),
+    })
+    values = redis_gateway.get_many(["manyname1", "wrongName", "manyname2"])
+    # Then
+    assert results == [True, True]
+    assert values == ["value1", None, "value2"]
+    assert redis_gateway.get_many([]) == []
+
+
+@pytest.mark.usefixtures("redis_gateway")
+def test_pipeline(redis_gateway):
+    # When
+    with redis_gateway.pipeline() as pipe:
+        pipe.set("pipename1", "value1").get("pipename1").get("wrongName")
+    # Then
+    assert pipe.results == [True, "value1", None]
+
+
+@pytest.mark.usefixtures("redis_gateway")
+def test_pipeline_not_sent_on_error(redis_gateway):
+    # When
+    with pytest.raises(RuntimeError):
+        with redis_gateway.pipeline() as pipe:
+            pipe.set("pipename2", "value2")
+            raise RuntimeError
+    # Then
+    assert redis_gateway.get("pipename2") is None
+
+
+@pytest.mark.usefixtures("redis_gateway")
+def test_token_cache_revocation_is_pushed(redis_gateway):
+    # Given
+    worker1, worker2 = TokenStateCache(redis_gateway), TokenStateCache(redis_gateway)
+    redis_gateway.set("cachedJti", "login")
+    worker2.get("cachedJti")
+    sleep(0.5)  # Let the subscriber thread of worker2 subscribe
+    assert worker2.get("cachedJti") == "login"
+    # When
+    worker1.revoke("cachedJti")
+    sleep(0.5)
+    # Then
+    assert worker2.get("cachedJti") == "logout"
+
+
+@pytest.mark.usefixtures("redis_gateway")
+def test_session_registry(redis_gateway):
+    # Given
+    token_cache = TokenStateCache(redis_gateway)
+    registry = SessionRegistry(redis_gateway, token_cache)
+    generation = token_cache.get_generation(42)
+    with redis_gateway.pipeline() as pipe:
+        registry.add(pipe, 42, "sessionJti1", timedelta(minutes=1))
+        registry.add(pipe, 42, "sessionJti2", timedelta(minutes=2))
+    # When
+    sessions = registry.list(42)
+    new_generation = registry.revoke_all(42)
+    # Then
+    assert [jti for jti, _ in sessions] == ["sessionJti1", "sessionJti2"]
+    assert new_generation == generation + 1
+    assert token_cache.get_generation(42) == new_generation
+    assert registry.list(42) == []
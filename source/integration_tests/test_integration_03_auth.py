@@ -5,8 +5,10 @@ import bcrypt
 import flask_jwt_extended
 
 from funwithflags.definitions import RegisterRequest, LoginRequest, FreshLoginRequest, LogoutRequest, UserUpdateRequest
-from funwithflags.definitions import BadRequestError, DatabaseQueryError
-from funwithflags.use_cases import register, login, fresh_login, refresh_access_token, logout, read_user_basic, update_user
+from funwithflags.definitions import BadRequestError, DatabaseQueryError, TokenPolicy
+from funwithflags.entities import get_hash_rounds
+from funwithflags.use_cases import (register, login, fresh_login, refresh_access_token, logout, read_user_basic,
+                                    read_users_basic, update_user)
 
 from .conftest import CREATE_TIME, EXAMPLE_USER, LOGIN_USER
 
@@ -67,6 +69,7 @@ def test_login(monkeypatch, context):
     monkeypatch.setattr(flask_jwt_extended, 'create_access_token', mock_create_access_token)
     monkeypatch.setattr(flask_jwt_extended, 'create_refresh_token', mock_create_refresh_token)
     monkeypatch.setattr(flask_jwt_extended, 'get_jti', mock_get_jti)
+    monkeypatch.setattr(context, 'token_policy', TokenPolicy.ALL)
 
     # When
     username, access_token, refresh_token = login(request, context)
@@ -129,6 +132,27 @@ def test_login_wrong_password_failure(context):
         fresh_login(request, context)
 
 
+@pytest.mark.usefixtures("context")
+def test_login_rehashes_outdated_password(monkeypatch, context):
+    # Given
+    username = "rehashUser"
+    context.hashing_service.rounds = 4
+    user_id = register(RegisterRequest(username=username, nickname="rehash", email="rehash@example.com",
+                                       password=LOGIN_USER.password), context)
+    context.hashing_service.rounds = 5
+    monkeypatch.setattr(flask_jwt_extended, 'create_access_token', lambda identity, fresh: "access.Token")
+    monkeypatch.setattr(flask_jwt_extended, 'create_refresh_token', lambda identity: "refresh.Token")
+    monkeypatch.setattr(flask_jwt_extended, 'get_jti', lambda encoded_token: encoded_token)
+
+    # When
+    login(LoginRequest(username=username, password=LOGIN_USER.password), context)
+    user = context.postgres_gateway.read_user(user_id=user_id)
+
+    # Then
+    assert get_hash_rounds(user.salt) == 5
+    assert context.hashing_service.hash_password(LOGIN_USER.password, user.salt) == user.password
+
+
 """Tests for fresh login"""
 
 
@@ -151,6 +175,7 @@ def test_fresh_login(monkeypatch, context):
 
     monkeypatch.setattr(flask_jwt_extended, 'create_access_token', mock_create_access_token)
     monkeypatch.setattr(flask_jwt_extended, 'get_jti', mock_get_jti)
+    monkeypatch.setattr(context, 'token_policy', TokenPolicy.ALL)
 
     # When
     access_token = fresh_login(request, context)
@@ -181,6 +206,7 @@ def test_refresh_access_token(monkeypatch, context):
 
     monkeypatch.setattr(flask_jwt_extended, 'create_access_token', mock_create_access_token)
     monkeypatch.setattr(flask_jwt_extended, 'get_jti', mock_get_jti)
+    monkeypatch.setattr(context, 'token_policy', TokenPolicy.ALL)
 
     # When
     new_token = refresh_access_token(identity=10, context=context)
@@ -233,6 +259,21 @@ def test_read_user_basic(create_example_user, context):
     assert result["created_at"] == str(CREATE_TIME)
 
 
+def test_read_user_basic_fields(context):
+    # When
+    result = read_user_basic(user_id=EXAMPLE_USER_ID, context=context, fields=["username", "email"])
+    # Then
+    assert result == {"username": EXAMPLE_USER.username, "email": EXAMPLE_USER.email}
+
+
+def test_read_users_basic(context):
+    # When
+    users, missing = read_users_basic([EXAMPLE_USER_ID + 100, EXAMPLE_USER_ID], context=context, fields=["userid"])
+    # Then
+    assert users == [{"userid": EXAMPLE_USER_ID}]
+    assert missing == [EXAMPLE_USER_ID + 100]
+
+
 @pytest.mark.parametrize(
     "user_id,exception",
     [(-1, BadRequestError),
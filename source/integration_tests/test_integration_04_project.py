@@ -0,0 +1,498 @@
+"""Integration tests for project apis."""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import io
+import json
+from time import sleep
+
+import pytest
+
+from funwithflags.definitions import (BadRequestError, DatabaseQueryError, FlowMetricsRequest, ProjectCreateRequest,
+                                      ProjectExportRequest, ProjectListRequest, StoryCreateRequest, StoryMoveRequest,
+                                      StorySearchRequest, StoryStatus, StoryUpdateRequest, User)
+from funwithflags.gateways import STORY_EVENT, STORY_EXPORT_COLUMNS, BoardCache, BoardEventHub, Context
+from funwithflags.use_cases import (create_project, create_story, delete_story, export_project, export_project_rows,
+                                   list_projects, move_story, read_board, read_burndown, read_epic_progress,
+                                   read_flow_metrics, read_project, read_project_tree, read_sprint_progress, read_story,
+                                   read_story_ancestors, read_story_rollup, read_story_subtree, search_stories,
+                                   subscribe_board, update_story)
+
+PROJECT_OWNER = User(username="projectOwner", nickname="owner", email="projectOwner@example.com", password=b"123456",
+                     salt=b"123", created_at=datetime.now(), valid=True)
+STORIES = 5
+
+
+@pytest.fixture
+def project(pg_gateway):
+    """Create a private personal project with an epic, a sprint and stories, return the project and owner ids."""
+    owner_id = pg_gateway.create_user(User(**dict(vars(PROJECT_OWNER), username=f"owner{datetime.now():%H%M%S%f}",
+                                                  email=f"owner{datetime.now():%H%M%S%f}@example.com")))
+    with pg_gateway.transaction():
+        project_id = pg_gateway.query(
+            """INSERT INTO project(project_name, project_type, project_public, user_id, admin_id, created_at)
+               VALUES ('export', 'personal', false, %s, %s, now()) RETURNING project_id""", owner_id, owner_id)[0]
+        pg_gateway.query("INSERT INTO epic(epic_name, project_id) VALUES ('epic', %s) RETURNING epic_id", project_id)
+        pg_gateway.query("""INSERT INTO sprint(sprint_num, sprint_name, project_id, status, created_at)
+                            VALUES (1, 'sprint', %s, 0, now()) RETURNING sprint_id""", project_id)
+        for i in range(STORIES):
+            pg_gateway.query("""INSERT INTO story(story_name, story_type, status, created_at, closed_at, project_id,
+                                description) VALUES (%s, 0, 0, now(), now(), %s, 'line, "quoted"\nnext')
+                                RETURNING story_id""", f"story {i}", project_id)
+    return project_id, owner_id
+
+
+def test_export_project_rows(context, project):
+    # Given
+    project_id, owner_id = project
+    # When
+    records = list(export_project_rows(ProjectExportRequest(project_id=project_id), owner_id, context))
+    resumed = list(export_project_rows(ProjectExportRequest(project_id=project_id, fmt="csv",
+                                                            after=records[-2]["story_id"]), owner_id, context))
+    # Then
+    assert [record["kind"] for record in records] == ["project", "epic", "sprint"] + ["story"] * STORIES
+    assert [row[0] for row in resumed] == [str(records[-1]["story_id"])]
+    with pytest.raises(DatabaseQueryError):
+        export_project_rows(ProjectExportRequest(project_id=project_id), owner_id + 1000, context)
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_project_with_copy(context, project, fmt):
+    # Given
+    project_id, _ = project
+    out = io.StringIO()
+    # When
+    rows = export_project(ProjectExportRequest(project_id=project_id, fmt=fmt), context, out, batch_size=2)
+    # Then
+    if fmt == "ndjson":
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert rows == len(records) == 3 + STORIES
+        assert records[-1]["description"] == 'line, "quoted"\nnext'
+    else:
+        assert rows == STORIES
+        assert out.getvalue().startswith(",".join(STORY_EXPORT_COLUMNS) + "\n")
+
+
+def test_create_read_and_list_projects(context, project):
+    # Given
+    _, owner_id = project
+    project_ids = [create_project(ProjectCreateRequest(admin_id=owner_id, project_name=f"project {i}"), context)
+                   for i in range(5)]
+    listed, cursor = [], None
+    # When
+    while True:
+        page, cursor = list_projects(ProjectListRequest(user_id=owner_id, limit=2, cursor=cursor), context)
+        listed.extend(project["project_id"] for project in page)
+        if cursor is None:
+            break
+    # Then
+    assert listed[:5] == project_ids[::-1]
+    assert len(listed) == 6
+    assert read_project(project_ids[0], owner_id, context)["project_name"] == "project 0"
+    with pytest.raises(DatabaseQueryError):
+        read_project(project_ids[0], owner_id + 1000, context)
+
+
+def test_read_project_tree(context, project):
+    # Given
+    project_id, owner_id = project
+    pg_gateway = context.postgres_gateway
+    pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at) VALUES ('board', %s, %s, now())
+                        RETURNING board_id""", project_id, owner_id)
+    pg_gateway.query("""INSERT INTO sprint(sprint_num, sprint_name, project_id, status, created_at, closed_at)
+                        VALUES (0, 'closed', %s, 1, now(), now()) RETURNING sprint_id""", project_id)
+    # When
+    tree = json.loads(read_project_tree(project_id, owner_id, context))
+    # Then
+    assert tree["project_id"] == project_id
+    assert tree["public"] is False
+    assert [board["board_name"] for board in tree["boards"]] == ["board"]
+    assert [epic["epic_name"] for epic in tree["epics"]] == ["epic"]
+    assert [sprint["sprint_name"] for sprint in tree["sprints"]] == ["sprint"]
+    with pytest.raises(DatabaseQueryError):
+        read_project_tree(project_id, owner_id + 1000, context)
+
+
+def test_search_stories(context, project):
+    # Given
+    project_id, owner_id = project
+    story_ids = [create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name=name,
+                                                 description=description), context)
+                 for name, description in (("Login page", "Users log in with their email"),
+                                           ("Signup form", "New users sign up, then log in"),
+                                           ("Logging", "Structured logs of the login attempts"),
+                                           ("OAuth login", None))]
+    found, cursor = [], None
+    # When
+    while True:
+        page, cursor = search_stories(StorySearchRequest(project_id=project_id, user_id=owner_id, text="login -oauth",
+                                                         limit=1, cursor=cursor), context)
+        found.extend(page)
+        if cursor is None:
+            break
+    # Then
+    assert [story["story_id"] for story in found] == [story_ids[0], story_ids[2]]
+    assert found[0]["rank"] > found[1]["rank"]
+    assert found[0]["name_highlight"] == "<mark>Login</mark> page"
+    assert "<mark>login</mark>" in found[1]["description_highlight"]
+    with pytest.raises(DatabaseQueryError):
+        search_stories(StorySearchRequest(project_id=project_id, user_id=owner_id + 1000, text="login"), context)
+
+
+def test_burndown_matches_recompute(context, project):
+    # Given
+    project_id, owner_id = project
+    pg_gateway = context.postgres_gateway
+    sprint_ids = [pg_gateway.query("""INSERT INTO sprint(sprint_num, sprint_name, project_id, status, created_at)
+                                      VALUES (%s, 'burndown', %s, 0, now()) RETURNING sprint_id""", num, project_id)[0]
+                  for num in (2, 3)]
+    story_ids = [create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name=f"story {i}",
+                                                 estimate=i or None, sprint_id=sprint_ids[i % 2]), context)
+                 for i in range(6)]
+    # When
+    for story_id, fields in ((story_ids[0], {"status": StoryStatus.DONE.value}),
+                             (story_ids[1], {"status": StoryStatus.IN_PROGRESS.value, "estimate": 8}),
+                             (story_ids[2], {"sprint_id": sprint_ids[1], "status": StoryStatus.IN_REVIEW.value}),
+                             (story_ids[3], {"sprint_id": None}),
+                             (story_ids[5], {"status": StoryStatus.DONE.value}),
+                             (story_ids[5], {"status": StoryStatus.TODO.value, "estimate": 3})):
+        update_story(StoryUpdateRequest(story_id=story_id, user_id=owner_id, fields=fields), context)
+    delete_story(story_ids[4], owner_id, context)
+    # Then
+    for sprint_id in sprint_ids:
+        recomputed = {status: (estimate, stories) for status, estimate, stories in pg_gateway.query(
+            """SELECT status, sum(coalesce(estimate, 0)), count(*) FROM story WHERE sprint_id = %s GROUP BY status""",
+            sprint_id, fetch="all")}
+        expected = {status.name.lower(): recomputed.get(status, (0, 0)) for status in StoryStatus}
+        assert pg_gateway.check_burndown(sprint_id) == []
+        today = read_burndown(sprint_id, owner_id, context)["days"][-1]
+        assert {name: (today["estimates"][name], today["stories"][name]) for name in expected} == expected
+        assert pg_gateway.rebuild_burndown(sprint_id) > 0
+        assert pg_gateway.check_burndown(sprint_id) == []
+        today = read_burndown(sprint_id, owner_id, context)["days"][-1]
+        assert {name: (today["estimates"][name], today["stories"][name]) for name in expected} == expected
+    with pytest.raises(DatabaseQueryError):
+        read_burndown(sprint_ids[0], owner_id + 1000, context)
+
+
+def test_rollups_follow_story_writes(context, project):
+    # Given
+    project_id, owner_id = project
+    pg_gateway = context.postgres_gateway
+    epic_id = pg_gateway.query("SELECT epic_id FROM epic WHERE project_id = %s", project_id)[0]
+    sprint_id = pg_gateway.query("SELECT sprint_id FROM sprint WHERE project_id = %s", project_id)[0]
+    board_id = pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                   VALUES ('rollup', %s, %s, now()) RETURNING board_id""", project_id, owner_id)[0]
+    story_ids = [create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name=f"story {i}",
+                                                 estimate=i + 1, epic_id=epic_id, sprint_id=sprint_id,
+                                                 board_id=board_id if i == 3 else None), context)
+                 for i in range(4)]
+
+    def drift():
+        return [row for row in pg_gateway.check_rollups() if row[:2] in (("epic", epic_id), ("sprint", sprint_id))]
+
+    # When
+    update_story(StoryUpdateRequest(story_id=story_ids[0], user_id=owner_id,
+                                    fields={"status": StoryStatus.DONE.value}), context)
+    update_story(StoryUpdateRequest(story_id=story_ids[1], user_id=owner_id, fields={"epic_id": None, "estimate": 5}),
+                 context)
+    update_story(StoryUpdateRequest(story_id=story_ids[2], user_id=owner_id, fields={"sprint_id": None}), context)
+    delete_story(story_ids[1], owner_id, context)
+    epic = read_epic_progress(epic_id, owner_id, context)
+    sprint = read_sprint_progress(sprint_id, owner_id, context)
+    # Then
+    assert drift() == []
+    assert (epic["estimate"], epic["remaining"], epic["stories"]) == (8, 7, {"todo": 2, "done": 1})
+    assert (sprint["estimate"], sprint["remaining"], sprint["stories"]) == (5, 4, {"todo": 1, "done": 1})
+    progress = {epic["epic_id"]: epic["progress"]
+                for epic in json.loads(read_project_tree(project_id, owner_id, context))["epics"]}
+    assert progress[epic_id] == {"stories": 3, "done": 1, "estimate": 8, "remaining": 7}
+    # When
+    pg_gateway.query("DELETE FROM board WHERE board_id = %s", board_id)
+    # Then
+    assert drift() == []
+    assert pg_gateway.check_burndown(sprint_id) == []
+    assert read_epic_progress(epic_id, owner_id, context)["stories"] == {"todo": 1, "done": 1}
+    # When
+    pg_gateway.query("UPDATE epic_rollup SET stories = stories + 1 WHERE epic_id = %s AND status = %s", epic_id,
+                     StoryStatus.TODO.value)
+    found = drift()
+    repaired = [row for row in pg_gateway.repair_rollups() if row in found]
+    # Then
+    assert [row[:3] for row in found] == [("epic", epic_id, StoryStatus.TODO.value)]
+    assert repaired == found
+    assert drift() == []
+    with pytest.raises(DatabaseQueryError):
+        read_epic_progress(epic_id, owner_id + 1000, context)
+
+
+def test_board_transitions_and_flow_metrics(context, project):
+    # Given
+    project_id, owner_id = project
+    pg_gateway = context.postgres_gateway
+    board_ids = [pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                     VALUES (%s, %s, %s, now()) RETURNING board_id""", name, project_id, owner_id)[0]
+                 for name in ("todo", "doing")]
+    story_id, open_story_id = [create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id,
+                                                               story_name=name, board_id=board_ids[0]), context)
+                               for name in ("moved", "open")]
+    # When
+    for fields in ({"board_id": board_ids[1]}, {"board_id": None}, {"board_id": board_ids[0], "priority": 1},
+                   {"priority": 2}, {"status": StoryStatus.DONE.value}):
+        story = update_story(StoryUpdateRequest(story_id=story_id, user_id=owner_id, fields=fields), context)
+    transitions = pg_gateway.query("""SELECT from_board, to_board, moved_by FROM story_transition
+                                      WHERE story_id = %s ORDER BY transition_id""", story_id, fetch="all")
+    flow = read_flow_metrics(FlowMetricsRequest(project_id=project_id, user_id=owner_id), context)
+    # Then
+    assert transitions == [(None, board_ids[0], owner_id), (board_ids[0], board_ids[1], owner_id),
+                           (board_ids[1], None, owner_id), (None, board_ids[0], owner_id)]
+    assert story["board_history"] == read_story(story_id, owner_id, context)["board_history"] == board_ids
+    assert read_story(open_story_id, owner_id, context)["board_history"] is None
+    assert flow["throughput"] == 1
+    assert flow["lead_time"]["mean"] >= flow["cycle_time"]["mean"] >= 0
+    assert [(board["board_id"], board["stories"]) for board in flow["wip"]] == [(board_ids[0], 1)]
+    with pytest.raises(DatabaseQueryError):
+        read_flow_metrics(FlowMetricsRequest(project_id=project_id, user_id=owner_id + 1000), context)
+
+
+def test_wip_counters_follow_story_writes(context, project):
+    # Given
+    project_id, owner_id = project
+    pg_gateway = context.postgres_gateway
+    board_ids = [pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                     VALUES (%s, %s, %s, now()) RETURNING board_id""", name, project_id, owner_id)[0]
+                 for name in ("todo", "doing")]
+    story_ids = [create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name=f"wip {n}",
+                                                 board_id=board_ids[0]), context) for n in range(3)]
+
+    def board_drift():
+        return [row for row in pg_gateway.check_wip() if row[0] in board_ids]
+
+    # When
+    update_story(StoryUpdateRequest(story_id=story_ids[0], user_id=owner_id, fields={"board_id": board_ids[1]}),
+                 context)
+    update_story(StoryUpdateRequest(story_id=story_ids[1], user_id=owner_id,
+                                    fields={"status": StoryStatus.DONE.value}), context)
+    delete_story(story_ids[2], owner_id, context)
+    wip = pg_gateway.read_wip(project_id)
+    # Then
+    assert [(board_id, stories) for board_id, stories, _ in wip] == [(board_ids[1], 1)]
+    assert wip[0][2] >= 0
+    assert board_drift() == []
+    # When
+    pg_gateway.query("UPDATE board_wip SET stories = stories + 1 WHERE board_id = %s", board_ids[1])
+    pg_gateway.query("UPDATE story SET board_entered_at = NULL, started_at = NULL WHERE story_id = %s", story_ids[0])
+    drift = board_drift()
+    pg_gateway.rebuild_wip()
+    # Then
+    assert [row[:2] for row in drift] == [(board_ids[1], 2)]
+    assert board_drift() == []
+    assert pg_gateway.query("""SELECT board_entered_at > started_at FROM story WHERE story_id = %s""",
+                            story_ids[0]) == (True,)
+
+
+def test_move_stories_on_board(context, project):
+    # Given
+    project_id, owner_id = project
+    pg_gateway = context.postgres_gateway
+    board_ids = [pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                     VALUES (%s, %s, %s, now()) RETURNING board_id""", name, project_id, owner_id)[0]
+                 for name in ("todo", "doing")]
+    story_ids = [create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name=f"card {i}",
+                                                 board_id=board_ids[0]), context) for i in range(4)]
+
+    def board_order(board_id):
+        return [card["story_id"] for card in json.loads(pg_gateway.read_board(board_id)[1])["stories"]]
+
+    def ranks():
+        return dict(pg_gateway.query("SELECT story_id, board_rank FROM story WHERE story_id = ANY(%s)", story_ids,
+                                     fetch="all"))
+
+    before = ranks()
+    # When
+    move_story(StoryMoveRequest(story_id=story_ids[3], user_id=owner_id, before_id=story_ids[0]), context)
+    # Then
+    assert board_order(board_ids[0]) == [story_ids[3]] + story_ids[:3]
+    assert {story_id: rank for story_id, rank in ranks().items() if before[story_id] != rank}.keys() == {story_ids[3]}
+    # When
+    for _ in range(40):
+        move_story(StoryMoveRequest(story_id=story_ids[2], user_id=owner_id, after_id=story_ids[3]), context)
+        move_story(StoryMoveRequest(story_id=story_ids[3], user_id=owner_id, after_id=story_ids[2]), context)
+    moved = move_story(StoryMoveRequest(story_id=story_ids[1], user_id=owner_id, board_id=board_ids[1]), context)
+    # Then
+    order = board_order(board_ids[0])
+    assert order == [story_ids[2], story_ids[3], story_ids[0]]
+    assert moved["board_id"] == board_ids[1] and moved["board_history"] == [board_ids[0]]
+    assert board_order(board_ids[1]) == [story_ids[1]]
+    # When
+    rebalanced = pg_gateway.rebalance_board_ranks(board_ids[0])
+    # Then
+    assert rebalanced == 3
+    assert board_order(board_ids[0]) == order
+    assert max(len(ranks()[story_id]) for story_id in order) <= 2
+    with pytest.raises(BadRequestError):
+        move_story(StoryMoveRequest(story_id=story_ids[0], user_id=owner_id, after_id=story_ids[1]), context)
+    with pytest.raises(DatabaseQueryError):
+        move_story(StoryMoveRequest(story_id=story_ids[0], user_id=owner_id + 1000), context)
+    # When
+    pg_gateway.query("UPDATE story SET board_rank = NULL WHERE story_id = %s", story_ids[2])
+    unranked = pg_gateway.read_unranked_boards()
+    pg_gateway.rebalance_board_ranks(board_ids[0])
+    # Then
+    assert board_ids[0] in unranked and board_ids[1] not in unranked
+    assert board_order(board_ids[0]) == [story_ids[3], story_ids[0], story_ids[2]]
+    assert board_ids[0] not in pg_gateway.read_unranked_boards()
+
+
+def test_story_hierarchy_closure(context, project):
+    # Given
+    project_id, owner_id = project
+    pg_gateway = context.postgres_gateway
+
+    def create(name, parent=None, estimate=1):
+        return create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name=name,
+                                               parent_story=parent, estimate=estimate), context)
+
+    def closure():
+        return set(pg_gateway.query("""SELECT ancestor_id, descendant_id, depth FROM story_closure
+                                       WHERE descendant_id = ANY(%s)""", [root_id, branch_id, leaf_id, other_id],
+                                    fetch="all"))
+
+    root_id = create("root")
+    branch_id = create("branch", root_id, 2)
+    leaf_id = create("leaf", branch_id, 3)
+    other_id = create("other", root_id, 5)
+    # When
+    update_story(StoryUpdateRequest(story_id=branch_id, user_id=owner_id, fields={"parent_story": other_id}), context)
+    update_story(StoryUpdateRequest(story_id=leaf_id, user_id=owner_id,
+                                    fields={"status": StoryStatus.DONE.value}), context)
+    maintained = closure()
+    pg_gateway.rebuild_story_closure()
+    # Then
+    assert maintained == closure()
+    subtree = read_story_subtree(root_id, owner_id, context)["stories"]
+    assert [(story["story_id"], story["depth"]) for story in subtree] == \
+        [(root_id, 0), (other_id, 1), (branch_id, 2), (leaf_id, 3)]
+    assert [story["story_id"] for story in read_story_ancestors(leaf_id, owner_id, context)["ancestors"]] == \
+        [root_id, other_id, branch_id]
+    rollup = read_story_rollup(other_id, owner_id, context)
+    assert (rollup["estimate"], rollup["remaining"], rollup["stories"]) == (10, 7, {"todo": 2, "done": 1})
+    with pytest.raises(BadRequestError):
+        update_story(StoryUpdateRequest(story_id=other_id, user_id=owner_id, fields={"parent_story": leaf_id}),
+                     context)
+    # When
+    update_story(StoryUpdateRequest(story_id=branch_id, user_id=owner_id, fields={"parent_story": None}), context)
+    # Then
+    assert [story["story_id"] for story in read_story_subtree(root_id, owner_id, context)["stories"]] == \
+        [root_id, other_id]
+    assert read_story_ancestors(leaf_id, owner_id, context)["ancestors"][0]["story_id"] == branch_id
+    with pytest.raises(DatabaseQueryError):
+        read_story_subtree(root_id, owner_id + 1000, context)
+    assert [row for row in pg_gateway.check_story_closure() if row[1] in (root_id, branch_id, leaf_id, other_id)] == []
+
+
+def test_concurrent_reparents_keep_closure(pooled_pg_gateway, redis_gateway, project):
+    # Given
+    project_id, owner_id = project
+    context = Context(postgres_gateway=pooled_pg_gateway, redis_gateway=redis_gateway)
+
+    story_ids = []
+
+    def create(name, parent=None):
+        story_ids.append(create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name=name,
+                                                         parent_story=parent), context))
+        return story_ids[-1]
+
+    def reparent(story_id, parent):
+        try:
+            update_story(StoryUpdateRequest(story_id=story_id, user_id=owner_id, fields={"parent_story": parent}),
+                         context)
+        except DatabaseQueryError:
+            pass  # One of two reparents of overlapping paths may fail on a deadlock.
+
+    # When
+    for _ in range(10):
+        parent_id = create("parent", create("old root"))
+        child_id = create("child", parent_id)
+        new_roots = create("new root"), create("other root")
+        with ThreadPoolExecutor(2) as executor:
+            executor.submit(reparent, parent_id, new_roots[0])
+            executor.submit(reparent, child_id, new_roots[1])
+    # Then
+    assert [row for row in pooled_pg_gateway.check_story_closure() if row[1] in story_ids] == []
+
+
+def test_story_writes_patch_board_read_model(pg_gateway, redis_gateway, project):
+    # Given
+    project_id, owner_id = project
+    context = Context(postgres_gateway=pg_gateway, redis_gateway=redis_gateway,
+                      board_cache=BoardCache(pg_gateway, redis_gateway))
+    board_ids = [pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                     VALUES (%s, %s, %s, now()) RETURNING board_id""", name, project_id, owner_id)[0]
+                 for name in ("todo", "done")]
+    story_id = create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name="card",
+                                               board_id=board_ids[0], assignee=owner_id), context)
+    version, document = read_board(board_ids[0], owner_id, context)
+    # When
+    story = update_story(StoryUpdateRequest(story_id, owner_id, {"board_id": board_ids[1],
+                                                                 "status": StoryStatus.DONE.value}), context)
+    moved_version, moved_from = read_board(board_ids[0], owner_id, context)
+    _, moved_to = read_board(board_ids[1], owner_id, context)
+    # Then
+    assert [(card["story_id"], card["assignee_name"]) for card in json.loads(document)["stories"]] == \
+        [(story_id, "owner")]
+    assert moved_version == version + 1
+    assert json.loads(moved_from)["stories"] == []
+    assert [card["status"] for card in json.loads(moved_to)["stories"]] == [StoryStatus.DONE.value]
+    assert story["board_history"] == [board_ids[0]]
+    assert story["closed_by"] == owner_id
+    # When
+    delete_story(story_id, owner_id, context)
+    # Then
+    assert json.loads(read_board(board_ids[1], owner_id, context)[1])["stories"] == []
+    assert json.loads(read_board(board_ids[1], owner_id, context)[1]) == \
+        dict(json.loads(pg_gateway.read_board(board_ids[1])[1]), version=read_board(board_ids[1], owner_id, context)[0])
+    with pytest.raises(DatabaseQueryError):
+        read_board(board_ids[1], owner_id + 1000, context)
+
+
+def test_board_access_changes_drop_cached_boards(pg_gateway, redis_gateway, project):
+    # Given
+    project_id, owner_id = project
+    board_cache = BoardCache(pg_gateway, redis_gateway)
+    context = Context(postgres_gateway=pg_gateway, redis_gateway=redis_gateway, board_cache=board_cache)
+    board_id = pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                   VALUES ('access', %s, %s, now()) RETURNING board_id""", project_id, owner_id)[0]
+    version, _ = read_board(board_id, owner_id, context)
+    # Let the listener thread LISTEN to the access channel.
+    sleep(0.5)
+    with pytest.raises(DatabaseQueryError):
+        read_board(board_id, owner_id + 1000, context)
+    # When
+    pg_gateway.query("UPDATE project SET project_public = true WHERE project_id = %s", project_id)
+    sleep(0.5)
+    # Then
+    assert read_board(board_id, owner_id + 1000, context)[0] > version
+    pg_gateway.query("UPDATE project SET project_public = false WHERE project_id = %s", project_id)
+    sleep(0.5)
+    with pytest.raises(DatabaseQueryError):
+        read_board(board_id, owner_id + 1000, context)
+
+
+def test_story_writes_are_pushed_to_board_subscribers(pg_gateway, redis_gateway, project):
+    # Given
+    project_id, owner_id = project
+    context = Context(postgres_gateway=pg_gateway, redis_gateway=redis_gateway,
+                      board_events=BoardEventHub(pg_gateway))
+    board_id = pg_gateway.query("""INSERT INTO board(board_name, project_id, admin_id, created_at)
+                                   VALUES ('events', %s, %s, now()) RETURNING board_id""", project_id, owner_id)[0]
+    with subscribe_board(board_id, owner_id, context) as subscription:
+        # Let the listener thread LISTEN to the board channel.
+        sleep(0.5)
+        # When
+        story_id = create_story(StoryCreateRequest(created_by=owner_id, project_id=project_id, story_name="pushed",
+                                                   board_id=board_id), context)
+        event = subscription.get(timeout=5)
+    # Then
+    assert event == (STORY_EVENT, json.dumps({"board_id": board_id, "story_id": story_id}))
+    with pytest.raises(DatabaseQueryError):
+        subscribe_board(board_id, owner_id + 1000, context)
@@ -0,0 +1,23 @@
+"""Shared fixtures of the unit tests."""
+import pytest
+
+from funwithflags.definitions import TokenPolicy
+from funwithflags.entities import HashingService
+from funwithflags.gateways import BoardCache, BoardEventHub, Context, RankRebalancer, UserCache
+
+
+@pytest.fixture
+def make_context(monkeypatch):
+    """Return a factory of `Context` objects over a fake Postgres gateway. The user and board caches, the board events
+    and the rank rebalancer are disabled, whatever config.ini is in the working directory, unless given.
+    """
+    for component in (UserCache, BoardCache, BoardEventHub, RankRebalancer):
+        monkeypatch.setattr(component, "create", staticmethod(lambda *args, **kwargs: None))
+
+    def make(postgres_gateway, redis_gateway=None, hashing_service=None, token_cache=None,
+             token_policy=TokenPolicy.REFRESH, **components):
+        return Context(postgres_gateway=postgres_gateway, redis_gateway=redis_gateway or object(),
+                       hashing_service=hashing_service or HashingService(), token_cache=token_cache or object(),
+                       token_policy=token_policy, **components)
+
+    return make
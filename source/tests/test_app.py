@@ -0,0 +1,46 @@
+"""Module to test the Flask application module."""
+import builtins
+import dis
+import importlib
+import inspect
+import sys
+from types import CodeType
+
+import funwithflags.gateways
+
+
+def global_names(code):
+    """Yield the global names loaded by `code` and the functions nested in it."""
+    for instruction in dis.get_instructions(code):
+        if instruction.opname == "LOAD_GLOBAL":
+            yield instruction.argval
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            yield from global_names(const)
+
+
+def wrapped_functions(function, seen=None):
+    """Yield `function` and the functions it wraps, found in its closure, down the decorators."""
+    seen = set() if seen is None else seen
+    if function in seen:
+        return
+    seen.add(function)
+    yield function
+    for cell in function.__closure__ or ():
+        if inspect.isfunction(cell.cell_contents):
+            yield from wrapped_functions(cell.cell_contents, seen)
+
+
+def test_views_only_use_defined_names(monkeypatch):
+    # Given
+    monkeypatch.setattr(funwithflags.gateways, "Context", object)
+    monkeypatch.delitem(sys.modules, "funwithflags.app", raising=False)
+    app = importlib.import_module("funwithflags.app")
+    monkeypatch.delitem(sys.modules, "funwithflags.app")
+    # When
+    undefined = {(endpoint, name) for endpoint, view in app.app.view_functions.items()
+                 for function in wrapped_functions(view) if function.__module__ == app.__name__
+                 for name in global_names(function.__code__)
+                 if name not in function.__globals__ and not hasattr(builtins, name)}
+    # Then
+    assert undefined == set()
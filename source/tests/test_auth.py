@@ -0,0 +1,56 @@
+"""Module to test authentication utilities."""
+import bcrypt
+import pytest
+
+from funwithflags.entities import HashingService, calibrate_rounds, generate_salt_hash_password, get_hash_rounds
+
+
+@pytest.mark.parametrize(
+    "salt,expected",
+    [(b"$2b$12$abcdefghijklmnopqrstuu", 12),
+     (b"$2b$04$abcdefghijklmnopqrstuu", 4),
+     (memoryview(b"$2a$10$abcdefghijklmnopqrstuu"), 10)]
+)
+def test_get_hash_rounds(salt, expected):
+    # When & Then
+    assert expected == get_hash_rounds(salt)
+
+
+@pytest.mark.parametrize("salt", [b"", b"123", b"$2b$xx$abc"])
+def test_get_hash_rounds_failure(salt):
+    # When & Then
+    with pytest.raises(ValueError):
+        get_hash_rounds(salt)
+
+
+def test_generate_salt_hash_password_with_rounds():
+    # When
+    hashed_password, salt = generate_salt_hash_password("AbC123@", rounds=5)
+    # Then
+    assert get_hash_rounds(salt) == 5
+    assert bcrypt.checkpw(b"AbC123@", hashed_password)
+
+
+@pytest.mark.parametrize(
+    "target_seconds,expected",
+    [(0, 4), (60, 5)]
+)
+def test_calibrate_rounds(target_seconds, expected):
+    # When
+    rounds, timings = calibrate_rounds(target_seconds, min_rounds=4, max_rounds=5, samples=1)
+    # Then
+    assert rounds == expected
+    assert timings[0][0] == 4
+
+
+@pytest.mark.parametrize(
+    "rounds,salt,expected",
+    [(None, b"$2b$04$abcdefghijklmnopqrstuu", False),
+     (4, b"$2b$04$abcdefghijklmnopqrstuu", False),
+     (12, b"$2b$04$abcdefghijklmnopqrstuu", True),
+     (4, b"$2b$12$abcdefghijklmnopqrstuu", False),
+     (12, b"123", False)]
+)
+def test_needs_rehash(rounds, salt, expected):
+    # When & Then
+    assert expected == HashingService(rounds=rounds).needs_rehash(salt)
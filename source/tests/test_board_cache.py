@@ -0,0 +1,208 @@
+"""Module to test the board read model cache."""
+import json
+
+import pytest
+
+from funwithflags.definitions import DatabaseQueryError
+from funwithflags.gateways import BoardCache
+
+READER = 7
+
+
+class FakeBoardGateway:
+    def __init__(self):
+        self.cards = {1: {"story_id": 1, "story_name": "first", "assignee_name": "nick", "board_rank": "V"}}
+        self.board_reads = 0
+        self.listeners = []
+        self.access = (False, [3, READER])
+
+    def add_story_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def read_board(self, board_id):
+        self.board_reads += 1
+        if board_id != 1:
+            return None
+        stories = sorted(self.cards.values(), key=lambda card: (card["board_rank"], card["story_id"]))
+        return 10, json.dumps({"board_id": board_id, "project_id": 10, "stories": stories})
+
+    def read_project_access(self, project_id):
+        return self.access if project_id == 10 else None
+
+    def read_board_story(self, board_id, story_id):
+        card = self.cards.get(story_id)
+        return json.dumps(card) if card is not None and board_id == 1 else None
+
+    def write(self, story_id, card):
+        if card is None:
+            self.cards.pop(story_id, None)
+        else:
+            self.cards[story_id] = card
+        for listener in self.listeners:
+            listener(1, story_id)
+
+
+class FakeRedisGateway:
+    def __init__(self):
+        self.values = {}
+        self.gets = 0
+        self.before_set = None
+
+    def get(self, name):
+        self.gets += 1
+        return self.values.get(name)
+
+    def scan(self, match):
+        return [name for name in list(self.values) if name.startswith(match.rstrip("*"))]
+
+    def delete(self, *names):
+        for name in names:
+            self.values.pop(name, None)
+
+    def incr(self, name):
+        self.values[name] = str(int(self.values.get(name, 0)) + 1)
+
+    def compare_and_set(self, names, update, retries=10):
+        for _ in range(retries):
+            watched = [self.values.get(name) for name in names]
+            entries = update(list(watched))
+            if self.before_set:
+                before_set, self.before_set = self.before_set, None
+                before_set()
+            if [self.values.get(name) for name in names] != watched:
+                continue
+            self.values.update({name: value for name, (value, expire) in entries.items()})
+            return entries
+        return None
+
+
+@pytest.fixture
+def board_cache():
+    board_cache = BoardCache(FakeBoardGateway(), FakeRedisGateway())
+    # Access notifications are handled by hand instead of by the listener thread.
+    board_cache._listener = object()
+    return board_cache
+
+
+def stories(document):
+    return [(story["story_id"], story["story_name"]) for story in json.loads(document)["stories"]]
+
+
+def test_read_board_is_cached(board_cache):
+    # When
+    boards = [board_cache.read_board(1, READER) for _ in range(3)]
+    # Then
+    assert all(board == boards[0] for board in boards)
+    version, project_id, readable, document = boards[0]
+    assert (version, project_id, readable) == (0, 10, True)
+    assert json.loads(document)["version"] == 0
+    assert stories(document) == [(1, "first")]
+    assert board_cache._postgres_gateway.board_reads == 1
+
+
+def test_missing_board(board_cache):
+    with pytest.raises(DatabaseQueryError):
+        board_cache.read_board(2, READER)
+
+
+def test_story_writes_patch_board(board_cache):
+    # Given
+    gateway = board_cache._postgres_gateway
+    board_cache.read_board(1, READER)
+    # When
+    gateway.write(2, {"story_id": 2, "story_name": "second", "board_rank": "k"})
+    gateway.write(1, {"story_id": 1, "story_name": "renamed", "board_rank": "V"})
+    version, _, _, document = board_cache.read_board(1, READER)
+    # Then
+    assert version == json.loads(document)["version"] == 2
+    assert stories(document) == [(1, "renamed"), (2, "second")]
+    # When
+    gateway.write(1, None)
+    version, _, _, document = board_cache.read_board(1, READER)
+    # Then
+    assert version == 3
+    assert stories(document) == [(2, "second")]
+    assert gateway.board_reads == 1
+
+
+def test_write_to_uncached_board_bumps_version(board_cache):
+    # Given
+    board_cache._postgres_gateway.write(2, {"story_id": 2, "story_name": "second", "board_rank": "k"})
+    # When
+    version, _, _, document = board_cache.read_board(1, READER)
+    # Then
+    assert version == 1
+    assert stories(document) == [(1, "first"), (2, "second")]
+
+
+def test_build_racing_with_write_is_not_stale(board_cache):
+    # Given
+    gateway, redis_gateway = board_cache._postgres_gateway, board_cache._redis_gateway
+    redis_gateway.before_set = lambda: gateway.write(2, {"story_id": 2, "story_name": "second", "board_rank": "k"})
+    # When
+    board_cache.read_board(1, READER)
+    version, _, _, document = board_cache.read_board(1, READER)
+    # Then
+    assert version == 1
+    assert stories(document) == [(1, "first"), (2, "second")]
+
+
+def test_patch_gives_up_drops_board(board_cache):
+    # Given
+    board_cache.read_board(1, READER)
+    redis_gateway = board_cache._redis_gateway
+    redis_gateway.compare_and_set = lambda names, update, retries=10: None
+    # When
+    board_cache.refresh_story(1, 1)
+    # Then
+    assert "board:1" not in redis_gateway.values
+    assert redis_gateway.values["board-version:1"] == "1"
+
+
+def test_patch_keeps_rank_order(board_cache):
+    # Given
+    gateway = board_cache._postgres_gateway
+    board_cache.read_board(1, READER)
+    # When
+    gateway.write(2, {"story_id": 2, "story_name": "second", "board_rank": "G"})
+    gateway.write(3, {"story_id": 3, "story_name": "unranked", "board_rank": None})
+    gateway.write(4, {"story_id": 4, "story_name": "last", "board_rank": "k"})
+    _, _, _, document = board_cache.read_board(1, READER)
+    # Then
+    assert [story_id for story_id, _ in stories(document)] == [2, 1, 4, 3]
+
+
+def test_board_write_drops_board(board_cache):
+    # Given
+    board_cache.read_board(1, READER)
+    # When
+    board_cache.refresh_story(1, None)
+    version, _, _, document = board_cache.read_board(1, READER)
+    # Then
+    assert version == 1
+    assert board_cache._postgres_gateway.board_reads == 2
+
+
+def test_access_is_read_with_the_board(board_cache):
+    # Given
+    board_cache.read_board(1, READER)
+    redis_gateway = board_cache._redis_gateway
+    # When
+    readable = [board_cache.read_board(1, user_id)[2] for user_id in (READER, 3, 70)]
+    # Then
+    assert readable == [True, True, False]
+    assert redis_gateway.gets == 4
+    # When
+    board_cache._postgres_gateway.access = (True, [3])
+    board_cache._drop_all()
+    # Then
+    assert board_cache.read_board(1, 70)[2] is True
+    assert board_cache._postgres_gateway.board_reads == 2
+
+
+def test_missing_project_is_missing_board(board_cache):
+    # Given
+    board_cache._postgres_gateway.access = None
+    # When, Then
+    with pytest.raises(DatabaseQueryError):
+        board_cache.read_board(1, READER)
@@ -0,0 +1,70 @@
+"""Module to test the board event fan-out."""
+import json
+
+import pytest
+
+from funwithflags.gateways import RESYNC_EVENT, STORY_EVENT, BoardEventHub
+
+
+class FakeNotifyGateway:
+    def __init__(self):
+        self.listeners = []
+        self.notifications = []
+
+    def add_story_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, channel, payload):
+        self.notifications.append((channel, payload))
+
+
+@pytest.fixture
+def hub():
+    hub = BoardEventHub(FakeNotifyGateway(), max_events=2)
+    # Notifications are dispatched by hand instead of by the listener thread.
+    hub._listener = object()
+    return hub
+
+
+def test_story_write_is_published(hub):
+    # When
+    for listener in hub._postgres_gateway.listeners:
+        listener(1, 42)
+    # Then
+    assert hub._postgres_gateway.notifications == [("board_1", json.dumps({"board_id": 1, "story_id": 42}))]
+    assert hub.stats().published == 1
+
+
+def test_events_are_fanned_out_to_board_subscribers(hub):
+    # Given
+    subscriptions = [hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)]
+    # When
+    hub._dispatch("board_1", '{"board_id": 1, "story_id": 42}')
+    # Then
+    assert [subscription.get(timeout=0) for subscription in subscriptions] == \
+        [(STORY_EVENT, '{"board_id": 1, "story_id": 42}')] * 2 + [None]
+    stats = hub.stats()
+    assert (stats.subscribers, stats.channels, stats.delivered) == (3, 2, 2)
+
+
+def test_slow_subscriber_gets_resync(hub):
+    # Given
+    subscription = hub.subscribe(1)
+    # When
+    for story_id in range(3):
+        hub._dispatch("board_1", json.dumps({"board_id": 1, "story_id": story_id}))
+    # Then
+    assert subscription.get(timeout=0) == (RESYNC_EVENT, json.dumps({"board_id": 1}))
+    assert subscription.get(timeout=0) is None
+    assert hub.stats().dropped == 1
+
+
+def test_closed_subscription_leaves_channel(hub):
+    # Given
+    with hub.subscribe(1) as subscription:
+        hub.subscribe(2).close()
+    # When
+    hub._dispatch("board_1", "{}")
+    # Then
+    assert subscription.get(timeout=0) is None
+    assert (hub.stats().subscribers, hub.stats().channels) == (0, 0)
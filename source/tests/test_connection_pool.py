@@ -0,0 +1,117 @@
+"""Module to test the connection pool."""
+import threading
+from time import monotonic
+
+import pytest
+
+from funwithflags.definitions import ServiceUnavailableError
+from funwithflags.gateways import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(min_size=1, max_size=2, timeout=0.05):
+    return ConnectionPool(
+        connect=lambda deadline: FakeConnection(),
+        validate=lambda conn: not conn.closed,
+        close=lambda conn: conn.close(),
+        min_size=min_size,
+        max_size=max_size,
+        timeout=timeout,
+    )
+
+
+@pytest.mark.parametrize("min_size,max_size", [(-1, 1), (0, 0), (3, 2)])
+def test_invalid_pool_size(min_size, max_size):
+    with pytest.raises(ValueError):
+        make_pool(min_size=min_size, max_size=max_size)
+
+
+def test_checkout_reuses_idle_connection():
+    # Given
+    pool = make_pool()
+    # When
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        metrics = pool.metrics()
+    # Then
+    assert first is second
+    assert metrics.size == 1
+    assert metrics.in_use == 1
+    assert pool.metrics().checkouts == 2
+
+
+def test_checkout_timeout_when_exhausted():
+    # Given
+    pool = make_pool(max_size=2)
+    conns = [pool.getconn(), pool.getconn()]
+    # When & Then
+    with pytest.raises(ServiceUnavailableError):
+        pool.getconn()
+    assert pool.metrics().timeouts == 1
+    for conn in conns:
+        pool.putconn(conn)
+
+
+def test_checkout_bounds_connect_by_its_deadline(monkeypatch):
+    # Given
+    deadlines = []
+    pool = make_pool(min_size=0, timeout=3)
+    monkeypatch.setattr(pool, "_connect", lambda deadline: deadlines.append(deadline) or FakeConnection())
+    # When
+    pool.getconn()
+    # Then
+    assert len(deadlines) == 1
+    assert 0 < deadlines[0] - monotonic() <= 3
+
+
+def test_waiting_checkout_is_served_on_return():
+    # Given
+    pool = make_pool(max_size=1, timeout=2)
+    conn = pool.getconn()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.getconn()))
+    # When
+    waiter.start()
+    while pool.metrics().waiting == 0:
+        pass
+    pool.putconn(conn)
+    waiter.join()
+    # Then
+    assert result == [conn]
+    assert pool.metrics().max_wait_time > 0
+
+
+def test_dead_connection_is_replaced_on_checkout():
+    # Given
+    pool = make_pool()
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.close()
+    # When
+    new_conn = pool.getconn()
+    # Then
+    assert new_conn is not conn
+    assert not new_conn.closed
+    assert pool.metrics().discarded == 1
+    assert pool.metrics().size == 1
+
+
+def test_broken_connection_is_not_reused():
+    # Given
+    pool = make_pool()
+    # When
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.close()
+            raise RuntimeError
+    # Then
+    assert pool.metrics().size == 0
+    assert pool.getconn() is not conn
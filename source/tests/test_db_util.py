@@ -1,11 +1,14 @@
 import pytest
 import tempfile
+import threading
 
+from funwithflags.definitions import BadRequestError, ServiceUnavailableError
 from funwithflags.entities import (
     generate_update_params,
     read_config_file,
 )
 from funwithflags.gateways import PostgresGateway
+from funwithflags.gateways import db_gateway
 
 
 DATABASE_CONFIG = """[postgresql]
@@ -78,3 +81,80 @@ def test_generate_update_params(uid, kwargs, expected):
 def test_read_user_query(user_id, username, expected):
     # When & Then
     assert expected == PostgresGateway._read_user_query(user_id, username)
+
+
+@pytest.mark.parametrize(
+    "columns,expected",
+    [(None, ("user_id", "username", "nickname", "password", "salt", "email", "created_at")),
+     (["email", "username"], ("user_id", "username", "email")),
+     (["user_id"], ("user_id",))]
+)
+def test_user_columns(columns, expected):
+    # When & Then
+    assert expected == PostgresGateway._user_columns(columns)
+
+
+def test_user_columns_failure():
+    # When & Then
+    with pytest.raises(BadRequestError):
+        PostgresGateway._user_columns(["username", "password; DROP TABLE users"])
+
+
+def test_read_user_query_with_columns():
+    # When & Then
+    assert ("SELECT user_id, nickname FROM users WHERE user_id = %s", 1) == \
+        PostgresGateway._read_user_query(1, None, ("user_id", "nickname"))
+
+
+def test_connect_stops_retrying_at_deadline(monkeypatch):
+    # Given
+    clock = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    def connect(*args, **kwargs):
+        raise OSError("could not connect to server")
+
+    gateway = PostgresGateway.__new__(PostgresGateway)
+    gateway._active = False
+    gateway._conn_str = "host=dbpostgres"
+    gateway._conn_retry_limit = 20
+    gateway._conn_retry_interval = 2
+    monkeypatch.setattr(db_gateway, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(db_gateway, "sleep", sleep)
+    monkeypatch.setattr(db_gateway.psycopg2, "connect", connect)
+    # When & Then
+    with pytest.raises(ServiceUnavailableError):
+        gateway._connect(deadline=105.0)
+    assert sleeps == [2, 2]
+
+
+def test_unpooled_streams_share_a_bounded_number_of_connections(monkeypatch):
+    # Given
+    class FakeConnection:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    conns = []
+    gateway = PostgresGateway.__new__(PostgresGateway)
+    gateway._active = False
+    gateway._pool = None
+    gateway._local = threading.local()
+    gateway._stream_slots = threading.BoundedSemaphore(1)
+    gateway._stream_timeout = 0.01
+    gateway._cursor_itersize = 2000
+    monkeypatch.setattr(gateway, "_connect", lambda deadline: conns.append(FakeConnection()) or conns[-1])
+    monkeypatch.setattr(gateway, "_cursor_rows", lambda conn, query, args, itersize: iter([(1,), (2,)]))
+    first = gateway.query_iter("SELECT 1")
+    next(first)
+    # When & Then
+    with pytest.raises(ServiceUnavailableError):
+        next(gateway.query_iter("SELECT 1"))
+    first.close()
+    assert list(gateway.query_iter("SELECT 1")) == [(1,), (2,)]
+    assert [conn.closed for conn in conns] == [True, True]
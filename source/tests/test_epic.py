@@ -0,0 +1,44 @@
+"""Module to test the epic use cases."""
+import pytest
+
+from funwithflags.definitions import BadRequestError, DatabaseQueryError
+from funwithflags.use_cases import read_epic_progress
+
+
+class FakeEpicGateway:
+    """Epic 1 of project 1, readable by user 1, has a story in review and a done one, epic 2 has none."""
+
+    def read_epic_project(self, epic_id):
+        return 1 if epic_id in (1, 2) else None
+
+    def can_read_project(self, project_id, user_id):
+        return (project_id, user_id) == (1, 1)
+
+    def read_rollup(self, key, key_id):
+        return [(2, 1, 5), (3, 1, 8)] if (key, key_id) == ("epic", 1) else []
+
+
+@pytest.fixture
+def context(make_context):
+    return make_context(FakeEpicGateway())
+
+
+def test_read_epic_progress(context):
+    # When
+    progress = read_epic_progress(1, 1, context)
+    empty = read_epic_progress(2, 1, context)
+    # Then
+    assert progress == {"epic_id": 1, "estimate": 13, "remaining": 5, "estimates": {"in_review": 5, "done": 8},
+                        "stories": {"in_review": 1, "done": 1}}
+    assert empty == {"epic_id": 2, "estimate": 0, "remaining": 0, "estimates": {}, "stories": {}}
+
+
+@pytest.mark.parametrize("epic_id,user_id,exception", [
+    (0, 1, BadRequestError),
+    (3, 1, DatabaseQueryError),
+    (1, 2, DatabaseQueryError),
+])
+def test_read_epic_progress_failure(context, epic_id, user_id, exception):
+    # When & Then
+    with pytest.raises(exception):
+        read_epic_progress(epic_id, user_id, context)
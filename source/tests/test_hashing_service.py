@@ -0,0 +1,55 @@
+"""Module to test the password hashing service."""
+import threading
+
+import bcrypt
+import pytest
+
+from funwithflags.definitions import ServiceUnavailableError
+from funwithflags.entities import HashingService, hash_password_with_salt
+
+
+SALT = bcrypt.gensalt(4)
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_hash_password(workers):
+    # Given
+    service = HashingService(workers=workers)
+    # When
+    result = service.hash_password("AbC123@", SALT)
+    service.shutdown()
+    # Then
+    assert result == hash_password_with_salt("AbC123@", SALT)
+    assert service.stats().calls == 1
+    assert service.stats().pending == 0
+
+
+def test_hash_password_rejected_when_queue_is_full(monkeypatch):
+    # Given
+    service = HashingService(workers=0, max_pending=1, retry_after=3)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_hashpw(password, salt):
+        started.set()
+        release.wait()
+        return b"hashed"
+
+    monkeypatch.setattr(bcrypt, "hashpw", blocking_hashpw)
+    worker = threading.Thread(target=service.hash_password, args=("AbC123@", SALT))
+    worker.start()
+    started.wait()
+    # When & Then
+    with pytest.raises(ServiceUnavailableError) as exc:
+        service.hash_password("AbC123@", SALT)
+    release.set()
+    worker.join()
+    assert exc.value.retry_after == 3
+    assert service.stats().rejected == 1
+    assert service.hash_password("AbC123@", SALT) == b"hashed"
+
+
+def test_create_without_config_section_hashes_inline():
+    # When
+    service = HashingService.create("no_such_file.ini")
+    # Then
+    assert service.hash_password("AbC123@", SALT) == hash_password_with_salt("AbC123@", SALT)
@@ -0,0 +1,22 @@
+"""Module to test keyset pagination cursors."""
+from datetime import datetime
+
+import pytest
+
+from funwithflags.entities import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    # Given
+    created_at = datetime(2020, 3, 22, 23, 55, 53, 813500)
+    # When
+    cursor = encode_cursor(created_at, 42)
+    # Then
+    assert decode_cursor(cursor, datetime, int) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", encode_cursor(1), encode_cursor("yesterday", 1),
+                                    encode_cursor(None, 1)])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, datetime, int)
@@ -0,0 +1,183 @@
+"""Module to test the project use cases."""
+from datetime import datetime, timedelta
+import io
+
+import pytest
+
+from funwithflags.definitions import (BadRequestError, DatabaseQueryError, FlowMetricsRequest, Project,
+                                      ProjectCreateRequest, ProjectExportRequest, ProjectListRequest)
+from funwithflags.gateways import STORY_EXPORT_COLUMNS
+from funwithflags.use_cases import (create_project, export_project, export_project_rows, list_projects,
+                                   read_flow_metrics, read_project_tree)
+
+
+class FakeProjectGateway:
+    def __init__(self, story_ids=(), projects=()):
+        self.story_ids = story_ids
+        self.projects = list(projects)
+        self.copies = []
+
+    def is_team_member(self, team_id, user_id):
+        return team_id == 1
+
+    def read_project_tree(self, project_id, user_id):
+        return '{"project_id": 1, "boards": [], "epics": [], "sprints": []}' if (project_id, user_id) == (1, 1) else None
+
+    def create_project(self, project):
+        self.projects.append(project)
+        return len(self.projects)
+
+    def list_projects(self, user_id=None, team_id=None, before=None, limit=20):
+        projects = sorted((project for project in self.projects if (project.team_id or None) == team_id
+                           and (team_id is not None or project.user_id == user_id)),
+                          key=lambda project: (project.created_at, project.project_id), reverse=True)
+        return [project for project in projects
+                if before is None or (project.created_at, project.project_id) < before][:limit]
+
+    def can_read_project(self, project_id, user_id):
+        return project_id == 1 and user_id == 1
+
+    def read_flow_times(self, project_id, since, until):
+        return 2, 7200.0, 7200.0, 9000.0, 3600.0, 3600.0, 5400.0
+
+    def read_wip(self, project_id):
+        return [(7, 3, 600.0)]
+
+    def iter_project_export(self, project_id, fmt="ndjson", after_story_id=0):
+        return iter((story_id,) for story_id in self.story_ids if story_id > after_story_id)
+
+    def next_story_bound(self, project_id, after_story_id, batch_size):
+        batch = [story_id for story_id in self.story_ids if story_id > after_story_id][:batch_size]
+        return batch[-1] if batch else None
+
+    def copy_project_records(self, project_id, out):
+        out.write('{"kind": "project"}\n')
+        return 1
+
+    def copy_project_stories(self, project_id, after_story_id, upper_story_id, out, fmt="ndjson", header=False):
+        self.copies.append((after_story_id, upper_story_id, header))
+        stories = [story_id for story_id in self.story_ids if after_story_id < story_id <= upper_story_id]
+        out.writelines(f"{story_id}\n" for story_id in stories)
+        return len(stories)
+
+
+@pytest.mark.parametrize(
+    "fmt,after,expected_rows,expected_copies",
+    [("ndjson", 0, 8, [(0, 4, False), (4, 8, False), (8, 9, False)]),
+     ("csv", 0, 7, [(0, 4, True), (4, 8, False), (8, 9, False)]),
+     ("ndjson", 4, 4, [(4, 8, False), (8, 9, False)]),
+     ("csv", 9, 0, [])]
+)
+def test_export_project_in_batches(fmt, after, expected_rows, expected_copies, make_context):
+    # Given
+    context = make_context(FakeProjectGateway([1, 2, 4, 5, 7, 8, 9]))
+    out, progress = io.StringIO(), []
+    # When
+    rows = export_project(ProjectExportRequest(project_id=1, fmt=fmt, after=after), context, out, batch_size=3,
+                          progress=lambda rows, last, elapsed: progress.append((rows, last)))
+    # Then
+    assert rows == expected_rows
+    assert context.postgres_gateway.copies == expected_copies
+    assert [last for _, last in progress] == [upper for _, upper, _ in expected_copies]
+
+
+def test_export_project_header_without_stories(make_context):
+    # Given
+    context = make_context(FakeProjectGateway([]))
+    # When
+    rows = export_project(ProjectExportRequest(project_id=1, fmt="csv"), context, io.StringIO())
+    # Then
+    assert rows == 0
+    assert context.postgres_gateway.copies == [(0, 0, True)]
+
+
+@pytest.mark.parametrize(
+    "after,expected",
+    [
+        (0, [STORY_EXPORT_COLUMNS, (1,), (2,), (3,)]),
+        (1, [(2,), (3,)]),
+    ],
+)
+def test_export_project_rows(after, expected, make_context):
+    # Given
+    context = make_context(FakeProjectGateway([1, 2, 3]))
+    # When
+    rows = list(export_project_rows(ProjectExportRequest(project_id=1, fmt="csv", after=after), 1, context))
+    # Then
+    assert rows == expected
+
+
+@pytest.mark.parametrize("project_id,user_id", [(1, 2), (2, 1)])
+def test_export_project_rows_not_readable(project_id, user_id, make_context):
+    with pytest.raises(DatabaseQueryError):
+        export_project_rows(ProjectExportRequest(project_id=project_id), user_id, make_context(FakeProjectGateway([1])))
+
+
+def test_list_projects_pages(make_context):
+    # Given
+    start = datetime(2020, 1, 1)
+    projects = [Project(project_id=i, user_id=1, created_at=start + timedelta(days=i // 2)) for i in range(1, 8)]
+    context = make_context(FakeProjectGateway(projects=projects + [Project(project_id=8, user_id=2, created_at=start)]))
+    pages, cursor = [], None
+    # When
+    while True:
+        page, cursor = list_projects(ProjectListRequest(user_id=1, limit=3, cursor=cursor), context)
+        pages.append([project["project_id"] for project in page])
+        if cursor is None:
+            break
+    # Then
+    assert pages == [[7, 6, 5], [4, 3, 2], [1]]
+
+
+@pytest.mark.parametrize("kwargs,exception",
+                         [({"cursor": "invalid"}, BadRequestError), ({"team_id": 2}, DatabaseQueryError)])
+def test_list_projects_failure(kwargs, exception, make_context):
+    with pytest.raises(exception):
+        list_projects(ProjectListRequest(user_id=1, **kwargs), make_context(FakeProjectGateway()))
+
+
+@pytest.mark.parametrize("team_id,expected_owner", [(None, (1, None)), (1, (None, 1))])
+def test_create_project(team_id, expected_owner, make_context):
+    # Given
+    context = make_context(FakeProjectGateway())
+    request = ProjectCreateRequest(admin_id=1, project_name="project", team_id=team_id,
+                                   project_type="team" if team_id else "personal")
+    # When
+    project_id = create_project(request, context)
+    # Then
+    project = context.postgres_gateway.projects[project_id - 1]
+    assert (project.user_id, project.team_id) == expected_owner
+    assert project.admin_id == 1
+
+
+def test_create_project_not_team_member(make_context):
+    with pytest.raises(BadRequestError):
+        create_project(ProjectCreateRequest(admin_id=1, project_name="project", project_type="team", team_id=2),
+                       make_context(FakeProjectGateway()))
+
+
+def test_read_project_tree(make_context):
+    # Given
+    context = make_context(FakeProjectGateway())
+    # When & Then
+    assert read_project_tree(1, 1, context).startswith('{"project_id": 1')
+    with pytest.raises(DatabaseQueryError):
+        read_project_tree(1, 2, context)
+    with pytest.raises(BadRequestError):
+        read_project_tree(0, 1, context)
+
+
+def test_read_flow_metrics(make_context):
+    # Given
+    context = make_context(FakeProjectGateway())
+    until = datetime(2020, 3, 31)
+    # When
+    flow = read_flow_metrics(FlowMetricsRequest(project_id=1, user_id=1, until=until), context)
+    # Then
+    assert (flow["since"], flow["until"]) == ("2020-03-01 00:00:00", "2020-03-31 00:00:00")
+    assert flow["throughput"] == 2
+    assert flow["lead_time"] == {"mean": 7200.0, "p50": 7200.0, "p85": 9000.0}
+    assert flow["cycle_time"] == {"mean": 3600.0, "p50": 3600.0, "p85": 5400.0}
+    assert flow["wip"] == [{"board_id": 7, "stories": 3, "mean_age": 600.0}]
+    with pytest.raises(DatabaseQueryError):
+        read_flow_metrics(FlowMetricsRequest(project_id=1, user_id=2), context)
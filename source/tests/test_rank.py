@@ -0,0 +1,55 @@
+"""Module to test lexicographic ranks."""
+import random
+
+import pytest
+
+from funwithflags.entities import rank_between, spread_ranks
+
+
+@pytest.mark.parametrize("before,after,expected", [
+    (None, None, "V"),
+    ("V", None, "l"),
+    (None, "V", "G"),
+    ("A", "B", "AV"),
+    ("Az", "B", "AzV"),
+    ("A1", "A2", "A1V"),
+    ("A", "A01", "A00V"),
+])
+def test_rank_between(before, after, expected):
+    # When
+    rank = rank_between(before, after, jitter=0)
+    # Then
+    assert rank == expected
+    assert (before or "") < rank and (after is None or rank < after)
+
+
+def test_rank_between_keeps_order_of_random_moves():
+    # Given
+    random.seed(7)
+    ranks = []
+    # When
+    for _ in range(2000):
+        position = random.randint(0, len(ranks))
+        before = ranks[position - 1] if position > 0 else None
+        after = ranks[position] if position < len(ranks) else None
+        ranks.insert(position, rank_between(before, after))
+    # Then
+    assert ranks == sorted(ranks)
+    assert len(set(ranks)) == len(ranks)
+
+
+@pytest.mark.parametrize("before,after", [("B", "A"), ("A", "A"), ("A0", None), (None, ""), ("A-", None)])
+def test_rank_between_failure(before, after):
+    with pytest.raises(ValueError):
+        # When
+        rank_between(before, after)
+
+
+@pytest.mark.parametrize("count,width", [(0, 1), (1, 1), (61, 2), (3843, 3)])
+def test_spread_ranks(count, width):
+    # When
+    ranks = spread_ranks(count)
+    # Then
+    assert len(ranks) == count
+    assert ranks == sorted(set(ranks))
+    assert all(0 < len(rank) <= width and not rank.endswith("0") for rank in ranks)
@@ -0,0 +1,36 @@
+"""Module to test the background rebalancing of story ranks."""
+import threading
+
+from funwithflags.gateways import RankRebalancer
+
+
+class FakeRankGateway:
+    def __init__(self):
+        self.rebalanced = []
+        self.done = threading.Event()
+
+    def rebalance_board_ranks(self, board_id):
+        self.rebalanced.append(board_id)
+        self.done.set()
+        return 3
+
+
+def test_long_rank_queues_rebalance():
+    # Given
+    gateway = FakeRankGateway()
+    rebalancer = RankRebalancer(gateway, max_length=4)
+    # When & Then
+    assert not rebalancer.check(7, "VVVV")
+    assert rebalancer.check(7, "VVVVV")
+    assert gateway.done.wait(5)
+    assert gateway.rebalanced == [7]
+
+
+def test_queued_board_is_rebalanced_once():
+    # Given
+    gateway = FakeRankGateway()
+    rebalancer = RankRebalancer(gateway, max_length=4)
+    rebalancer._queued.add(7)
+    # When & Then
+    assert not rebalancer.check(7, "VVVVV")
+    assert rebalancer._boards.empty()
@@ -1,9 +1,22 @@
 """Module to test requests."""
+from datetime import datetime, timedelta
+
 import pytest
 
 from funwithflags.definitions import (
     BadRequestError,
     RegisterRequest,
+    MAX_BULK_USER_IDS,
+    ProjectCreateRequest,
+    ProjectExportRequest,
+    ProjectListRequest,
+    FlowMetricsRequest,
+    StoryCreateRequest,
+    StoryMoveRequest,
+    StorySearchRequest,
+    StoryUpdateRequest,
+    UserReadRequest,
+    UsersReadRequest,
     UserUpdateRequest,
     validate_email,
     validate_password,
@@ -92,3 +105,126 @@ def test_update_user_request_failure(user_id, fields, protected, exception, mess
         _ = UserUpdateRequest(user_id=user_id, fields=fields, protected=protected)
     # Then
     assert message in str(exc)
+
+
+@pytest.mark.parametrize(
+    "fields,expected",
+    [(None, ["userid", "username", "nickname", "email", "created_at"]),
+     (["username", "email"], ["username", "email"])]
+)
+def test_user_read_request(fields, expected):
+    # When
+    request = UserReadRequest(user_id=1, fields=fields)
+    # Then
+    assert expected == request.fields
+
+
+@pytest.mark.parametrize("fields", [[], [""], ["username", "password"]])
+def test_user_read_request_failure(fields):
+    with pytest.raises(BadRequestError) as exc:
+        # When
+        _ = UserReadRequest(user_id=1, fields=fields)
+    # Then
+    assert "Invalid fields" in str(exc)
+
+
+@pytest.mark.parametrize("user_ids", [[], [1, 0], list(range(1, MAX_BULK_USER_IDS + 2))])
+def test_users_read_request_failure(user_ids):
+    with pytest.raises(BadRequestError) as exc:
+        # When
+        _ = UsersReadRequest(user_ids=user_ids)
+    # Then
+    assert "Invalid user ids" in str(exc)
+
+
+def test_users_read_request_fields():
+    # When
+    request = UsersReadRequest(user_ids=[3, 1], fields=["nickname"])
+    # Then
+    assert (request.user_ids, request.fields) == ([3, 1], ["nickname"])
+    with pytest.raises(BadRequestError):
+        UsersReadRequest(user_ids=[1], fields=["password"])
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"project_id": 0}, {"project_id": 1, "after": -1}, {"project_id": 1, "fmt": "xml"}]
+)
+def test_project_export_request_failure(kwargs):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = ProjectExportRequest(**kwargs)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"project_name": ""}, {"project_name": "p" * 129}, {"project_name": "p", "project_type": "shared"},
+     {"project_name": "p", "project_type": "team"}, {"project_name": "p", "team_id": 1},
+     {"project_name": "p", "project_public": "yes"}]
+)
+def test_project_create_request_failure(kwargs):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = ProjectCreateRequest(admin_id=1, **kwargs)
+
+
+@pytest.mark.parametrize("kwargs", [{"limit": 0}, {"limit": 101}, {"team_id": 0}])
+def test_project_list_request_failure(kwargs):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = ProjectListRequest(user_id=1, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"project_id": 0}, {"story_name": ""}, {"story_name": None}, {"status": 4}, {"story_type": -1},
+     {"board_id": 0}, {"assignee": "1"}, {"estimate": -1}, {"description": 1}, {"sprint_id": -1}]
+)
+def test_story_create_request_failure(kwargs):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = StoryCreateRequest(**dict({"created_by": 1, "project_id": 1, "story_name": "story"}, **kwargs))
+
+
+@pytest.mark.parametrize(
+    "story_id,fields",
+    [(0, {"status": 1}), (1, {}), (1, {"project_id": 2}), (1, {"closed_at": None}), (1, {"board_id": True})]
+)
+def test_story_update_request_failure(story_id, fields):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = StoryUpdateRequest(story_id=story_id, user_id=1, fields=fields)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"story_id": 0}, {"board_id": 0}, {"board_id": True}, {"after_id": "2"}, {"before_id": -1},
+     {"after_id": 2, "before_id": 3}, {"after_id": 1}, {"before_id": 1}]
+)
+def test_story_move_request_failure(kwargs):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = StoryMoveRequest(**dict({"story_id": 1, "user_id": 1}, **kwargs))
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"project_id": 0}, {"text": ""}, {"text": "  "}, {"text": None}, {"text": "x" * 257}, {"limit": 0},
+     {"limit": 101}]
+)
+def test_story_search_request_failure(kwargs):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = StorySearchRequest(**dict({"project_id": 1, "user_id": 1, "text": "login"}, **kwargs))
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"project_id": 0}, {"since": datetime(2020, 3, 2), "until": datetime(2020, 3, 1)},
+     {"since": datetime(2020, 3, 1), "until": datetime(2020, 3, 1)}, {"since": datetime(2019, 1, 1)},
+     {"until": datetime.now() - timedelta(days=400), "since": datetime.now() - timedelta(days=800)}]
+)
+def test_flow_metrics_request_failure(kwargs):
+    with pytest.raises(BadRequestError):
+        # When
+        _ = FlowMetricsRequest(**dict({"project_id": 1, "user_id": 1}, **kwargs))
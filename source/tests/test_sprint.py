@@ -0,0 +1,64 @@
+"""Module to test the sprint use cases."""
+from datetime import date
+
+import pytest
+
+from funwithflags.definitions import BadRequestError, DatabaseQueryError
+from funwithflags.use_cases import read_burndown, read_sprint_progress
+
+
+class FakeSprintGateway:
+    """Sprint 1 of project 1, readable by user 1, has two days of burndown and three stories."""
+
+    def read_sprint_project(self, sprint_id):
+        return 1 if sprint_id == 1 else None
+
+    def can_read_project(self, project_id, user_id):
+        return (project_id, user_id) == (1, 1)
+
+    def read_burndown(self, sprint_id):
+        totals = {date(2020, 3, 23): [(8, 2), (0, 0), (0, 0), (0, 0)],
+                  date(2020, 3, 24): [(3, 1), (2, 1), (0, 0), (3, 1)]}
+        return [(day, status, estimate, stories) for day, statuses in totals.items()
+                for status, (estimate, stories) in enumerate(statuses)]
+
+    def read_rollup(self, key, key_id):
+        return [(0, 1, 3), (1, 1, 2), (3, 1, 3)] if (key, key_id) == ("sprint", 1) else []
+
+
+@pytest.fixture
+def context(make_context):
+    return make_context(FakeSprintGateway())
+
+
+def test_read_burndown(context):
+    # When
+    burndown = read_burndown(1, 1, context)
+    # Then
+    assert burndown["sprint_id"] == 1
+    assert [day["day"] for day in burndown["days"]] == ["2020-03-23", "2020-03-24"]
+    assert [day["remaining"] for day in burndown["days"]] == [8, 5]
+    assert burndown["days"][1]["estimates"] == {"todo": 3, "in_progress": 2, "in_review": 0, "done": 3}
+    assert burndown["days"][1]["stories"] == {"todo": 1, "in_progress": 1, "in_review": 0, "done": 1}
+
+
+@pytest.mark.parametrize("sprint_id,user_id,exception", [
+    (0, 1, BadRequestError),
+    (2, 1, DatabaseQueryError),
+    (1, 2, DatabaseQueryError),
+])
+def test_read_burndown_failure(context, sprint_id, user_id, exception):
+    # When & Then
+    with pytest.raises(exception):
+        read_burndown(sprint_id, user_id, context)
+    with pytest.raises(exception):
+        read_sprint_progress(sprint_id, user_id, context)
+
+
+def test_read_sprint_progress(context):
+    # When
+    progress = read_sprint_progress(1, 1, context)
+    # Then
+    assert progress == {"sprint_id": 1, "estimate": 8, "remaining": 5,
+                        "estimates": {"todo": 3, "in_progress": 2, "done": 3},
+                        "stories": {"todo": 1, "in_progress": 1, "done": 1}}
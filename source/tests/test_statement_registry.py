@@ -0,0 +1,27 @@
+"""Module to test the registry of prepared statements."""
+from funwithflags.gateways import StatementRegistry
+
+
+def test_statement_names():
+    # Given
+    registry = StatementRegistry(max_statements=3)
+    # When
+    first = registry.name("update_user", "UPDATE users SET nickname = %s WHERE user_id = %s")
+    second = registry.name("update_user", "UPDATE users SET email = %s WHERE user_id = %s")
+    again = registry.name("update_user", "UPDATE users SET nickname = %s WHERE user_id = %s")
+    other = registry.name("delete_user", "DELETE FROM users WHERE user_id = %s")
+    # Then
+    assert (first, second, again, other) == ("update_user", "update_user_2", "update_user", "delete_user")
+    assert registry.name("read_user", "SELECT 1") is None
+    assert len(registry) == 3
+
+
+def test_prepare_and_execute_sql():
+    # Given
+    registry = StatementRegistry()
+    name = registry.name("update_user", "UPDATE users SET nickname = %s, email = %s WHERE user_id = %s")
+    # When & Then
+    assert registry.prepare_sql(name) == "PREPARE update_user AS UPDATE users SET nickname = $1, email = $2 " \
+                                         "WHERE user_id = $3"
+    assert StatementRegistry.execute_sql(name, 3) == "EXECUTE update_user (%s, %s, %s)"
+    assert StatementRegistry.execute_sql(name, 0) == "EXECUTE update_user"
@@ -0,0 +1,318 @@
+"""Module to test the story use cases."""
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from funwithflags.definitions import (BadRequestError, DatabaseQueryError, Story, StoryCreateRequest, StoryMoveRequest,
+                                      StorySearchRequest, StoryStatus, StoryUpdateRequest)
+from funwithflags.use_cases import (create_story, delete_story, move_story, read_board, read_story_ancestors,
+                                   read_story_rollup, read_story_subtree, search_stories, update_story)
+
+
+class FakeRankRebalancer:
+    max_length = 16
+
+    def __init__(self):
+        self.checked = []
+
+    def check(self, board_id, rank):
+        self.checked.append((board_id, rank))
+        return False
+
+
+class FakeStoryGateway:
+    """Project 1 is writable by user 1 and has board 1, project 2 is readable by everyone."""
+
+    def __init__(self):
+        self.stories = {}
+        self.locked = []
+        self.subtree_locked = []
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def can_write_project(self, project_id, user_id):
+        return (project_id, user_id) == (1, 1)
+
+    def can_read_project(self, project_id, user_id):
+        return project_id == 2 or self.can_write_project(project_id, user_id)
+
+    def story_refs_valid(self, project_id, board_id=None, epic_id=None, parent_story=None, sprint_id=None):
+        return board_id in (None, 1) and epic_id is sprint_id is None and parent_story in (None, *self.stories)
+
+    def create_story(self, story):
+        story.story_id = len(self.stories) + 1
+        self.stories[story.story_id] = story
+        return story.story_id
+
+    def read_story(self, story_id, for_update=False):
+        if story_id not in self.stories:
+            raise DatabaseQueryError
+        return Story(**vars(self.stories[story_id]))
+
+    def update_story(self, story_id, fields, user_id=None):
+        self.stories[story_id] = Story(**dict(vars(self.stories[story_id]), **fields))
+        return self.stories[story_id]
+
+    def delete_story(self, story_id):
+        del self.stories[story_id]
+
+    def read_rank_gap(self, board_id, story_id, after_id=None, before_id=None):
+        ranks = sorted(story.board_rank for story in self.stories.values()
+                       if story.board_id == board_id and story.story_id != story_id)
+        if after_id is None and before_id is None:
+            return (ranks[-1] if ranks else None), None
+        anchor = self.stories.get(after_id or before_id)
+        if anchor is None or anchor.board_id != board_id:
+            return None
+        if after_id is not None:
+            return anchor.board_rank, next((rank for rank in ranks if rank > anchor.board_rank), None)
+        return next((rank for rank in reversed(ranks) if rank < anchor.board_rank), None), anchor.board_rank
+
+    def lock_story(self, story_id):
+        self.locked.append(story_id)
+        return story_id in self.stories
+
+    def lock_story_subtree(self, story_id):
+        self.subtree_locked.append(story_id)
+
+    def read_story_project(self, story_id):
+        return self.stories[story_id].project_id if story_id in self.stories else None
+
+    def _path(self, story_id):
+        path = [story_id]
+        while self.stories[path[-1]].parent_story is not None:
+            path.append(self.stories[path[-1]].parent_story)
+        return path
+
+    def _tree_entry(self, story_id, depth):
+        return {"story_id": story_id, "parent_story": self.stories[story_id].parent_story, "depth": depth}
+
+    def read_story_subtree(self, story_id, max_depth=None):
+        depths = {descendant: self._path(descendant).index(story_id) for descendant in self.stories
+                  if story_id in self._path(descendant)}
+        return [self._tree_entry(descendant, depth)
+                for descendant, depth in sorted(depths.items(), key=lambda item: (item[1], item[0]))
+                if max_depth is None or depth <= max_depth]
+
+    def read_story_ancestors(self, story_id, lock=False):
+        return [self._tree_entry(ancestor, depth) for depth, ancestor in enumerate(self._path(story_id))][:0:-1]
+
+    def read_story_rollup(self, story_id):
+        rollup = {}
+        for entry in self.read_story_subtree(story_id):
+            story = self.stories[entry["story_id"]]
+            stories, estimate = rollup.get(story.status, (0, 0))
+            rollup[story.status] = stories + 1, estimate + (story.estimate or 0)
+        return [(status, *totals) for status, totals in sorted(rollup.items())]
+
+    def read_board(self, board_id):
+        return (1, '{"board_id": 1, "stories": []}') if board_id == 1 else None
+
+    def search_stories(self, project_id, text, after=None, limit=20):
+        matches = sorted(((1.0 / story.story_id, story.story_id) for story in self.stories.values()
+                          if story.project_id == project_id and text in story.story_name), reverse=True)
+        return [{"story_id": story_id, "rank": rank} for rank, story_id in matches
+                if after is None or (rank, story_id) < after][:limit]
+
+
+@pytest.fixture
+def context(make_context):
+    return make_context(FakeStoryGateway())
+
+
+def test_story_is_closed_and_reopened(context):
+    # Given
+    story_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="story", board_id=1), context)
+    # When
+    closed = update_story(StoryUpdateRequest(story_id, 1, {"status": StoryStatus.DONE.value}), context)
+    still_closed = update_story(StoryUpdateRequest(story_id, 1, {"status": StoryStatus.DONE.value, "estimate": 2}),
+                                context)
+    reopened = update_story(StoryUpdateRequest(story_id, 1, {"status": StoryStatus.IN_PROGRESS.value}), context)
+    # Then
+    assert closed["closed_by"] == 1
+    assert closed["closed_at"] is not None
+    assert still_closed["closed_at"] == closed["closed_at"]
+    assert (reopened["closed_at"], reopened["closed_by"]) == (None, None)
+
+
+@pytest.mark.parametrize("project_id,fields,exception", [
+    (2, {}, DatabaseQueryError),
+    (3, {}, DatabaseQueryError),
+    (1, {"board_id": 2}, BadRequestError),
+    (1, {"epic_id": 1}, BadRequestError),
+    (1, {"sprint_id": 1}, BadRequestError),
+])
+def test_create_story_failure(context, project_id, fields, exception):
+    with pytest.raises(exception):
+        create_story(StoryCreateRequest(created_by=1, project_id=project_id, story_name="story", **fields), context)
+
+
+def test_update_and_delete_story_need_write_access(context):
+    # Given
+    context.postgres_gateway.stories[1] = Story(story_id=1, project_id=2, created_at=datetime.now())
+    # When & Then
+    with pytest.raises(DatabaseQueryError):
+        update_story(StoryUpdateRequest(1, 1, {"story_name": "renamed"}), context)
+    with pytest.raises(DatabaseQueryError):
+        delete_story(1, 1, context)
+    with pytest.raises(BadRequestError):
+        context.postgres_gateway.stories[1].project_id = 1
+        update_story(StoryUpdateRequest(1, 1, {"parent_story": 1}), context)
+    delete_story(1, 1, context)
+    assert context.postgres_gateway.stories == {}
+
+
+def test_read_story_tree(context):
+    # Given
+    root_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="root", estimate=1), context)
+    child_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="child", estimate=2,
+                                               parent_story=root_id, status=StoryStatus.DONE.value), context)
+    leaf_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="leaf", estimate=3,
+                                              parent_story=child_id), context)
+    # When
+    subtree = read_story_subtree(root_id, 1, context)
+    shallow = read_story_subtree(root_id, 1, context, max_depth=1)
+    ancestors = read_story_ancestors(leaf_id, 1, context)
+    rollup = read_story_rollup(root_id, 1, context)
+    # Then
+    assert [(story["story_id"], story["depth"]) for story in subtree["stories"]] == \
+        [(root_id, 0), (child_id, 1), (leaf_id, 2)]
+    assert [story["story_id"] for story in shallow["stories"]] == [root_id, child_id]
+    assert [(story["story_id"], story["depth"]) for story in ancestors["ancestors"]] == [(root_id, 2), (child_id, 1)]
+    assert rollup == {"story_id": root_id, "estimate": 6, "remaining": 4, "estimates": {"todo": 4, "done": 2},
+                      "stories": {"todo": 2, "done": 1}}
+
+
+def test_reparent_story_below_its_subtree(context):
+    # Given
+    root_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="root"), context)
+    child_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="child", parent_story=root_id),
+                            context)
+    other_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="other"), context)
+    # When & Then
+    with pytest.raises(BadRequestError):
+        update_story(StoryUpdateRequest(root_id, 1, {"parent_story": child_id}), context)
+    assert update_story(StoryUpdateRequest(root_id, 1, {"parent_story": other_id}), context)["parent_story"] == other_id
+    assert context.postgres_gateway.locked == [root_id, child_id, other_id]
+    assert update_story(StoryUpdateRequest(root_id, 1, {"parent_story": None}), context)["parent_story"] is None
+    assert update_story(StoryUpdateRequest(root_id, 1, {"story_name": "renamed"}), context)["parent_story"] is None
+    assert context.postgres_gateway.subtree_locked == [root_id] * 3
+
+
+@pytest.mark.parametrize("read", [read_story_subtree, read_story_ancestors, read_story_rollup])
+def test_read_story_tree_failure(context, read):
+    # Given
+    create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="story"), context)
+    # When & Then
+    with pytest.raises(BadRequestError):
+        read(0, 1, context)
+    with pytest.raises(DatabaseQueryError):
+        read(2, 1, context)
+    with pytest.raises(DatabaseQueryError):
+        read(1, 2, context)
+
+
+def board_order(context):
+    stories = context.postgres_gateway.stories.values()
+    return [story.story_id for story in sorted(stories, key=lambda story: story.board_rank or "~")]
+
+
+def test_move_story_only_ranks_it(context):
+    # Given
+    for name in ("first", "second", "third"):
+        create_story(StoryCreateRequest(created_by=1, project_id=1, story_name=name, board_id=1), context)
+    backlog_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="backlog"), context)
+    ranks = {story_id: story.board_rank for story_id, story in context.postgres_gateway.stories.items()}
+    # When & Then
+    assert board_order(context) == [1, 2, 3, 4]
+    moved = move_story(StoryMoveRequest(story_id=3, user_id=1, after_id=1), context)
+    assert board_order(context) == [1, 3, 2, 4]
+    assert {story_id: story.board_rank for story_id, story in context.postgres_gateway.stories.items()} == \
+        {**ranks, 3: moved["board_rank"]}
+    move_story(StoryMoveRequest(story_id=2, user_id=1, before_id=1), context)
+    assert board_order(context) == [2, 1, 3, 4]
+    move_story(StoryMoveRequest(story_id=backlog_id, user_id=1, board_id=1, before_id=3), context)
+    assert board_order(context) == [2, 1, 4, 3]
+    move_story(StoryMoveRequest(story_id=2, user_id=1), context)
+    assert board_order(context) == [1, 4, 3, 2]
+
+
+def test_new_board_ranks_are_checked(make_context):
+    # Given
+    context = make_context(FakeStoryGateway(), rank_rebalancer=FakeRankRebalancer())
+    # When
+    created_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="on board", board_id=1), context)
+    backlog_id = create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="backlog"), context)
+    created = update_story(StoryUpdateRequest(created_id, 1, {"story_name": "renamed"}), context)
+    added = update_story(StoryUpdateRequest(backlog_id, 1, {"board_id": 1}), context)
+    moved = move_story(StoryMoveRequest(story_id=created_id, user_id=1), context)
+    # Then
+    assert context.rank_rebalancer.checked == [(1, story["board_rank"]) for story in (created, added, moved)]
+
+
+@pytest.mark.parametrize("kwargs,exception", [
+    ({"story_id": 2}, BadRequestError),
+    ({"story_id": 1, "board_id": 2}, BadRequestError),
+    ({"story_id": 1, "after_id": 2}, BadRequestError),
+    ({"story_id": 1, "user_id": 2}, DatabaseQueryError),
+    ({"story_id": 3}, DatabaseQueryError),
+])
+def test_move_story_failure(context, kwargs, exception):
+    # Given
+    create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="on board", board_id=1), context)
+    create_story(StoryCreateRequest(created_by=1, project_id=1, story_name="backlog"), context)
+    # When & Then
+    with pytest.raises(exception):
+        move_story(StoryMoveRequest(**dict({"user_id": 1}, **kwargs)), context)
+
+
+def test_read_board_without_cache(context):
+    # When & Then
+    assert read_board(1, 1, context) == (None, '{"board_id": 1, "stories": []}')
+    with pytest.raises(DatabaseQueryError):
+        read_board(1, 2, context)
+    with pytest.raises(DatabaseQueryError):
+        read_board(2, 1, context)
+
+
+class FakeBoardCache:
+    def read_board(self, board_id, user_id):
+        return 3, 1, user_id == 1, '{"board_id": 1, "stories": []}'
+
+
+def test_read_board_from_cache(make_context):
+    # Given
+    gateway = FakeStoryGateway()
+    gateway.can_read_project = None
+    context = make_context(gateway, board_cache=FakeBoardCache())
+    # When & Then
+    assert read_board(1, 1, context) == (3, '{"board_id": 1, "stories": []}')
+    with pytest.raises(DatabaseQueryError):
+        read_board(1, 2, context)
+
+
+def test_search_stories_pages(context):
+    # Given
+    for name in ("login page", "logout", "login api"):
+        create_story(StoryCreateRequest(created_by=1, project_id=1, story_name=name), context)
+    found, cursor = [], None
+    # When
+    while True:
+        page, cursor = search_stories(StorySearchRequest(project_id=1, user_id=1, text="login", limit=1,
+                                                         cursor=cursor), context)
+        found.extend(story["story_id"] for story in page)
+        if cursor is None:
+            break
+    # Then
+    assert found == [1, 3]
+
+
+def test_search_stories_failure(context):
+    # When & Then
+    with pytest.raises(DatabaseQueryError):
+        search_stories(StorySearchRequest(project_id=1, user_id=2, text="login"), context)
+    with pytest.raises(BadRequestError):
+        search_stories(StorySearchRequest(project_id=1, user_id=1, text="login", cursor="invalid"), context)
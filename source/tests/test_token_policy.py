@@ -0,0 +1,174 @@
+"""Module to test the token storage policies and the session registry."""
+from contextlib import contextmanager
+
+import flask_jwt_extended
+import pytest
+
+from funwithflags.definitions import LoginRequest, LogoutRequest, TokenPolicy, User
+from funwithflags.entities import generate_salt_hash_password
+from funwithflags.use_cases import is_token_revoked, list_sessions, login, logout, revoke_all_sessions
+
+PASSWORD = "Password123@"
+
+
+class FakeUserGateway:
+    def __init__(self):
+        password, salt = generate_salt_hash_password(PASSWORD, rounds=4)
+        self.user = User(user_id=1, username="testUser", password=password, salt=salt, valid=True)
+
+    def read_user(self, user_id=None, username=None):
+        return self.user
+
+
+class FakePipeline:
+    def __init__(self, redis_gateway):
+        self._redis_gateway = redis_gateway
+        self.results = []
+
+    def set(self, name, value, expire=None):
+        self._redis_gateway.writes += 1
+        self._redis_gateway.values[name] = value
+        self.results.append(True)
+        return self
+
+    def zadd(self, name, mapping):
+        self._redis_gateway.writes += 1
+        self._redis_gateway.values.setdefault(name, {}).update(mapping)
+        self.results.append(len(mapping))
+        return self
+
+    def zrem(self, name, *members):
+        for member in members:
+            self._redis_gateway.values.get(name, {}).pop(member, None)
+        self.results.append(len(members))
+        return self
+
+    def zremrangebyscore(self, name, min_score, max_score):
+        self.results.append(0)
+        return self
+
+    def expire(self, name, expire):
+        self.results.append(True)
+        return self
+
+    def incr(self, name):
+        self._redis_gateway.values[name] = int(self._redis_gateway.values.get(name, 0)) + 1
+        self.results.append(self._redis_gateway.values[name])
+        return self
+
+    def delete(self, *names):
+        for name in names:
+            self._redis_gateway.values.pop(name, None)
+        self.results.append(len(names))
+        return self
+
+
+class FakeRedisGateway:
+    def __init__(self):
+        self.values = {}
+        self.writes = 0
+        self.round_trips = 0
+
+    @contextmanager
+    def pipeline(self, transaction=False):
+        pipe = FakePipeline(self)
+        yield pipe
+        self.round_trips += 1 if pipe.results else 0
+
+    def get(self, name):
+        value = self.values.get(name)
+        return str(value) if value is not None else None
+
+    def zrangebyscore(self, name, min_score, max_score):
+        return sorted(self.values.get(name, {}).items(), key=lambda item: item[1])
+
+    def publish(self, channel, message):
+        return 0
+
+
+class FakeTokenCache:
+    def __init__(self, redis_gateway):
+        self._redis_gateway = redis_gateway
+
+    def get(self, jti):
+        return self._redis_gateway.values.get(jti)
+
+    def revoke(self, jti, expire=None):
+        self._redis_gateway.values[jti] = "logout"
+
+    def get_generation(self, user_id):
+        return int(self._redis_gateway.values.get(f"token_gen:{user_id}", 0))
+
+    def push_generation(self, user_id, generation):
+        pass
+
+
+@pytest.fixture
+def policy_context(make_context):
+    def make(policy):
+        redis_gateway = FakeRedisGateway()
+        return make_context(FakeUserGateway(), redis_gateway=redis_gateway, token_cache=FakeTokenCache(redis_gateway),
+                            token_policy=policy)
+
+    return make
+
+
+@pytest.fixture
+def mock_jwt(monkeypatch):
+    monkeypatch.setattr(flask_jwt_extended, "create_access_token", lambda identity, fresh: "access")
+    monkeypatch.setattr(flask_jwt_extended, "create_refresh_token", lambda identity: "refresh")
+    monkeypatch.setattr(flask_jwt_extended, "get_jti", lambda encoded_token: encoded_token + ".jti")
+
+
+@pytest.mark.parametrize(
+    "policy,expected_writes,unknown_revoked",
+    [(TokenPolicy.STATELESS, 0, False),
+     (TokenPolicy.REFRESH, 2, True),
+     (TokenPolicy.ALL, 3, True)]
+)
+def test_login_writes_by_policy(mock_jwt, policy, expected_writes, unknown_revoked, policy_context):
+    # Given
+    context = policy_context(policy)
+    # When
+    login(LoginRequest(username="testUser", password=PASSWORD), context)
+    # Then
+    assert context.redis_gateway.writes == expected_writes
+    assert context.redis_gateway.round_trips == (1 if expected_writes else 0)
+    assert not is_token_revoked("refresh.jti", context)
+    assert is_token_revoked("unknown.jti", context) == unknown_revoked
+
+
+@pytest.mark.parametrize("policy", list(TokenPolicy))
+def test_logout_revokes_under_every_policy(mock_jwt, policy, policy_context):
+    # Given
+    context = policy_context(policy)
+    login(LoginRequest(username="testUser", password=PASSWORD), context)
+    # When
+    logout(LogoutRequest("refresh.jti"), context)
+    # Then
+    assert is_token_revoked("refresh.jti", context)
+
+
+def test_logout_everywhere(mock_jwt, policy_context):
+    # Given
+    context = policy_context(TokenPolicy.REFRESH)
+    login(LoginRequest(username="testUser", password=PASSWORD), context)
+    sessions = list_sessions(1, context)
+    # When
+    revoke_all_sessions(1, context)
+    # Then
+    assert [session["jti"] for session in sessions] == ["refresh.jti"]
+    assert list_sessions(1, context) == []
+    assert is_token_revoked("refresh.jti", context, identity=1, generation=0)
+    assert not is_token_revoked("refresh.jti", context, identity=1, generation=1)
+    assert not is_token_revoked("refresh.jti", context, identity=2, generation=0)
+
+
+def test_logout_removes_session(mock_jwt, policy_context):
+    # Given
+    context = policy_context(TokenPolicy.REFRESH)
+    login(LoginRequest(username="testUser", password=PASSWORD), context)
+    # When
+    logout(LogoutRequest("refresh.jti", user_id=1), context)
+    # Then
+    assert list_sessions(1, context) == []
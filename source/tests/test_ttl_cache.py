@@ -0,0 +1,66 @@
+"""Module to test the in-process TTL cache."""
+import pytest
+
+from funwithflags.entities import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("max_size,ttl", [(0, 1), (1, 0)])
+def test_invalid_cache_settings(max_size, ttl):
+    with pytest.raises(ValueError):
+        TTLCache(max_size, ttl)
+
+
+def test_lookup_hit_miss_and_none_value():
+    # Given
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set("revoked", None)
+    # When & Then
+    assert cache.lookup("revoked") == (True, None)
+    assert cache.lookup("unknown") == (False, None)
+    assert (cache.stats().hits, cache.stats().misses) == (1, 1)
+    assert cache.stats().hit_ratio == 0.5
+
+
+def test_entries_expire():
+    # Given
+    clock = FakeClock()
+    cache = TTLCache(max_size=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    # When
+    clock.now = 20
+    # Then
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats().size == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    # Given
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    # When
+    cache.set("c", 3)
+    # Then
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats().evictions == 1
+
+
+def test_setdefault_keeps_live_entry():
+    # Given
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set("jti", "logout")
+    # When & Then
+    assert cache.setdefault("jti", "login") == "logout"
+    assert cache.setdefault("other", "login") == "login"
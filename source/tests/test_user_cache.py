@@ -0,0 +1,178 @@
+"""Module to test the read-through user cache."""
+from datetime import datetime
+import pytest
+
+from funwithflags.definitions import BadRequestError, DatabaseQueryError, User
+from funwithflags.gateways import UserCache
+from funwithflags.use_cases import read_user_basic
+
+
+class FakeUserGateway:
+    def __init__(self):
+        self.users = {1: User(user_id=1, username="test", nickname="nick", email="test@example.com",
+                              password=b"123456", salt=b"123", created_at=datetime(2020, 1, 1), valid=True)}
+        self.reads = 0
+        self.listeners = []
+        self.before_read_returns = None
+
+    def add_user_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def read_user(self, user_id=None, username=None, columns=None):
+        self.reads += 1
+        if user_id not in self.users:
+            raise DatabaseQueryError
+        user = self._project(self.users[user_id], columns)
+        if self.before_read_returns:
+            self.before_read_returns()
+        return user
+
+    def read_users(self, user_ids, columns=None):
+        self.reads += 1
+        return ([self._project(self.users[user_id], columns) for user_id in user_ids if user_id in self.users],
+                [user_id for user_id in user_ids if user_id not in self.users])
+
+    @staticmethod
+    def _project(user, columns):
+        return user if columns is None else User(**{column: getattr(user, column) for column in columns}, valid=True)
+
+    def update_nickname(self, user_id, nickname):
+        user = self.users[user_id]
+        self.users[user_id] = User(**dict(vars(user), nickname=nickname))
+        for listener in self.listeners:
+            listener(user_id)
+
+
+class FakeRedisGateway:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def set(self, name, value, expire=None):
+        self.values[name] = value
+
+    def set_if_absent(self, name, value, expire=None):
+        return self.values.setdefault(name, value) == value
+
+    def get_many(self, names):
+        return [self.values.get(name) for name in names]
+
+    def set_many(self, entries, nx=False):
+        assert nx
+        return [self.set_if_absent(name, value) for name, (value, expire) in entries.items()]
+
+    def publish(self, channel, message):
+        return 0
+
+    def subscribe(self, channel, handler, on_subscribe=None):
+        return object()
+
+
+@pytest.fixture(params=[0, 10], ids=["l2_only", "l1_and_l2"])
+def user_cache(request):
+    return UserCache(FakeUserGateway(), FakeRedisGateway(), l1_size=request.param)
+
+
+def test_read_user_is_cached(user_cache):
+    # When
+    users = [user_cache.read_user(1) for _ in range(3)]
+    stats = user_cache.stats()
+    # Then
+    assert all(user == users[0] for user in users)
+    assert users[0].nickname == "nick"
+    assert user_cache._postgres_gateway.reads == 1
+    assert (stats.reads, stats.misses) == (3, 1)
+    assert stats.l1_hits + stats.l2_hits == 2
+
+
+def test_missing_user_is_negatively_cached(user_cache):
+    # When & Then
+    for _ in range(2):
+        with pytest.raises(DatabaseQueryError):
+            user_cache.read_user(2)
+    assert user_cache._postgres_gateway.reads == 1
+    assert user_cache.stats().negative_hits == 1
+
+
+def test_invalid_user_id(user_cache):
+    with pytest.raises(BadRequestError):
+        user_cache.read_user(0)
+
+
+def test_write_invalidates_user(user_cache):
+    # Given
+    user_cache.read_user(1)
+    # When
+    user_cache._postgres_gateway.update_nickname(1, "newNick")
+    # Then
+    assert user_cache.read_user(1).nickname == "newNick"
+
+
+def test_read_racing_with_write_does_not_cache_stale_user(user_cache):
+    # Given
+    gateway = user_cache._postgres_gateway
+
+    def concurrent_write():
+        gateway.before_read_returns = None
+        gateway.update_nickname(1, "newNick")
+
+    gateway.before_read_returns = concurrent_write
+    # When
+    stale = user_cache.read_user(1)
+    # Then
+    assert stale.nickname == "nick"
+    assert user_cache.read_user(1).nickname == "newNick"
+
+
+def test_read_users_is_batched_and_cached(user_cache):
+    # Given
+    gateway = user_cache._postgres_gateway
+    gateway.users[3] = User(**dict(vars(gateway.users[1]), user_id=3, username="other"))
+    user_cache.read_user(1)
+    # When
+    users, missing = user_cache.read_users([3, 2, 1, 3])
+    # Then
+    assert [user.user_id for user in users] == [3, 1]
+    assert missing == [2]
+    assert gateway.reads == 2
+    # When
+    users, missing = user_cache.read_users([1, 2, 3])
+    # Then
+    assert ([user.user_id for user in users], missing) == ([1, 3], [2])
+    assert gateway.reads == 2
+    assert user_cache.stats().misses == 3
+
+
+def test_read_users_does_not_refill_invalidated_user(user_cache):
+    # Given
+    user_cache.read_users([1])
+    user_cache._postgres_gateway.update_nickname(1, "newNick")
+    # When
+    users, _ = user_cache.read_users([1])
+    # Then
+    assert users[0].nickname == "newNick"
+    assert user_cache._redis_gateway.get("user:1") == "invalidated"
+
+
+def test_credentials_are_not_cached(user_cache):
+    # When
+    user = user_cache.read_user(1)
+    users, _ = user_cache.read_users([1])
+    # Then
+    assert (user.password, user.salt) == (users[0].password, users[0].salt) == (b"", b"")
+    assert "password" not in user_cache._redis_gateway.get("user:1")
+    assert "salt" not in user_cache._redis_gateway.get("user:1")
+
+
+def test_read_user_basic_fields_are_served_from_cache(user_cache, make_context):
+    # Given
+    context = make_context(user_cache._postgres_gateway, redis_gateway=user_cache._redis_gateway,
+                           user_cache=user_cache)
+    # When
+    username = read_user_basic(1, context, fields=["username"])
+    email = read_user_basic(1, context, fields=["email", "nickname"])
+    # Then
+    assert (username, email) == ({"username": "test"}, {"email": "test@example.com", "nickname": "nick"})
+    assert user_cache._postgres_gateway.reads == 1
@@ -0,0 +1,73 @@
+"""Module to test the bulk user import."""
+import io
+
+import pytest
+
+from funwithflags.definitions import User
+from funwithflags.entities import HashingService
+from funwithflags.use_cases import import_users, read_user_records
+
+PASSWORD = "Password123@"
+
+
+class FakeImportGateway:
+    def __init__(self, taken=()):
+        self.taken = set(taken)
+        self.batches = []
+
+    def import_users(self, users):
+        self.batches.append(len(users))
+        imported = []
+        for i, user in enumerate(users):
+            if user.username not in self.taken and user.email not in self.taken:
+                self.taken.update((user.username, user.email))
+                imported.append(User(**dict(vars(user), user_id=i + 1)))
+        return imported
+
+
+@pytest.mark.parametrize(
+    "content,fmt",
+    [("username,nickname,email,password\nuser1,nick,user1@example.com,Password123@\n", "csv"),
+     ('{"username": "user1", "nickname": "nick", "email": "user1@example.com", "password": "Password123@"}\n',
+      "ndjson")]
+)
+def test_read_user_records(content, fmt):
+    # When
+    records = list(read_user_records(io.StringIO(content), fmt))
+    # Then
+    assert records == [(2 if fmt == "csv" else 1, {"username": "user1", "nickname": "nick",
+                                                   "email": "user1@example.com", "password": PASSWORD})]
+
+
+def test_read_user_records_malformed():
+    # When
+    records = list(read_user_records(io.StringIO('{"username": \n\n[1]\n'), "ndjson"))
+    # Then
+    assert [record_num for record_num, _ in records] == [1, 3]
+    assert all(isinstance(record, str) for _, record in records)
+
+
+def test_import_users(make_context):
+    # Given
+    gateway = FakeImportGateway(taken={"taken"})
+    valid = {"nickname": "nick", "password": PASSWORD}
+    records = [
+        (1, dict(valid, username="user1", email="user1@example.com")),
+        (2, dict(valid, username="taken", email="user2@example.com")),
+        (3, dict(valid, username="user3", email="invalid")),
+        (4, dict(valid, username="user4")),
+        (5, "Malformed json"),
+        (6, dict(valid, username="user1", email="user1@example.com")),
+        (7, dict(valid, username="u" * 33, email="user7@example.com")),
+        (8, dict(valid, username="user8", email="user8@example.com")),
+    ]
+    context = make_context(gateway, hashing_service=HashingService(rounds=4))
+    progress = []
+    # When
+    report = import_users(iter(records), context, batch_size=2, progress=progress.append)
+    # Then
+    assert report.imported == 2
+    assert [record_num for record_num, _ in report.rejected] == [2, 3, 4, 5, 7, 6]
+    assert report.rejected[-1] == (6, "Username or email already taken")
+    assert gateway.batches == [2, 2]
+    assert len(progress) == 2